@@ -0,0 +1,192 @@
+"""
+Asyncio fetcher for CoinDesk historical data
+
+Replaces the thread-per-series fetcher in fetchdata.py for full downloads:
+- one pooled aiohttp session for every coin and interval
+- a shared token bucket that backs off on 429s and X-RateLimit-* headers
+  and creeps back up while requests succeed (AIMD)
+- bounded concurrency across all series instead of a fixed sleep per page
+
+Pagination, page spooling and CSV writing are reused from CoinDeskData.
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import aiohttp
+from dotenv import load_dotenv
+
+from fetchdata import CoinDeskData
+from spool import PageSpool
+
+MAX_RETRIES = 5
+
+
+class TokenBucket:
+    """Request-rate limiter shared by every in-flight fetch"""
+
+    def __init__(self, rate=10.0, capacity=10, min_rate=0.5, max_rate=50.0, increase=1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.throttled = 0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def on_success(self, headers):
+        """Additive increase, unless the server says the remaining quota is exhausted"""
+        remaining, reset = parse_rate_limit_headers(headers)
+        if remaining is not None and remaining <= 0:
+            self.pause(reset or 1.0)
+            return
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttled(self, headers):
+        """Multiplicative decrease and a pause for Retry-After (or the rate-limit reset)"""
+        self.throttled += 1
+        self.rate = max(self.min_rate, self.rate / 2)
+        _, reset = parse_rate_limit_headers(headers)
+        self.pause(retry_after(headers) or reset or 1.0 / self.rate)
+
+    def pause(self, seconds):
+        self.tokens = 0.0
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+def retry_after(headers):
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_rate_limit_headers(headers):
+    """
+    Return (smallest remaining quota, matching reset seconds) from X-RateLimit-*
+    headers. CoinDesk reports several windows (second/minute/hour...), so the
+    tightest one wins.
+    """
+    remaining, reset = None, None
+    for name, value in headers.items():
+        lower = name.lower()
+        if not lower.startswith("x-ratelimit-remaining"):
+            continue
+        try:
+            value = int(value)
+        except ValueError:
+            continue
+        if remaining is None or value < remaining:
+            remaining = value
+            suffix = lower[len("x-ratelimit-remaining"):]
+            try:
+                reset = float(headers.get(f"X-RateLimit-Reset{suffix}", ""))
+            except ValueError:
+                reset = None
+    return remaining, reset
+
+
+async def fetch_page(session, bucket, client, to_ts, limit=None):
+    """Async twin of CoinDeskData.fetch_page with retries on 429 and 5xx"""
+    for attempt in range(MAX_RETRIES):
+        await bucket.acquire()
+        try:
+            async with session.get(client.url, params=client.page_params(to_ts, limit),
+                                   headers=client.headers) as response:
+                if response.status == 429:
+                    bucket.on_throttled(response.headers)
+                    continue
+                if response.status >= 500:
+                    await asyncio.sleep(2 ** attempt * 0.5)
+                    continue
+                try:
+                    res_json = await response.json(content_type=None)
+                except Exception as e:
+                    print(f"⚠ Failed to parse JSON for {client.coin}: {e}")
+                    return None
+                if response.status != 200:
+                    print(f"⚠ Error {response.status} for {client.coin} ({client.interval})")
+                    print(res_json)
+                    return None
+                bucket.on_success(response.headers)
+                return res_json
+        except aiohttp.ClientError as e:
+            print(f"⚠ Request failed for {client.coin} ({client.interval}): {e}")
+            await asyncio.sleep(2 ** attempt * 0.5)
+
+    print(f"⚠ Giving up on {client.coin} ({client.interval}) after {MAX_RETRIES} attempts")
+    return None
+
+
+async def fetch_series(session, bucket, semaphore, client):
+    with PageSpool(client.format_row) as spool:
+        async with semaphore:
+            print(f"⏳ Fetching {client.interval} data for {client.coin}...")
+            pager = client.paginate(spool)
+            to_ts = next(pager)
+            try:
+                while True:
+                    res_json = await fetch_page(session, bucket, client, to_ts)
+                    to_ts = pager.send(res_json)
+            except StopIteration:
+                pass
+        return await asyncio.to_thread(client.save_spool, spool)
+
+
+async def fetch_all(clients, concurrency=8, rate=10.0, max_rate=50.0):
+    """Fetch every client's full history; returns (rows per series, throttled responses)"""
+    bucket = TokenBucket(rate=rate, capacity=max(1, int(rate)), max_rate=max_rate)
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=60)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        rows = await asyncio.gather(*(fetch_series(session, bucket, semaphore, c) for c in clients))
+    return {f"{c.coin}/{c.interval}": n for c, n in zip(clients, rows)}, bucket.throttled
+
+
+def build_clients(coins, intervals, api_key, **kwargs):
+    return [
+        CoinDeskData(coin, instrument=info['instrument'], start_date=info['start_date'], interval=interval,
+                     api_key=api_key, market="cadli", **kwargs)
+        for coin, info in coins.items()
+        for interval in intervals
+    ]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fetch CoinDesk OHLCV history with asyncio")
+    parser.add_argument('--concurrency', type=int, default=int(os.getenv('MAX_WORKERS', '8')))
+    parser.add_argument('--rate', type=float, default=10.0, help="initial requests per second")
+    parser.add_argument('--max-rate', type=float, default=50.0)
+    args = parser.parse_args()
+
+    ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    load_dotenv(dotenv_path=os.path.join(ROOT_DIR, '.env'))
+    API_KEY = os.getenv('COINDESK_API_KEY')
+
+    with open('symbols.json', 'r') as f:
+        COINS = json.load(f)
+
+    clients = build_clients(COINS, ['days', 'hours'], API_KEY)
+    start = time.perf_counter()
+    rows, throttled = asyncio.run(fetch_all(clients, args.concurrency, args.rate, args.max_rate))
+    print(f"✅ Fetched {sum(rows.values())} rows in {time.perf_counter() - start:.1f}s ({throttled} throttled responses)")
@@ -0,0 +1,84 @@
+"""
+Benchmark: load time of every Data CSV via pandas vs the columnar cache
+
+Usage (from the Data folder):
+    python benchmarks/bench_dataset.py [--repeat 5] [--json results.json]
+
+Reports, for all CSVs in data-days/ and data-hours/:
+- csv:   pd.read_csv + Date parsing + sort (what the training scripts did)
+- cold:  first conversion into the cache (fresh temporary cache dir)
+- warm:  memory-mapped load from the cache, touching every Close value
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from dataset import DatasetCache, DATA_DIR  # noqa: E402
+
+
+def time_csv(cache):
+    start = time.perf_counter()
+    for coin, interval in cache.available():
+        df = pd.read_csv(cache.csv_path(coin, interval))
+        df['Date'] = pd.to_datetime(df['Date'])
+        df = df.sort_values('Date')
+    return time.perf_counter() - start
+
+
+def time_warm(cache):
+    start = time.perf_counter()
+    total = 0.0
+    for coin, interval in cache.available():
+        arrays = cache.load(coin, interval)
+        total += float(arrays['close'].sum())
+    return time.perf_counter() - start
+
+
+def best_of(fn, repeat):
+    return min(fn() for _ in range(repeat))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', dest='json_path')
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix='dataset-bench-')
+    try:
+        cache = DatasetCache(DATA_DIR, cache_dir=cache_dir)
+        files = cache.available()
+
+        csv_seconds = best_of(lambda: time_csv(cache), args.repeat)
+
+        start = time.perf_counter()
+        cache.refresh()
+        cold_seconds = time.perf_counter() - start
+
+        # New instance so the manifest is re-read from disk, like a fresh process
+        warm_seconds = best_of(lambda: time_warm(DatasetCache(DATA_DIR, cache_dir=cache_dir)), args.repeat)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    results = {
+        'files': len(files),
+        'csv_seconds': round(csv_seconds, 4),
+        'cold_convert_seconds': round(cold_seconds, 4),
+        'warm_load_seconds': round(warm_seconds, 4),
+        'speedup': round(csv_seconds / warm_seconds, 1) if warm_seconds else None,
+    }
+
+    print(f"Files:           {results['files']}")
+    print(f"pandas CSV load: {csv_seconds * 1000:.1f} ms")
+    print(f"Cold conversion: {cold_seconds * 1000:.1f} ms")
+    print(f"Warm mmap load:  {warm_seconds * 1000:.1f} ms  ({results['speedup']}x)")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,81 @@
+"""
+Benchmark: threaded fetchdata.py vs async_fetch.py against a local CoinDesk stand-in
+
+Usage (from the Data folder):
+    python benchmarks/bench_fetch.py [--start 2023-01-01] [--latency 0.05] [--rate-limit 20] [--json out.json]
+
+Both implementations download every coin in symbols.json for days and hours
+from the same stand-in server into throwaway directories; wall time, request
+count and 429 responses are reported for each.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, DATA_DIR)
+sys.path.insert(0, os.path.dirname(__file__))
+
+from async_fetch import build_clients, fetch_all  # noqa: E402
+from standin import StandInServer  # noqa: E402
+
+
+def run_threaded(clients, max_workers):
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for future in as_completed([executor.submit(c.fetch_to_csv) for c in clients]):
+            future.result()
+
+
+def run_async(clients, concurrency):
+    asyncio.run(fetch_all(clients, concurrency=concurrency))
+
+
+def measure(name, runner, coins, args):
+    server = StandInServer(latency=args.latency, rate_limit=args.rate_limit).start()
+    workdir = tempfile.mkdtemp(prefix=f'fetch-bench-{name}-')
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)  # both fetchers write data-days/ and data-hours/ relative to the working directory
+    try:
+        clients = build_clients(coins, ['days', 'hours'], api_key='bench', base_url=server.base_url)
+        start = time.perf_counter()
+        runner(clients, args.workers)
+        elapsed = time.perf_counter() - start
+    finally:
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+        server.stop()
+    return {'seconds': round(elapsed, 2), 'requests': server.requests, 'throttled': server.throttled}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--start', default='2023-01-01', help="history start date used for every coin")
+    parser.add_argument('--latency', type=float, default=0.05, help="stand-in response latency (s)")
+    parser.add_argument('--rate-limit', type=float, default=20.0, help="stand-in requests per second")
+    parser.add_argument('--workers', type=int, default=int(os.getenv('MAX_WORKERS', '4')))
+    parser.add_argument('--json', dest='json_path')
+    args = parser.parse_args()
+
+    with open(os.path.join(DATA_DIR, 'symbols.json'), 'r') as f:
+        coins = {coin: {**info, 'start_date': args.start} for coin, info in json.load(f).items()}
+
+    results = {
+        'threaded': measure('threaded', run_threaded, coins, args),
+        'async': measure('async', run_async, coins, args),
+    }
+    results['speedup'] = round(results['threaded']['seconds'] / results['async']['seconds'], 2)
+
+    for name in ('threaded', 'async'):
+        r = results[name]
+        print(f"{name:>8}: {r['seconds']:>7.2f}s  {r['requests']} requests  {r['throttled']} throttled")
+    print(f" speedup: {results['speedup']}x")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
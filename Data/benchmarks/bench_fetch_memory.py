@@ -0,0 +1,130 @@
+"""
+Benchmark: peak fetcher memory vs history length
+
+Usage (from the Data folder):
+    python benchmarks/bench_fetch_memory.py [--years 1 4 16] [--json out.json]
+
+Downloads hourly history of increasing length from the local CoinDesk stand-in
+and records the tracemalloc peak of:
+- in-memory: every page collected into one list and sorted (the old fetcher)
+- spooled:   pages streamed to segment files and merged (CoinDeskData.fetch_to_csv)
+
+The spooled peak should stay flat while the in-memory peak grows with history.
+"""
+import os
+import csv
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, DATA_DIR)
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fetchdata import CSV_HEADERS, CoinDeskData  # noqa: E402
+from spool import PageSpool  # noqa: E402
+from standin import StandInServer  # noqa: E402
+
+
+class ListSink:
+    """Collects pages in memory, like the fetcher did before spooling"""
+
+    def __init__(self):
+        self.data = []
+
+    def add_page(self, records):
+        self.data.extend(records)
+
+    def reset(self):
+        self.data.clear()
+
+    @property
+    def rows(self):
+        return len(self.data)
+
+
+def drive(client, sink):
+    """Run the pagination without the production inter-page sleep"""
+    pager = client.paginate(sink)
+    to_ts = next(pager)
+    try:
+        while True:
+            to_ts = pager.send(client.fetch_page(to_ts))
+    except StopIteration:
+        pass
+
+
+def save_to_csv(client, data):
+    """Write collected rows in one go, as the fetcher did before spooling"""
+    filename = client.csv_path()
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, mode='w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADERS)
+        for rec in data:
+            writer.writerow(client.format_row(rec))
+
+
+def run_in_memory(client):
+    sink = ListSink()
+    drive(client, sink)
+    sink.data.sort(key=lambda x: x["TIMESTAMP"])
+    save_to_csv(client, sink.data)
+    return sink.rows
+
+
+def run_spooled(client):
+    with PageSpool(client.format_row) as spool:
+        drive(client, spool)
+        return client.save_spool(spool)
+
+
+def measure(runner, years, base_url):
+    start_date = (datetime.now() - timedelta(days=365 * years)).strftime("%Y-%m-%d")
+    client = CoinDeskData("BTC", "BTC-INR", start_date, "hours", api_key="bench", base_url=base_url)
+    workdir = tempfile.mkdtemp(prefix='fetch-memory-')
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)  # the fetcher writes data-hours/ relative to the working directory
+    try:
+        tracemalloc.start()
+        started = time.perf_counter()
+        rows = runner(client)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {'rows': rows, 'peak_mib': round(peak / 2 ** 20, 2), 'seconds': round(elapsed, 2)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--json', dest='json_path')
+    args = parser.parse_args()
+
+    server = StandInServer(latency=0, rate_limit=0).start()
+    results = []
+    try:
+        for years in args.years:
+            results.append({
+                'years': years,
+                'in_memory': measure(run_in_memory, years, server.base_url),
+                'spooled': measure(run_spooled, years, server.base_url),
+            })
+    finally:
+        server.stop()
+
+    print(f"{'years':>5} {'rows':>8} {'in-memory MiB':>14} {'spooled MiB':>12}")
+    for r in results:
+        print(f"{r['years']:>5} {r['spooled']['rows']:>8} {r['in_memory']['peak_mib']:>14} {r['spooled']['peak_mib']:>12}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
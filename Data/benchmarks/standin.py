@@ -0,0 +1,124 @@
+"""
+Local stand-in for the CoinDesk historical OHLCV endpoint
+
+Serves /index/cc/v1/historical/{days,hours} with deterministic synthetic candles,
+a fixed per-request latency and a server-side rate limit that answers 429 with
+Retry-After and X-RateLimit-* headers, like the real API.
+
+    server = StandInServer(latency=0.05, rate_limit=20).start()
+    ... CoinDeskData(..., base_url=server.base_url) ...
+    server.stop()
+"""
+import json
+import math
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+INTERVAL_SECONDS = {"days": 86400, "hours": 3600}
+
+
+def synthetic_candle(instrument, ts):
+    seed = sum(map(ord, instrument))
+    base = 100.0 + seed
+    close = base * (1.5 + math.sin(ts / 864000.0 + seed))
+    return {
+        "TIMESTAMP": ts,
+        "OPEN": close * 0.995,
+        "HIGH": close * 1.01,
+        "LOW": close * 0.99,
+        "CLOSE": close,
+        "VOLUME": 1000.0 + ts % 997,
+        "QUOTE_VOLUME": (1000.0 + ts % 997) * close,
+    }
+
+
+class StandInServer:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.05, rate_limit=20.0, first_ts=None):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.first_ts = first_ts
+        self.requests = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _admit(self):
+        """Fixed one-second window limiter; returns (allowed, remaining, reset seconds)"""
+        with self._lock:
+            self.requests += 1
+            now = time.monotonic()
+            if now - self._window_start >= 1.0:
+                self._window_start = now
+                self._window_count = 0
+            reset = 1.0 - (now - self._window_start)
+            if self.rate_limit and self._window_count >= self.rate_limit:
+                self.throttled += 1
+                return False, 0, reset
+            self._window_count += 1
+            remaining = int(self.rate_limit - self._window_count) if self.rate_limit else 1000
+            return True, remaining, reset
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                interval = url.path.rstrip("/").rsplit("/", 1)[-1]
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                allowed, remaining, reset = server._admit()
+                if server.latency:
+                    time.sleep(server.latency)
+
+                headers = {
+                    "X-RateLimit-Remaining-Second": str(remaining),
+                    "X-RateLimit-Reset-Second": f"{reset:.3f}",
+                }
+                if not allowed:
+                    headers["Retry-After"] = f"{reset:.3f}"
+                    return self._send(429, {"Err": {"message": "rate limited"}}, headers)
+                if interval not in INTERVAL_SECONDS:
+                    return self._send(404, {"Err": {"message": "unknown interval"}}, headers)
+
+                step = INTERVAL_SECONDS[interval]
+                limit = int(params.get("limit", 1000))
+                to_ts = int(params.get("to_ts", time.time())) // step * step
+                first_ts = server.first_ts or 0
+                timestamps = [ts for ts in range(to_ts - (limit - 1) * step, to_ts + 1, step) if ts >= first_ts]
+                data = [synthetic_candle(params.get("instrument", ""), ts) for ts in timestamps]
+                self._send(200, {"Data": data, "Err": {}}, headers)
+
+            def _send(self, status, body, headers):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
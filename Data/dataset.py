@@ -0,0 +1,179 @@
+"""
+Columnar dataset cache for the CoinDesk CSV exports
+
+Each CSV in data-days/ and data-hours/ is converted once into typed column
+files (.npy) under .cache/<interval>/<COIN>/:
+- timestamp: int64 UTC seconds of the candle open, sorted ascending
+- open, high, low, close, volume, quote_volume: float64
+
+A manifest records the SHA-256 of every source CSV. A CSV is only re-converted
+when its checksum changes; unchanged files are served as memory-mapped arrays.
+"""
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(DATA_DIR, '.cache')
+MANIFEST_NAME = 'manifest.json'
+FORMAT_VERSION = 1
+
+INTERVALS = ('days', 'hours')
+DATE_FORMATS = {'days': '%Y-%m-%d', 'hours': '%Y-%m-%d %H:%M'}
+
+# CSV header -> column file name
+COLUMNS = {
+    'Open': 'open',
+    'High': 'high',
+    'Low': 'low',
+    'Close': 'close',
+    'Volume': 'volume',
+    'Quote Volume': 'quote_volume',
+}
+
+
+def file_checksum(path, chunk_size=1 << 20):
+    """Return the SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DatasetCache:
+    """Converts CSVs into memory-mappable column files and serves them by coin and interval"""
+
+    def __init__(self, data_dir=DATA_DIR, cache_dir=None):
+        self.data_dir = data_dir
+        self.cache_dir = cache_dir or os.path.join(data_dir, '.cache')
+        self.manifest_path = os.path.join(self.cache_dir, MANIFEST_NAME)
+        self.manifest = self._read_manifest()
+
+    def csv_path(self, coin, interval):
+        return os.path.join(self.data_dir, f"data-{interval}", f"{coin}_{interval}_data.csv")
+
+    def available(self):
+        """List (coin, interval) pairs that have a source CSV"""
+        pairs = []
+        for interval in INTERVALS:
+            folder = os.path.join(self.data_dir, f"data-{interval}")
+            if not os.path.isdir(folder):
+                continue
+            suffix = f"_{interval}_data.csv"
+            for filename in sorted(os.listdir(folder)):
+                if filename.endswith(suffix):
+                    pairs.append((filename[:-len(suffix)], interval))
+        return pairs
+
+    def load(self, coin, interval):
+        """
+        Return a dict of read-only memory-mapped arrays for one dataset.
+        Keys are 'timestamp' plus the lowercase OHLCV column names.
+        """
+        entry = self.ensure(coin, interval)
+        folder = self._entry_dir(coin, interval)
+        return {
+            name: np.load(os.path.join(folder, f"{name}.npy"), mmap_mode='r')
+            for name in entry['columns']
+        }
+
+    def load_frame(self, coin, interval):
+        """Return the dataset as a DataFrame shaped like the source CSV (Date column as datetime)"""
+        arrays = self.load(coin, interval)
+        frame = pd.DataFrame({header: arrays[name] for header, name in COLUMNS.items()})
+        frame.insert(0, 'Date', pd.to_datetime(arrays['timestamp'], unit='s'))
+        return frame
+
+    def ensure(self, coin, interval):
+        """Convert the CSV if it is new or its checksum changed; return its manifest entry"""
+        source = self.csv_path(coin, interval)
+        if not os.path.exists(source):
+            raise FileNotFoundError(f"No CSV for {coin} ({interval}): {source}")
+
+        key = f"{interval}/{coin}"
+        entry = self.manifest['entries'].get(key)
+        stat = os.stat(source)
+
+        if entry and self._columns_present(coin, interval, entry):
+            # Fast path: size and mtime unchanged means the checksum is unchanged too
+            if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                return entry
+            checksum = file_checksum(source)
+            if checksum == entry['sha256']:
+                entry['size'] = stat.st_size
+                entry['mtime_ns'] = stat.st_mtime_ns
+                self._write_manifest()
+                return entry
+        else:
+            checksum = file_checksum(source)
+
+        entry = self._convert(coin, interval, source, checksum, stat)
+        self.manifest['entries'][key] = entry
+        self._write_manifest()
+        return entry
+
+    def refresh(self):
+        """Make sure every available CSV has an up-to-date columnar copy"""
+        return {f"{interval}/{coin}": self.ensure(coin, interval) for coin, interval in self.available()}
+
+    def _convert(self, coin, interval, source, checksum, stat):
+        df = pd.read_csv(source)
+        dates = pd.to_datetime(df['Date'], format=DATE_FORMATS[interval])
+        timestamps = dates.values.astype('datetime64[s]').astype(np.int64)
+        order = np.argsort(timestamps, kind='stable')
+
+        columns = {'timestamp': timestamps[order]}
+        for header, name in COLUMNS.items():
+            columns[name] = df[header].to_numpy(dtype=np.float64)[order]
+
+        folder = self._entry_dir(coin, interval)
+        os.makedirs(folder, exist_ok=True)
+        for name, values in columns.items():
+            final_path = os.path.join(folder, f"{name}.npy")
+            tmp_path = final_path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.ascontiguousarray(values))
+            os.replace(tmp_path, final_path)
+
+        print(f"✅ Cached {interval} data for {coin} ({len(timestamps)} rows)")
+        return {
+            'source': os.path.relpath(source, self.data_dir),
+            'sha256': checksum,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'rows': int(len(timestamps)),
+            'columns': {name: str(values.dtype) for name, values in columns.items()},
+        }
+
+    def _entry_dir(self, coin, interval):
+        return os.path.join(self.cache_dir, interval, coin)
+
+    def _columns_present(self, coin, interval, entry):
+        folder = self._entry_dir(coin, interval)
+        return all(os.path.exists(os.path.join(folder, f"{name}.npy")) for name in entry['columns'])
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == FORMAT_VERSION:
+                return manifest
+        except (OSError, ValueError):
+            pass
+        return {'version': FORMAT_VERSION, 'entries': {}}
+
+    def _write_manifest(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+
+if __name__ == '__main__':
+    cache = DatasetCache()
+    for key, entry in cache.refresh().items():
+        print(f"{key}: {entry['rows']} rows, sha256={entry['sha256'][:12]}")
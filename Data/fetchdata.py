@@ -4,11 +4,20 @@ import os
 import json
 import csv
 import time
+import calendar
+import argparse
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
+from spool import PageSpool
+
+INTERVAL_SECONDS = {"days": 86400, "hours": 3600}
+DATE_FORMATS = {"days": "%Y-%m-%d", "hours": "%Y-%m-%d %H:%M"}
+CSV_HEADERS = ["Date", "Open", "High", "Low", "Close", "Volume", "Quote Volume"]
+
 class CoinDeskData:
-    def __init__(self, coin, instrument, start_date, interval, api_key, market="cadli", limit=1000):
+    def __init__(self, coin, instrument, start_date, interval, api_key, market="cadli", limit=1000,
+                 base_url="https://data-api.coindesk.com"):
         self.coin = coin
         self.instrument = instrument
         self.start_date = datetime.strptime(start_date, "%Y-%m-%d")
@@ -16,7 +25,7 @@ class CoinDeskData:
         self.api_key = api_key
         self.market = market
         self.limit = limit
-        self.url = f'https://data-api.coindesk.com/index/cc/v1/historical/{interval}'
+        self.url = f'{base_url}/index/cc/v1/historical/{interval}'
         
         self.headers = {
             "Content-type": "application/json; charset=UTF-8",
@@ -36,33 +45,49 @@ class CoinDeskData:
         
         self.min_timestamp = self.min_timestamps.get(self.instrument, int(self.start_date.timestamp()))
 
-    def fetch_all_data(self):
+    def page_params(self, to_ts, limit=None):
+        return {
+            "market": self.market,
+            "instrument": self.instrument,
+            "limit": limit or self.limit,
+            "aggregate": 1,
+            "fill": "true",
+            "apply_mapping": "true",
+            "response_format": "JSON",
+            "to_ts": to_ts
+        }
+
+    def fetch_page(self, to_ts, limit=None):
+        """Request one page of up to `limit` candles ending at `to_ts`; returns the parsed JSON or None"""
+        response = requests.get(self.url, params=self.page_params(to_ts, limit), headers=self.headers)
+        try:
+            res_json = response.json()
+        except Exception as e:
+            print(f"⚠ Failed to parse JSON for {self.coin}: {e}")
+            return None
+
+        if response.status_code != 200:
+            print(f"⚠ Error {response.status_code} for {self.coin} ({self.interval})")
+            print(res_json)
+            return None
+
+        return res_json
+
+    def paginate(self, spool):
+        """
+        Generator driving the backward pagination from now to the coin's first candle.
+
+        Yields the `to_ts` of the next page to request and expects the parsed page
+        (or None on failure) to be sent back. Pages go straight to `spool`, so memory
+        stays at one page regardless of history length. Shared by the threaded
+        fetcher below and the asyncio fetcher in async_fetch.py.
+        """
         to_ts = int(datetime.now().timestamp())
-        all_data = []
         local_min_ts = max(self.min_timestamp, int(self.start_date.timestamp()))
 
         while True:
-            params = {
-                "market": self.market,
-                "instrument": self.instrument,
-                "limit": self.limit,
-                "aggregate": 1,
-                "fill": "true",
-                "apply_mapping": "true",
-                "response_format": "JSON",
-                "to_ts": to_ts
-            }
-
-            response = requests.get(self.url, params=params, headers=self.headers)
-            try:
-                res_json = response.json()
-            except Exception as e:
-                print(f"⚠ Failed to parse JSON for {self.coin}: {e}")
-                break
-
-            if response.status_code != 200:
-                print(f"⚠ Error {response.status_code} for {self.coin} ({self.interval})")
-                print(res_json)
+            res_json = yield to_ts
+            if res_json is None:
                 break
 
             data_chunk = res_json.get("Data", [])
@@ -77,20 +102,166 @@ class CoinDeskData:
                     print(f"⚠ Adjusting min timestamp for {self.coin} ({self.interval}) → {suggested_ts}")
                     local_min_ts = suggested_ts
                     to_ts = int(datetime.now().timestamp())
-                    all_data.clear()
+                    spool.reset()
                     continue
 
-            all_data.extend(data_chunk)
+            spool.add_page(data_chunk)
             earliest_ts = min(d["TIMESTAMP"] for d in data_chunk)
 
             if earliest_ts <= local_min_ts or len(data_chunk) < self.limit:
                 break
 
             to_ts = earliest_ts - 1
-            time.sleep(0.5)
 
-        all_data.sort(key=lambda x: x["TIMESTAMP"])
-        return all_data
+    def fetch_to_csv(self):
+        """Download the full history page by page and write it to the CSV; returns rows written"""
+        with PageSpool(self.format_row) as spool:
+            pager = self.paginate(spool)
+            to_ts = next(pager)
+            try:
+                while True:
+                    res_json = self.fetch_page(to_ts)
+                    to_ts = pager.send(res_json)
+                    time.sleep(0.5)
+            except StopIteration:
+                pass
+            return self.save_spool(spool)
+
+    def save_spool(self, spool):
+        if not spool.rows:
+            print(f"⚠ No data for {self.coin} ({self.interval})")
+            return 0
+
+        filename = self.csv_path()
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        rows = spool.merge_to(filename, CSV_HEADERS)
+        self.remove_cursor()
+        print(f"✅ Saved {self.interval} data for {self.coin} → {filename} ({rows} rows)")
+        return rows
+
+    def fetch_incremental(self):
+        """
+        Append only the candles missing from the existing CSV.
+
+        Pages forward from the last stored timestamp up to the latest closed candle.
+        Each page is appended and fsynced, then the cursor file is replaced atomically
+        with the new last timestamp and byte size. On restart, anything past the
+        committed size (an interrupted append) is truncated away before resuming.
+
+        Returns (rows_appended, requests_made), or None when there is no CSV yet.
+        """
+        filename = self.csv_path()
+        if not os.path.exists(filename):
+            return None
+
+        last_ts = self.recover_cursor(filename)
+        if last_ts is None:
+            return None
+
+        step = INTERVAL_SECONDS[self.interval]
+        now_ts = int(datetime.now().timestamp())
+        last_closed_ts = (now_ts // step) * step - step  # open time of the newest closed candle
+
+        appended = 0
+        requests_made = 0
+        while last_ts < last_closed_ts:
+            to_ts = min(last_ts + self.limit * step, last_closed_ts)
+            res_json = self.fetch_page(to_ts, limit=(to_ts - last_ts) // step)
+            requests_made += 1
+            if res_json is None:
+                break
+
+            page = [d for d in res_json.get("Data", []) if last_ts < d["TIMESTAMP"] <= last_closed_ts]
+            if not page:
+                print(f"⚠ No new candles returned for {self.coin} ({self.interval}) up to {to_ts}")
+                break
+
+            page.sort(key=lambda x: x["TIMESTAMP"])
+            self.append_rows(filename, page)
+            last_ts = page[-1]["TIMESTAMP"]
+            appended += len(page)
+
+        print(f"✅ Appended {appended} {self.interval} rows for {self.coin} → {filename} ({requests_made} requests)")
+        return appended, requests_made
+
+    def csv_path(self):
+        return os.path.join(f"data-{self.interval}", f"{self.coin}_{self.interval}_data.csv")
+
+    def cursor_path(self):
+        return os.path.join(f"data-{self.interval}", f".{self.coin}_{self.interval}.cursor")
+
+    def remove_cursor(self):
+        """A full rewrite invalidates any incremental cursor"""
+        if os.path.exists(self.cursor_path()):
+            os.remove(self.cursor_path())
+
+    def read_cursor(self):
+        try:
+            with open(self.cursor_path(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_cursor(self, last_ts, size):
+        path = self.cursor_path()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"last_ts": last_ts, "size": size}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def recover_cursor(self, filename):
+        """Return the last committed timestamp, rolling back any uncommitted tail of the CSV"""
+        size = os.path.getsize(filename)
+        cursor = self.read_cursor()
+
+        if cursor and cursor["size"] <= size:
+            if size > cursor["size"]:
+                print(f"⚠ Rolling back interrupted append for {self.coin} ({self.interval})")
+                with open(filename, 'r+b') as f:
+                    f.truncate(cursor["size"])
+            return cursor["last_ts"]
+
+        # No cursor (file came from a full fetch): its last row may be a candle that was
+        # still open when written, so drop it and fetch it again.
+        tail = self.read_last_row(filename)
+        if tail is None:
+            return None
+        last_ts, line_start = tail
+        previous_ts = last_ts - INTERVAL_SECONDS[self.interval]
+        self.write_cursor(previous_ts, line_start)
+        with open(filename, 'r+b') as f:
+            f.truncate(line_start)
+        return previous_ts
+
+    def read_last_row(self, filename, block_size=4096):
+        """Return (timestamp, byte offset of the line) for the last data row, or None"""
+        with open(filename, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            block = min(end, block_size)
+            f.seek(end - block)
+            chunk = f.read(block)
+
+        stripped = chunk.rstrip(b"\r\n")
+        line = stripped[stripped.rfind(b"\n") + 1:]
+        line_start = end - block + stripped.rfind(b"\n") + 1
+        date_str = line.split(b",", 1)[0].decode('utf-8')
+        try:
+            dt = datetime.strptime(date_str, DATE_FORMATS[self.interval])
+        except ValueError:
+            return None  # header only
+        return calendar.timegm(dt.timetuple()), line_start
+
+    def append_rows(self, filename, data):
+        with open(filename, mode='a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            for rec in data:
+                writer.writerow(self.format_row(rec))
+            f.flush()
+            os.fsync(f.fileno())
+        self.write_cursor(data[-1]["TIMESTAMP"], os.path.getsize(filename))
 
     def format_timestamp(self, ts):
         dt = datetime.utcfromtimestamp(ts)
@@ -98,41 +269,37 @@ class CoinDeskData:
             return dt.strftime("%Y-%m-%d %H:%M")
         return dt.strftime("%Y-%m-%d")
 
-    def save_to_csv(self, data):
-        folder = f"data-{self.interval}"
-        os.makedirs(folder, exist_ok=True)
-        filename = os.path.join(folder, f"{self.coin}_{self.interval}_data.csv")
-
-        headers = ["Date", "Open", "High", "Low", "Close", "Volume", "Quote Volume"]
+    def format_row(self, rec):
+        return [
+            self.format_timestamp(rec['TIMESTAMP']),
+            round(rec.get('OPEN', 0), 2),
+            round(rec.get('HIGH', 0), 2),
+            round(rec.get('LOW', 0), 2),
+            round(rec.get('CLOSE', 0), 2),
+            round(rec.get('VOLUME', 0), 2),
+            round(rec.get('QUOTE_VOLUME', 0), 2)
+        ]
 
-        with open(filename, mode='w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(headers)
-            for rec in data:
-                writer.writerow([
-                    self.format_timestamp(rec['TIMESTAMP']),
-                    round(rec.get('OPEN', 0), 2),
-                    round(rec.get('HIGH', 0), 2),
-                    round(rec.get('LOW', 0), 2),
-                    round(rec.get('CLOSE', 0), 2),
-                    round(rec.get('VOLUME', 0), 2),
-                    round(rec.get('QUOTE_VOLUME', 0), 2)
-                ])
-        print(f"✅ Saved {self.interval} data for {self.coin} → {filename} ({len(data)} rows)")
-
-def fetch_and_save(coin, info, interval, api_key):
+def fetch_and_save(coin, info, interval, api_key, incremental=False):
     client = CoinDeskData(coin, instrument=info['instrument'], start_date=info['start_date'], interval=interval,
                           api_key=api_key, market="cadli")
-    print(f"⏳ Fetching {interval} data for {coin}...")
-    data = client.fetch_all_data()
+    if incremental:
+        print(f"⏳ Refreshing {interval} data for {coin}...")
+        if client.fetch_incremental() is not None:
+            return
+        print(f"⚠ No existing {interval} data for {coin}, falling back to a full fetch")
 
-    if not data:
-        print(f"⚠ No data for {coin} ({interval})")
-        return
-
-    client.save_to_csv(data)
+    print(f"⏳ Fetching {interval} data for {coin}...")
+    client.fetch_to_csv()
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fetch CoinDesk OHLCV history into data-days/ and data-hours/")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only fetch candles newer than the existing CSVs (resumes after a crash)")
+    parser.add_argument('--derive-daily', action='store_true',
+                        help="skip daily downloads and build data-days from the hourly data instead")
+    args = parser.parse_args()
+
     # Always load the project-level .env (one directory above Data)
     ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
     load_dotenv(dotenv_path=os.path.join(ROOT_DIR, '.env'))
@@ -145,7 +312,15 @@ if __name__ == '__main__':
     with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
         futures = []
         for coin, info in COINS.items():
-            for interval in ['days', 'hours']:
-                futures.append(executor.submit(fetch_and_save, coin, info, interval, API_KEY))
+            for interval in (['hours'] if args.derive_daily else ['days', 'hours']):
+                futures.append(executor.submit(fetch_and_save, coin, info, interval, API_KEY, args.incremental))
         for future in as_completed(futures):
             future.result()
+
+    if args.derive_daily:
+        from dataset import DatasetCache
+        from resample import derive_all
+
+        failed = derive_all(DatasetCache(), list(COINS), write=True)
+        if failed:
+            raise SystemExit(f"Daily data not replaced for {', '.join(failed)}")
@@ -0,0 +1,175 @@
+"""
+Derive UTC daily OHLCV candles from the hourly dataset
+
+Vectorised over the columnar cache (dataset.py): hours are grouped by UTC day
+with np.*.reduceat, gaps in the hourly series are reported, and the derived
+candles are checked against fetched daily data before replacing it: a coin
+whose candles differ is not written, and the script exits non-zero.
+
+Usage (from the Data folder):
+    python resample.py [COIN ...] [--write] [--tolerance 0.005]
+"""
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+from dataset import DatasetCache, DATA_DIR
+
+DAY = 86400
+HOUR = 3600
+PRICE_COLUMNS = ('open', 'high', 'low', 'close')
+
+
+def resample_daily(hourly):
+    """
+    Aggregate hourly column arrays into daily ones.
+    Returns a dict with the same keys plus 'hours' (candles seen per day).
+    """
+    ts = np.asarray(hourly['timestamp'])
+    if len(ts) == 0:
+        return {key: np.asarray(values)[:0] for key, values in hourly.items()} | {'hours': np.zeros(0, dtype=np.int64)}
+
+    day = ts - ts % DAY
+    starts = np.flatnonzero(np.r_[True, day[1:] != day[:-1]])
+    ends = np.r_[starts[1:], len(ts)] - 1
+
+    return {
+        'timestamp': day[starts],
+        'open': np.asarray(hourly['open'])[starts],
+        'high': np.maximum.reduceat(hourly['high'], starts),
+        'low': np.minimum.reduceat(hourly['low'], starts),
+        'close': np.asarray(hourly['close'])[ends],
+        'volume': np.add.reduceat(hourly['volume'], starts),
+        'quote_volume': np.add.reduceat(hourly['quote_volume'], starts),
+        'hours': ends - starts + 1,
+    }
+
+
+def find_gaps(timestamps, step=HOUR):
+    """Return (last timestamp before the gap, number of missing candles) for every hole in the series"""
+    ts = np.asarray(timestamps)
+    deltas = np.diff(ts)
+    holes = np.flatnonzero(deltas > step)
+    return [(int(ts[i]), int(deltas[i] // step) - 1) for i in holes]
+
+
+def compare_with_daily(derived, daily, tolerance=0.005):
+    """
+    Compare derived candles with fetched daily candles on overlapping complete days.
+    Returns per-column max relative difference and how many days exceed `tolerance`.
+    """
+    complete = derived['hours'] == 24
+    common, d_idx, f_idx = np.intersect1d(derived['timestamp'][complete], daily['timestamp'], return_indices=True)
+    d_idx = np.flatnonzero(complete)[d_idx]
+
+    report = {'overlap_days': int(len(common)), 'columns': {}}
+    for column in PRICE_COLUMNS + ('volume',):
+        ours = np.asarray(derived[column])[d_idx]
+        theirs = np.asarray(daily[column])[f_idx]
+        rel = np.abs(ours - theirs) / np.maximum(np.abs(theirs), 1e-12)
+        report['columns'][column] = {
+            'max_rel_diff': float(rel.max()) if len(rel) else 0.0,
+            'days_over_tolerance': int((rel > tolerance).sum()),
+        }
+    report['consistent'] = all(c['days_over_tolerance'] == 0 for c in report['columns'].values())
+    return report
+
+
+def write_daily_csv(coin, derived, data_dir=DATA_DIR, fetched=None):
+    """
+    Write the daily CSV in the fetcher's layout, replacing the fetched file.
+    Complete derived days replace fetched ones; every other fetched day (gaps
+    in the hourly data, days before it starts) is kept as it was.
+    """
+    keep = derived['hours'] == 24
+    keys = ('timestamp',) + PRICE_COLUMNS + ('volume', 'quote_volume')
+    columns = {key: np.asarray(derived[key])[keep] for key in keys}
+    if fetched is not None and len(fetched['timestamp']):
+        kept = ~np.isin(fetched['timestamp'], columns['timestamp'])
+        columns = {key: np.concatenate([values, np.asarray(fetched[key])[kept]]) for key, values in columns.items()}
+        order = np.argsort(columns['timestamp'], kind='stable')
+        columns = {key: values[order] for key, values in columns.items()}
+        kept = int(kept.sum())
+    else:
+        kept = 0
+
+    frame = pd.DataFrame({
+        'Date': pd.to_datetime(columns['timestamp'], unit='s').strftime('%Y-%m-%d'),
+        'Open': columns['open'],
+        'High': columns['high'],
+        'Low': columns['low'],
+        'Close': columns['close'],
+        'Volume': columns['volume'],
+        'Quote Volume': columns['quote_volume'],
+    }).round(2)
+
+    folder = os.path.join(data_dir, 'data-days')
+    os.makedirs(folder, exist_ok=True)
+    filename = os.path.join(folder, f"{coin}_days_data.csv")
+    tmp_path = filename + '.tmp'
+    frame.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, filename)
+
+    # The file no longer matches any incremental-fetch cursor (see CoinDeskData.cursor_path)
+    cursor = os.path.join(folder, f".{coin}_days.cursor")
+    if os.path.exists(cursor):
+        os.remove(cursor)
+    print(f"✅ Derived daily data for {coin} → {filename} ({len(frame)} rows, {kept} kept from fetched data)")
+    return filename
+
+
+def derive_coin(cache, coin, write=False, tolerance=0.005):
+    """
+    Resample one coin, report gaps and consistency; optionally write the daily
+    CSV. The write is skipped when the derived candles differ from the fetched
+    daily data; the result's 'written' says whether it happened.
+    """
+    derived = resample_daily(cache.load(coin, 'hours'))
+    gaps = find_gaps(cache.load(coin, 'hours')['timestamp'])
+    incomplete = int((derived['hours'][:-1] != 24).sum())  # the last day may still be in progress
+
+    fetched = consistency = None
+    if os.path.exists(cache.csv_path(coin, 'days')):
+        fetched = cache.load(coin, 'days')
+        consistency = compare_with_daily(derived, fetched, tolerance)
+
+    print(f"{coin}: {len(derived['timestamp'])} days from hourly data, "
+          f"{len(gaps)} gaps ({sum(n for _, n in gaps)} missing hours), {incomplete} incomplete days")
+    if consistency is not None:
+        worst = max(c['max_rel_diff'] for c in consistency['columns'].values())
+        status = "✅ consistent" if consistency['consistent'] else "⚠ differs"
+        print(f"   vs fetched daily: {status} over {consistency['overlap_days']} days (max rel diff {worst:.4%})")
+
+    written = False
+    if write and consistency is not None and not consistency['consistent']:
+        print(f"   ❌ Not replacing the daily data for {coin}: derived candles differ from it")
+    elif write:
+        write_daily_csv(coin, derived, cache.data_dir, fetched)
+        written = True
+    return {'gaps': gaps, 'incomplete_days': incomplete, 'consistency': consistency, 'written': written}
+
+
+def derive_all(cache, coins, write=False, tolerance=0.005):
+    """derive_coin() for each coin; returns the coins whose daily CSV should have been written but wasn't"""
+    failed = []
+    for coin in coins:
+        result = derive_coin(cache, coin, write=write, tolerance=tolerance)
+        if write and not result['written']:
+            failed.append(coin)
+    return failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Derive daily candles from hourly data")
+    parser.add_argument('coins', nargs='*', help="coins to resample (default: every coin with hourly data)")
+    parser.add_argument('--write', action='store_true',
+                        help="replace data-days CSVs with the derived candles where they agree with them")
+    parser.add_argument('--tolerance', type=float, default=0.005)
+    args = parser.parse_args()
+
+    cache = DatasetCache()
+    coins = args.coins or [coin for coin, interval in cache.available() if interval == 'hours']
+    failed = derive_all(cache, coins, write=args.write, tolerance=args.tolerance)
+    if failed:
+        raise SystemExit(f"Daily data not replaced for {', '.join(failed)}")
@@ -0,0 +1,93 @@
+"""
+Disk-backed page spool for the CoinDesk fetchers
+
+Pages are written to small sorted segment files as they arrive, so only one
+page is held in memory at a time. merge_to() k-way merges the segments in
+timestamp order (dropping duplicate candles) into the final CSV, replacing it
+atomically.
+"""
+import os
+import csv
+import heapq
+import shutil
+import tempfile
+
+MAX_FAN_IN = 64  # segments merged per pass; keeps open file handles bounded
+
+
+class PageSpool:
+    def __init__(self, format_row, directory=None):
+        self.format_row = format_row
+        self.directory = directory
+        self.tmp_dir = None
+        self.segments = []
+        self.rows = 0
+
+    def __enter__(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='coindesk-spool-', dir=self.directory)
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_page(self, records):
+        """Write one page to its own segment, sorted by timestamp"""
+        path = os.path.join(self.tmp_dir, f"segment-{len(self.segments):06d}.csv")
+        with open(path, mode='w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            for rec in sorted(records, key=lambda x: x["TIMESTAMP"]):
+                writer.writerow([rec["TIMESTAMP"], *self.format_row(rec)])
+        self.segments.append(path)
+        self.rows += len(records)
+
+    def reset(self):
+        """Discard everything spooled so far"""
+        for path in self.segments:
+            os.remove(path)
+        self.segments = []
+        self.rows = 0
+
+    def merge_to(self, filename, headers):
+        """Merge all segments into `filename`; returns the number of rows written"""
+        segments = self.segments
+        generation = 0
+        while len(segments) > MAX_FAN_IN:
+            merged = []
+            for i in range(0, len(segments), MAX_FAN_IN):
+                path = os.path.join(self.tmp_dir, f"merged-{generation}-{i:06d}.csv")
+                with open(path, mode='w', newline='', encoding='utf-8') as f:
+                    self._merge(segments[i:i + MAX_FAN_IN], csv.writer(f), keep_timestamp=True)
+                merged.append(path)
+            segments = merged
+            generation += 1
+
+        tmp_path = filename + '.tmp'
+        with open(tmp_path, mode='w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            written = self._merge(segments, writer, keep_timestamp=False)
+        os.replace(tmp_path, filename)
+        return written
+
+    def close(self):
+        if self.tmp_dir:
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+            self.tmp_dir = None
+
+    @staticmethod
+    def _merge(paths, writer, keep_timestamp):
+        files = [open(path, newline='', encoding='utf-8') for path in paths]
+        try:
+            readers = [((int(row[0]), row) for row in csv.reader(f)) for f in files]
+            written = 0
+            last_ts = None
+            for ts, row in heapq.merge(*readers, key=lambda item: item[0]):
+                if ts == last_ts:
+                    continue
+                last_ts = ts
+                writer.writerow(row if keep_timestamp else row[1:])
+                written += 1
+            return written
+        finally:
+            for f in files:
+                f.close()
@@ -1,7 +1,9 @@
-""" 
+"""
 ASGI config for CryptoSight project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Under ASGI the prediction, task-status and chatbot endpoints are served by the
+native async views in predict/async_views.py (ASYNC_VIEWS=0 keeps the sync ones).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -12,5 +14,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'CryptoSight.settings')
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
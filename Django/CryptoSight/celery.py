@@ -2,7 +2,7 @@ from __future__ import absolute_import, unicode_literals
 import os
 import logging
 from celery import Celery
-from celery.signals import worker_ready
+from celery.signals import worker_process_shutdown, worker_ready, task_postrun
 
 # Set the default Django settings module for 'celery'
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'CryptoSight.settings')
@@ -40,10 +40,27 @@ def warmup_models(sender=None, **kwargs):
                     continue
                 # Run a tiny forward-pass to prime TF runtime and caches
                 try:
-                    _ = get_live_prediction(symbol, interval, steps_ahead=1, usd_to_inr=float(os.environ.get('USD_TO_INR', '88.75')))
+                    _ = get_live_prediction(symbol, interval, steps_ahead=1)
                 except Exception:
                     # Prediction priming can fail if network is offline; that's fine
                     pass
         logger.info("Celery warm-up complete: models preloaded")
     except Exception as exc:
         logger.warning(f"Celery warm-up skipped: {exc}")
+
+
+# Dump this worker's metrics after every task so /predict/metrics/ sees fresh numbers
+@task_postrun.connect
+def flush_metrics(sender=None, **kwargs):
+    try:
+        from predict import metrics
+        metrics.flush()
+    except OSError as exc:
+        logging.getLogger(__name__).warning("Metrics flush failed: %s", exc)
+
+
+# Write queued prediction history before a worker process exits
+@worker_process_shutdown.connect
+def flush_history_buffer(sender=None, **kwargs):
+    from predict import history_buffer
+    history_buffer.flush()
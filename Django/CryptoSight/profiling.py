@@ -0,0 +1,241 @@
+"""
+Opt-in request profiling
+
+ProfilingMiddleware profiles a random PROFILING_SAMPLE_RATE fraction of
+requests. Staff users can also force a profile with the `X-Profile: 1` header
+or a `?__profile=1` query flag. A sampler thread walks the request thread's
+stack every PROFILING_INTERVAL seconds, so the view itself runs unmodified.
+Under ASGI with async views the middleware stays async and samples the event
+loop thread instead: the profile then also holds whatever other requests ran
+on the loop meanwhile, and misses work handed to thread pools.
+
+Profiles are stored as folded stacks (`frame;frame;frame count` per line,
+ready for flamegraph.pl or speedscope) next to a JSON metadata file in
+PROFILING_DIR. Only the newest PROFILING_MAX_PROFILES are kept. Staff can
+browse the slowest captures per view at /admin/profiles/.
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404
+from django.shortcuts import render
+from django.utils import timezone
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_FLAG = '__profile'
+PROFILES_PER_VIEW = 10
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack on a timer from a background thread"""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileStore:
+    """Capped on-disk store of folded profiles with JSON metadata"""
+
+    def __init__(self, directory=None, max_profiles=None):
+        self.directory = str(directory or settings.PROFILING_DIR)
+        self.max_profiles = max_profiles or settings.PROFILING_MAX_PROFILES
+
+    def save(self, meta, folded):
+        os.makedirs(self.directory, exist_ok=True)
+        profile_id = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+        meta = dict(meta, id=profile_id)
+        # Write the profile first so a listed entry always has its stacks
+        self._write(f"{profile_id}.folded", folded)
+        self._write(f"{profile_id}.json", json.dumps(meta))
+        self.prune()
+        return profile_id
+
+    def list(self):
+        entries = []
+        for name in self._ids():
+            try:
+                with open(os.path.join(self.directory, f"{name}.json"), encoding='utf-8') as f:
+                    entries.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return entries
+
+    def folded_path(self, profile_id):
+        path = os.path.join(self.directory, f"{os.path.basename(profile_id)}.folded")
+        return path if os.path.exists(path) else None
+
+    def prune(self):
+        for profile_id in self._ids()[:-self.max_profiles]:
+            for suffix in ('.json', '.folded'):
+                try:
+                    os.remove(os.path.join(self.directory, profile_id + suffix))
+                except OSError:
+                    pass
+
+    def _ids(self):
+        """Profile ids, oldest first (ids start with a nanosecond timestamp)"""
+        if not os.path.isdir(self.directory):
+            return []
+        ids = [name[:-len('.json')] for name in os.listdir(self.directory) if name.endswith('.json')]
+        return sorted(ids, key=lambda name: int(name.split('-')[0]))
+
+    def _write(self, name, content):
+        path = os.path.join(self.directory, name)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+
+class ProfilingMiddleware:
+    """Profiles sampled or explicitly requested requests; must come after AuthenticationMiddleware"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.store = ProfileStore()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        trigger = self._trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+
+        profiler = SamplingProfiler(threading.get_ident(), settings.PROFILING_INTERVAL).start()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            duration = time.perf_counter() - started
+            profiler.stop()
+
+        self.store.save(self._meta(request, response, duration, profiler, trigger), profiler.folded())
+        return response
+
+    async def __acall__(self, request):
+        if self._requested(request):
+            # request.user may have to read the session and user tables
+            trigger = await sync_to_async(self._trigger)(request)
+        else:
+            trigger = self._trigger(request)
+        if trigger is None:
+            return await self.get_response(request)
+
+        profiler = SamplingProfiler(threading.get_ident(), settings.PROFILING_INTERVAL).start()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            duration = time.perf_counter() - started
+            profiler.stop()
+
+        await sync_to_async(self.store.save, thread_sensitive=False)(
+            self._meta(request, response, duration, profiler, trigger), profiler.folded())
+        return response
+
+    def _meta(self, request, response, duration, profiler, trigger):
+        match = getattr(request, 'resolver_match', None)
+        return {
+            'created_at': timezone.now().isoformat(),
+            'method': request.method,
+            'path': request.path,
+            'view_name': (match.view_name if match else None) or 'unresolved',
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'samples': profiler.samples,
+            'interval_ms': settings.PROFILING_INTERVAL * 1000,
+            'trigger': trigger,
+        }
+
+    def _requested(self, request):
+        return request.headers.get(PROFILE_HEADER) == '1' or request.GET.get(PROFILE_FLAG) == '1'
+
+    def _trigger(self, request):
+        if self._requested(request):
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_staff:
+                return 'requested'
+        rate = settings.PROFILING_SAMPLE_RATE
+        if rate and random.random() < rate:
+            return 'sampled'
+        return None
+
+
+@staff_member_required
+def profiles_view(request):
+    """Admin page: captured requests grouped by view name, slowest first"""
+    groups = {}
+    for entry in ProfileStore().list():
+        groups.setdefault(entry['view_name'], []).append(entry)
+
+    views = []
+    for view_name, entries in groups.items():
+        entries.sort(key=lambda e: e['duration_ms'], reverse=True)
+        durations = sorted(e['duration_ms'] for e in entries)
+        views.append({
+            'view_name': view_name,
+            'count': len(entries),
+            'max_ms': durations[-1],
+            'p50_ms': durations[len(durations) // 2],
+            'slowest': entries[:PROFILES_PER_VIEW],
+        })
+    views.sort(key=lambda v: v['max_ms'], reverse=True)
+
+    context = dict(admin.site.each_context(request), title='Request profiles', views=views,
+                   sample_rate=settings.PROFILING_SAMPLE_RATE)
+    return render(request, 'admin/profiles.html', context)
+
+
+@staff_member_required
+def profile_download_view(request, profile_id):
+    """Raw folded stacks for flamegraph.pl / speedscope"""
+    path = ProfileStore().folded_path(profile_id)
+    if path is None:
+        raise Http404("Profile not found")
+    response = FileResponse(open(path, 'rb'), content_type='text/plain; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{profile_id}.folded"'
+    return response
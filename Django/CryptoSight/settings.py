@@ -11,6 +11,7 @@ Configuration includes:
 from pathlib import Path
 import os
 from dotenv import load_dotenv
+from celery.schedules import crontab
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -55,6 +56,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'CryptoSight.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'CryptoSight.urls'
@@ -81,13 +83,49 @@ WSGI_APPLICATION = 'CryptoSight.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# SQLite profiles (see CryptoSight/sqlite/). 'wal' lets the web process and Celery
+# workers write concurrently: WAL journal (readers never block the writer),
+# synchronous=NORMAL (durable at checkpoints, safe against corruption), a 64 MiB
+# page cache, a busy timeout, BEGIN IMMEDIATE and persistent connections.
+# 'rollback' is SQLite's stock setup. WAL needs the database on a local filesystem.
+SQLITE_PROFILES = {
+    'wal': {
+        'OPTIONS': {'timeout': 20},  # busy timeout in seconds
+        'PRAGMAS': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'cache_size': -65536,
+                    'temp_store': 'MEMORY', 'mmap_size': 268435456},
+        'IMMEDIATE_TRANSACTIONS': True,
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    },
+    'rollback': {
+        'OPTIONS': {'timeout': 5},
+        'PRAGMAS': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+        'IMMEDIATE_TRANSACTIONS': False,
+        'CONN_MAX_AGE': 0,
+    },
+}
+SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'wal')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'ENGINE': 'CryptoSight.sqlite',
+        'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        **SQLITE_PROFILES[SQLITE_PROFILE],
     }
 }
 
+# Caches: the market overview snapshot is written by Celery and read by the web
+# process, so it lives in a file-based cache both can see
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'overview': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('OVERVIEW_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'overview')),
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -137,6 +175,58 @@ MODELS_DIR = os.path.join(os.path.dirname(BASE_DIR), 'Model_Training')
 DAILY_MODELS_PATH = os.path.join(MODELS_DIR, 'models_daily')
 HOURLY_MODELS_PATH = os.path.join(MODELS_DIR, 'models_hourly')
 
+# Model registry (see predict/registry.py): read from the MODEL_MANIFEST written by
+# `manage.py build_model_manifest` (the model folders are scanned if it is missing);
+# model files are re-checked every MODEL_POLL_SECONDS (0: never) and a changed model
+# is swapped in once its files have been unchanged for MODEL_SETTLE_SECONDS
+MODEL_MANIFEST = os.environ.get('MODEL_MANIFEST', os.path.join(BASE_DIR, 'predict', 'model_manifest.json'))
+MODEL_POLL_SECONDS = float(os.environ.get('MODEL_POLL_SECONDS', '30'))
+MODEL_SETTLE_SECONDS = float(os.environ.get('MODEL_SETTLE_SECONDS', '5'))
+
+# Currencies: prices are computed and stored in USDT and converted when displayed
+DISPLAY_CURRENCY = os.environ.get('DISPLAY_CURRENCY', 'INR')
+DISPLAY_CURRENCIES = ['INR', 'USDT', 'USD', 'EUR', 'GBP', 'JPY']
+FX_API_URL = os.environ.get('FX_API_URL', 'https://open.er-api.com/v6/latest/USD')
+FX_CACHE_SECONDS = int(os.environ.get('FX_CACHE_SECONDS', '3600'))
+FX_RETRY_SECONDS = int(os.environ.get('FX_RETRY_SECONDS', '300'))
+# Used while the FX provider is unreachable; only currencies listed here can then be shown
+FX_FALLBACK_RATES = {'USDT': 1.0, 'USD': 1.0, 'INR': float(os.environ.get('USD_TO_INR', '88.75'))}
+
+# Metrics: each process dumps its counters/timers here for /predict/metrics/
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(BASE_DIR, 'metrics'))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Request profiling (see CryptoSight/profiling.py): fraction of requests sampled,
+# sampler interval in seconds, and the capped on-disk profile store
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_INTERVAL = float(os.environ.get('PROFILING_INTERVAL', '0.005'))
+PROFILING_DIR = os.environ.get('PROFILING_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILING_MAX_PROFILES = int(os.environ.get('PROFILING_MAX_PROFILES', '200'))
+
+# Write-behind buffer for prediction history inserts (see predict/history_buffer.py).
+# Off unless HISTORY_BUFFER_URL names a Redis database (e.g. the Celery broker's);
+# queued rows are bulk-written once HISTORY_BUFFER_SIZE are waiting or the oldest
+# is HISTORY_BUFFER_SECONDS old, and before any history page is read
+HISTORY_BUFFER_URL = os.environ.get('HISTORY_BUFFER_URL', '')
+HISTORY_BUFFER_SIZE = int(os.environ.get('HISTORY_BUFFER_SIZE', '50'))
+HISTORY_BUFFER_SECONDS = float(os.environ.get('HISTORY_BUFFER_SECONDS', '2'))
+
+# Archival (see predict/archive.py): resolved history from months that ended more
+# than ARCHIVE_AFTER_DAYS ago moves to compressed monthly archives, ARCHIVE_CHUNK_SIZE
+# rows per transaction and at most ARCHIVE_TASK_CHUNKS chunks per task run
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '90'))
+ARCHIVE_CHUNK_SIZE = int(os.environ.get('ARCHIVE_CHUNK_SIZE', '1000'))
+ARCHIVE_TASK_CHUNKS = int(os.environ.get('ARCHIVE_TASK_CHUNKS', '50'))
+
+# Account deletion (see authuser/tasks.py): rows deleted per transaction
+ACCOUNT_DELETE_CHUNK_SIZE = int(os.environ.get('ACCOUNT_DELETE_CHUNK_SIZE', '1000'))
+
+# Async views (see predict/async_views.py): routed in place of the sync prediction,
+# task-status and chatbot views when ASYNC_VIEWS is set (CryptoSight/asgi.py sets it);
+# model inference runs on a pool of INFERENCE_THREADS threads per process
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '').lower() in ('1', 'true', 'yes')
+INFERENCE_THREADS = int(os.environ.get('INFERENCE_THREADS', str(min(4, os.cpu_count() or 1))))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -187,8 +277,8 @@ LOGGING = {
 
 # Celery Configuration
 # Use 127.0.0.1 instead of localhost to avoid IPv6/loopback quirks on Windows
-CELERY_BROKER_URL = 'redis://127.0.0.1:6379/0'
-CELERY_RESULT_BACKEND = 'redis://127.0.0.1:6379/0'
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://127.0.0.1:6379/0')
+CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', CELERY_BROKER_URL)
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
@@ -203,4 +293,39 @@ CELERY_BEAT_SCHEDULE = {
         'args': (),
         'options': {'expires': 240.0}, # Task expires after 4 minutes
     },
+    # Market overview snapshots, refreshed as Binance candles close (times are CELERY_TIMEZONE)
+    'refresh-market-overview-hourly': {
+        'task': 'refresh_market_overview',
+        'schedule': crontab(minute=30),  # :00 UTC, the hourly candle close (Asia/Kolkata is UTC+5:30)
+        'args': ('1h',),
+        'options': {'expires': 1800.0},
+    },
+    'refresh-accuracy-analytics': {
+        'task': 'refresh_accuracy_analytics',
+        'schedule': crontab(minute=15),
+        'options': {'expires': 1800.0},
+    },
+    'refresh-market-overview-daily': {
+        'task': 'refresh_market_overview',
+        'schedule': crontab(hour=5, minute=30),  # 00:00 UTC, the daily candle close
+        'args': ('1d',),
+        'options': {'expires': 1800.0},
+    },
+    'archive-prediction-history': {
+        'task': 'archive_prediction_history',
+        'schedule': crontab(hour=3, minute=45),
+        'options': {'expires': 3600.0},
+    },
+    'resume-account-deletions': {
+        'task': 'resume_account_deletions',
+        'schedule': 900.0,
+        'options': {'expires': 600.0},
+    },
 }
+if HISTORY_BUFFER_URL:
+    # Backstop for the time threshold when no request arrives to trigger a flush
+    CELERY_BEAT_SCHEDULE['flush-history-buffer'] = {
+        'task': 'flush_history_buffer',
+        'schedule': HISTORY_BUFFER_SECONDS,
+        'options': {'expires': HISTORY_BUFFER_SECONDS},
+    }
@@ -0,0 +1,15 @@
+"""
+SQLite database backend with per-connection PRAGMAs
+
+Used as ENGINE 'CryptoSight.sqlite'. On top of Django's sqlite3 backend it
+reads two extra keys from the DATABASES entry:
+
+    PRAGMAS                 {name: value} applied to every new connection
+    IMMEDIATE_TRANSACTIONS  open atomic blocks with BEGIN IMMEDIATE
+
+With a deferred BEGIN, a transaction that reads and then writes must upgrade
+its lock mid-way, and SQLite fails that upgrade with "database is locked"
+without waiting for the busy timeout if another connection has committed in
+the meantime. BEGIN IMMEDIATE takes the write lock up front, so writers wait
+in the busy handler instead.
+"""
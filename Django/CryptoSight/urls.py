@@ -3,6 +3,8 @@ Main URL configuration for CryptoSight project
 
 Routes:
 - /admin/ - Django admin interface
+- /admin/profiles/ - Captured request profiles (staff only)
+- /admin/model-accuracy/ - Model accuracy by coin, timeframe, horizon and week (staff only)
 - / - Homepage and landing page
 - /auth/ - User authentication (login, signup, profile)
 - /predict/ - Cryptocurrency price prediction features
@@ -13,8 +15,13 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.views.decorators.csrf import csrf_exempt
+from .profiling import profiles_view, profile_download_view
+from predict.analytics import model_accuracy_view
 
 urlpatterns = [
+    path('admin/profiles/', profiles_view, name='admin_profiles'),
+    path('admin/profiles/<str:profile_id>.folded', profile_download_view, name='admin_profile_download'),
+    path('admin/model-accuracy/', model_accuracy_view, name='admin_model_accuracy'),
     path('admin/', admin.site.urls),
     path('', include('home.urls')),
     path('auth/', include('authuser.urls')),
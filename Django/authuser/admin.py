@@ -1,4 +1,13 @@
 """Django admin configuration for authuser app"""
 from django.contrib import admin
 
-# No custom models to register - using Django's built-in User model
+from .models import AccountDeletion
+
+
+@admin.register(AccountDeletion)
+class AccountDeletionAdmin(admin.ModelAdmin):
+    """Read-only view of account deletions and their progress (carried out by authuser.tasks.delete_account)"""
+    list_display = ['username', 'requested_at', 'deleted_rows', 'total_rows', 'progress', 'completed_at']
+    list_filter = ['requested_at', 'completed_at']
+    search_fields = ['username']
+    readonly_fields = ['user', 'username', 'requested_at', 'total_rows', 'deleted_rows', 'completed_at']
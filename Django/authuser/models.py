@@ -1,4 +1,32 @@
 """Database models for authuser app"""
+from django.contrib.auth.models import User
 from django.db import models
 
-# No custom models - using Django's built-in User model for authentication
+# Authentication uses Django's built-in User model
+
+
+class AccountDeletion(models.Model):
+    """
+    An account deletion request. The account is deactivated when this is
+    created; authuser.tasks.delete_account then deletes its data in chunks,
+    recording progress here. Kept once the user is gone, as a record.
+    """
+    user = models.OneToOneField(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='deletion')
+    username = models.CharField(max_length=150)
+    requested_at = models.DateTimeField(auto_now_add=True)
+    total_rows = models.PositiveIntegerField(default=0)  # Rows to delete, counted when the task starts
+    deleted_rows = models.PositiveIntegerField(default=0)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-requested_at']
+
+    def __str__(self):
+        return f"{self.username} ({self.deleted_rows}/{self.total_rows} rows)"
+
+    @property
+    def progress(self):
+        """Percentage of rows deleted so far"""
+        if self.completed_at:
+            return 100.0
+        return round(100 * self.deleted_rows / self.total_rows, 1) if self.total_rows else 0.0
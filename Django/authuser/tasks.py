@@ -0,0 +1,82 @@
+"""
+Background account deletion
+
+delete_account_view deactivates the account and queues delete_account, which
+removes the user's prediction history, archive and accuracy rows in chunks
+of ACCOUNT_DELETE_CHUNK_SIZE, each delete in its own short transaction so
+other writers get the SQLite write lock in between, and finally the user.
+"""
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from predict.models import AccuracyAggregate, PredictionArchive, PredictionHistory
+from .models import AccountDeletion
+
+logger = logging.getLogger(__name__)
+
+# Requests queued longer than this without finishing are re-queued by resume_account_deletions
+RESUME_AFTER_SECONDS = 600
+
+
+# Progress is tracked on the AccountDeletion row, so there is no result to store
+@shared_task(name="delete_account", ignore_result=True)
+def delete_account(deletion_id):
+    """
+    Delete a deactivated account's data chunk by chunk, then the user.
+    Safe to run again after an interruption: it continues where it stopped.
+    """
+    deletion = AccountDeletion.objects.select_related('user').filter(pk=deletion_id).first()
+    if deletion is None or deletion.completed_at:
+        return {'status': 'skipped', 'deletion_id': deletion_id}
+
+    user = deletion.user
+    if user is not None:
+        size = settings.ACCOUNT_DELETE_CHUNK_SIZE
+        # Archive rows hold a month of requests each, so they go in smaller chunks
+        querysets = [
+            (PredictionHistory.objects.filter(user=user), size),
+            (PredictionArchive.objects.filter(user=user), max(1, size // 50)),
+            (AccuracyAggregate.objects.filter(user=user), size),
+        ]
+        deletion.total_rows = deletion.deleted_rows + sum(queryset.count() for queryset, _ in querysets)
+        deletion.save(update_fields=['total_rows'])
+        logger.info("🗑️ Deleting account %s: %s rows", deletion.username, deletion.total_rows)
+
+        for queryset, chunk_size in querysets:
+            while True:
+                pks = list(queryset.values_list('pk', flat=True)[:chunk_size])
+                if not pks:
+                    break
+                with transaction.atomic():
+                    deleted, _ = queryset.model.objects.filter(pk__in=pks).delete()
+                    AccountDeletion.objects.filter(pk=deletion.pk).update(deleted_rows=F('deleted_rows') + deleted)
+                deletion.deleted_rows += deleted
+        user.delete()
+
+    # update() rather than save(): the in-memory deletion still points at the deleted user
+    AccountDeletion.objects.filter(pk=deletion.pk).update(completed_at=timezone.now())
+    logger.info("✅ Account %s deleted (%s rows)", deletion.username, deletion.deleted_rows)
+    return {'status': 'deleted', 'username': deletion.username, 'rows': deletion.deleted_rows}
+
+
+@shared_task(name="resume_account_deletions")
+def resume_account_deletions():
+    """
+    Re-queue deletions that have not finished RESUME_AFTER_SECONDS after being
+    requested (broker down when requested, or a worker lost mid-task).
+    Scheduled by Celery Beat.
+    """
+    stale = timezone.now() - timedelta(seconds=RESUME_AFTER_SECONDS)
+    pending = list(AccountDeletion.objects.filter(completed_at__isnull=True, requested_at__lte=stale)
+                   .values_list('pk', flat=True))
+    for deletion_id in pending:
+        delete_account.delay(deletion_id)
+    if pending:
+        logger.info("Re-queued %s unfinished account deletions", len(pending))
+    return {'requeued': len(pending)}
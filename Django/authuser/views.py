@@ -3,17 +3,27 @@ Views for user authentication and profile management
 
 Handles:
 - User login and signup
+- Profile page with the prediction accuracy dashboard
 - Profile editing (username, email)
 - Password changes
 - Account deletion
 """
+import logging
+
+from django.db import transaction
 from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout, update_session_auth_hash
 from django.contrib.auth.forms import AuthenticationForm, PasswordChangeForm
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from predict.models import PredictionHistory
+from predict import fx, history_buffer
+from predict.archive import UserHistory
+from predict.models import AccuracyAggregate, PredictionHistory
 from .forms import SignUpForm
+from .models import AccountDeletion
+from .tasks import delete_account
+
+logger = logging.getLogger(__name__)
 
 def login_view(request):
     """Handle user authentication and login"""
@@ -55,6 +65,23 @@ def logout_view(request):
     logout(request)
     return redirect('home')
 
+@login_required
+def profile_view(request):
+    """Profile page: recent predictions and accuracy read from the running aggregates"""
+    currency = fx.display_currency(request)
+    history_buffer.flush()
+    recent_predictions = list(PredictionHistory.objects.filter(user=request.user).select_related('run')
+                              .order_by('-created_at')[:5])
+    fx.localize_predictions(recent_predictions, currency)
+
+    context = {
+        'total_predictions': UserHistory(request.user).count(),  # including archived months
+        'recent_predictions': recent_predictions,
+        'accuracy': AccuracyAggregate.summary_for(request.user),
+        'currency_symbol': fx.symbol_for(currency),
+    }
+    return render(request, 'authuser/profile.html', context)
+
 @login_required
 def edit_profile_view(request):
     """Allow users to update their username and email"""
@@ -106,20 +133,30 @@ def change_password_view(request):
 
 @login_required
 def delete_account_view(request):
-    """Permanently delete user account and all associated data"""
+    """Deactivate the account now and queue permanent deletion of it and all associated data"""
     if request.method == 'GET':
         user = request.user
         username = user.username
         
-        # Delete all prediction history associated with this user
-        PredictionHistory.objects.filter(user=user).delete()
+        # Write queued requests first so the background deletion includes them
+        history_buffer.flush()
         
-        # Delete the user account from database
-        user.delete()
+        # Deactivate now, which also ends the user's other sessions; the data
+        # is deleted in chunks by a Celery task so this request returns at once
+        with transaction.atomic():
+            user.is_active = False
+            user.save(update_fields=['is_active'])
+            deletion = AccountDeletion.objects.create(user=user, username=username)
+        try:
+            # No publish retries: if the broker is down, fail fast rather than hold the request
+            delete_account.apply_async((deletion.pk,), retry=False)
+        except Exception as e:
+            # Picked up by the resume_account_deletions beat task
+            logger.warning("Could not queue deletion of account %s: %s", username, e)
         
         # Log out and redirect to home page
         logout(request)
-        messages.success(request, f'Account "{username}" has been permanently deleted.')
+        messages.success(request, f'Account "{username}" has been deactivated and will be permanently deleted shortly.')
         return redirect('home')
     
     # Invalid request method, redirect to profile page
@@ -0,0 +1,46 @@
+"""
+Inference latency benchmarks (pytest-benchmark)
+
+Run from the Django folder; no network access is needed:
+
+    pytest benchmarks                                    # measure
+    pytest benchmarks --benchmark-save=baseline          # store a new baseline
+    pytest benchmarks --benchmark-compare --benchmark-compare-fail=mean:25%
+
+Baselines are stored in benchmarks/baselines/ and --benchmark-compare picks
+the latest one, so a backend or model change that slows any benchmark by more
+than the threshold fails the run. Baselines are machine specific: re-save on
+the machine that runs the gate. BENCH_ROUNDS sets the rounds per benchmark.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+DJANGO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DJANGO_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'CryptoSight.settings')
+
+import django  # noqa: E402
+django.setup()
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    # pytest-benchmark defaults to ./.benchmarks; keep baselines with the suite instead
+    if hasattr(config.option, 'benchmark_storage') and config.option.benchmark_storage == 'file://./.benchmarks':
+        config.option.benchmark_storage = f"file://{BASELINE_DIR}"
+
+
+def synthetic_candles(scaler, rows, seed=0):
+    """Random candles inside the scaler's training range, indexed like get_live_data's output"""
+    rng = np.random.default_rng(seed)
+    low, high = scaler.data_min_, scaler.data_max_
+    values = low + (high - low) * rng.uniform(0.3, 0.7, size=(rows, len(low)))
+    columns = list(getattr(scaler, 'feature_names_in_', ['Open', 'High', 'Low', 'Close', 'Volume']))
+    index = pd.date_range(end=pd.Timestamp.now().floor('h'), periods=rows, freq='h')
+    return pd.DataFrame(values, columns=columns, index=index)
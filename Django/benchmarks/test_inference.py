@@ -0,0 +1,104 @@
+"""
+Latency of every trained model per inference backend, on synthetic windows
+
+- cold load:      load_model_and_scaler with an empty cache
+- warm step:      one rollout step with the model cached
+- 30-step:        a 30-candle autoregressive rollout
+- batch:          one forward pass over BATCH_SIZE windows (extra_info: windows/s)
+- live:           get_live_prediction end to end with get_live_data stubbed
+- mc dropout:     a 30-step rollout of N Monte-Carlo dropout samples batched together
+"""
+import os
+
+import numpy as np
+import pytest
+
+from predict import prediction
+from predict.registry import registry
+
+from conftest import synthetic_candles
+
+ROUNDS = int(os.environ.get('BENCH_ROUNDS', '5'))
+BATCH_SIZE = 64
+ROLLOUT_STEPS = 30
+MC_SAMPLES = (1, 16, 64, 256)
+
+
+MODELS = sorted(registry.entries, key=lambda key: (key[1] != '1h', key[0]))
+MODEL_IDS = [f"{symbol}-{interval}" for symbol, interval in MODELS]
+
+
+@pytest.fixture(params=MODELS, ids=MODEL_IDS)
+def model_key(request):
+    return request.param
+
+
+@pytest.fixture(params=prediction.INFERENCE_BACKENDS)
+def backend(request):
+    return request.param
+
+
+@pytest.fixture
+def loaded(model_key):
+    symbol, interval = model_key
+    model, scaler = prediction.load_model_and_scaler(symbol, interval)
+    assert model is not None, f"{symbol} {interval} failed to load"
+    rng = np.random.default_rng(0)
+    window = rng.uniform(0.3, 0.7, size=(1, prediction.WINDOW_SIZES[interval], scaler.n_features_in_))
+    # First calls build each backend's graph; keep that out of the measurements
+    for backend_name in prediction.INFERENCE_BACKENDS:
+        prediction.predict_step(model, window, backend_name)
+    return model, scaler, window
+
+
+def test_cold_load(benchmark, model_key):
+    symbol, interval = model_key
+
+    def clear_cache():
+        registry.evict(symbol, interval)
+
+    model, scaler = benchmark.pedantic(prediction.load_model_and_scaler, args=(symbol, interval),
+                                       setup=clear_cache, rounds=ROUNDS)
+    assert model is not None and scaler is not None
+
+
+def test_warm_single_step(benchmark, loaded, backend):
+    model, _, window = loaded
+    result = benchmark.pedantic(prediction.rollout, args=(model, window, 1, backend), rounds=ROUNDS * 4)
+    assert result.shape == (1, window.shape[2])
+
+
+def test_rollout_30(benchmark, loaded, backend):
+    model, _, window = loaded
+    result = benchmark.pedantic(prediction.rollout, args=(model, window, ROLLOUT_STEPS, backend), rounds=ROUNDS)
+    assert result.shape == (ROLLOUT_STEPS, window.shape[2])
+
+
+def test_batch_throughput(benchmark, loaded, backend):
+    model, _, window = loaded
+    batch = np.repeat(window, BATCH_SIZE, axis=0)
+    prediction.predict_step(model, batch, backend)  # trace for the batch shape
+    result = benchmark.pedantic(prediction.predict_step, args=(model, batch, backend), rounds=ROUNDS)
+    assert result.shape[0] == BATCH_SIZE
+    benchmark.extra_info['windows_per_second'] = round(BATCH_SIZE / benchmark.stats.stats.mean, 1)
+
+
+def test_live_prediction_30(benchmark, loaded, model_key, backend, monkeypatch):
+    symbol, interval = model_key
+    _, scaler, _ = loaded
+    candles = synthetic_candles(scaler, prediction.WINDOW_SIZES[interval])
+    monkeypatch.setattr(prediction, 'get_live_data', lambda *args, **kwargs: candles)
+    monkeypatch.setattr(prediction, 'INFERENCE_BACKEND', backend)
+
+    pred_df = benchmark.pedantic(prediction.get_live_prediction, args=(symbol, interval, ROLLOUT_STEPS),
+                                 rounds=ROUNDS)
+    assert len(pred_df) == ROLLOUT_STEPS
+
+
+@pytest.mark.parametrize('samples', MC_SAMPLES)
+def test_mc_rollout_30(benchmark, loaded, samples):
+    model, _, window = loaded
+    prediction.mc_rollout(model, window, 1, samples)  # trace for the batch shape
+    result = benchmark.pedantic(prediction.mc_rollout, args=(model, window, ROLLOUT_STEPS, samples), rounds=ROUNDS)
+    assert result.shape == (ROLLOUT_STEPS, samples, window.shape[2])
+    benchmark.extra_info['samples_per_second'] = round(samples / benchmark.stats.stats.mean, 1)
@@ -1,7 +1,9 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 urlpatterns = [
-    # The main endpoint for chatbot communication
-    path('', views.chatbot_response, name='chatbot_response'),
-]
\ No newline at end of file
+    # The main endpoint for chatbot communication (native async under ASGI)
+    path('', views.chatbot_response_async if settings.ASYNC_VIEWS else views.chatbot_response,
+         name='chatbot_response'),
+]
@@ -1,15 +1,57 @@
 import json
-import os
-import sys
+import logging
+from asgiref.sync import sync_to_async
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.conf import settings
 
 # Import the main prediction function from the predict app
 from predict.views import get_prediction
+from predict import fx
+
+logger = logging.getLogger(__name__)
 
 SUPPORTED_COINS = ["BTC", "ETH", "BNB", "SOL", "XRP", "ADA", "DOGE", "AVAX"]
 
+
+def price_check_response(coin, price_usdt, context):
+    """Reply to a price check with the coin's ticker price (None if it couldn't be fetched)"""
+    currency = fx.default_currency()
+    price = fx.convert(price_usdt, currency)
+    currency_symbol = fx.symbol_for(currency)
+    response_message = f"The current price of <b>{coin}</b> is <b>{currency_symbol}{price:,.2f}</b>." if price else f"Sorry, I couldn't fetch the price for {coin} right now."
+
+    # After checking price, return to the main menu
+    context['awaiting'] = 'initial_choice'
+    return JsonResponse({
+        'message': response_message + "<br><br><small><i>Note: Prices are sourced from Binance and may differ slightly from other platforms.</i></small><br><br>What would you like to do next?",
+        'options': ['Get Prediction', 'Check Price'],
+        'context': context
+    })
+
+
+async def chatbot_response_async(request):
+    """
+    chatbot_response for the ASGI server: price checks fetch the ticker on the
+    event loop; every other message (including predictions) runs the sync view
+    on a worker thread
+    """
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            message = data.get('message', '').lower()
+            context = data.get('context', {})
+            coin = message.upper()
+            if context.get('awaiting') == 'price_check_coin' and coin in SUPPORTED_COINS:
+                from predict.binance_async import get_realtime_price
+                price_usdt = await get_realtime_price(coin)
+                return await sync_to_async(price_check_response, thread_sensitive=False)(coin, price_usdt, context)
+        except Exception as e:
+            return JsonResponse({'message': f'An error occurred: {str(e)}'}, status=500)
+    return await sync_to_async(chatbot_response)(request)
+
+
+chatbot_response_async.csrf_exempt = True  # csrf_exempt() wraps views in a sync function on Django 4.2
+
 @csrf_exempt
 def chatbot_response(request):
     if request.method == 'POST':
@@ -17,6 +59,8 @@ def chatbot_response(request):
             data = json.loads(request.body)
             message = data.get('message', '').lower()
             context = data.get('context', {})
+            currency = fx.default_currency()
+            currency_symbol = fx.symbol_for(currency)
 
             # Handle initial greeting
             if message == 'init':
@@ -66,17 +110,7 @@ def chatbot_response(request):
                 coin = message.upper()
                 if coin in SUPPORTED_COINS:
                     from predict.prediction import get_realtime_price
-                    usd_to_inr = float(os.environ.get('USD_TO_INR', '88.75'))
-                    price = get_realtime_price(coin, usd_to_inr)
-                    response_message = f"The current price of <b>{coin}</b> is <b>₹{price:,.2f}</b>." if price else f"Sorry, I couldn't fetch the price for {coin} right now."
-
-                    # After checking price, return to the main menu
-                    context['awaiting'] = 'initial_choice'
-                    return JsonResponse({
-                        'message': response_message + "<br><br><small><i>Note: Prices are sourced from Binance and may differ slightly from other platforms.</i></small><br><br>What would you like to do next?",
-                        'options': ['Get Prediction', 'Check Price'],
-                        'context': context
-                    })
+                    return price_check_response(coin, get_realtime_price(coin), context)
 
             if context.get('awaiting') == 'coin':
                 coin = message.upper()
@@ -136,7 +170,8 @@ def chatbot_response(request):
 
                         try:
                             # Use the powerful get_prediction function
-                            prediction_data = get_prediction(coin, timeframe, steps)
+                            prediction_data = fx.convert_payload(get_prediction(coin, timeframe, steps),
+                                                                 currency)
 
                             # Handle pluralization for the response text
                             unit = 'day' if timeframe == 'daily' else 'hour'
@@ -147,16 +182,16 @@ def chatbot_response(request):
                                 f"📈 <b>Prediction for {coin} ({steps} {plural_unit})</b><br><br>"
                                 "<div style='display: flex; justify-content: center;'>"
                                     "<table style='border-spacing: 0 5px; width: 90%;'>"
-                                        f"<tr><td style='width: 120px;'><b>Current Price</b></td><td style='width: 10px;'>:</td><td>₹{prediction_data['current_price']:,.2f}</td></tr>"
-                                        f"<tr><td><b>Predicted Price</b></td><td>:</td><td>₹{prediction_data['predicted_price']:,.2f}</td></tr>"
+                                        f"<tr><td style='width: 120px;'><b>Current Price</b></td><td style='width: 10px;'>:</td><td>{currency_symbol}{prediction_data['current_price']:,.2f}</td></tr>"
+                                        f"<tr><td><b>Predicted Price</b></td><td>:</td><td>{currency_symbol}{prediction_data['predicted_price']:,.2f}</td></tr>"
                                         f"<tr><td><b>Confidence</b></td><td>:</td><td>{prediction_data['confidence_level']}%</td></tr>"
                                         f"<tr><td><b>Market Sentiment</b></td><td>:</td><td>{prediction_data['market_sentiment']}</td></tr>"
                                     "</table>"
                                 "</div>"
                             )
 
-                        except Exception as e:
-                            print(f"Chatbot prediction failed: {e}")
+                        except Exception:
+                            logger.exception("Chatbot prediction failed for %s %s %s", coin, timeframe, steps)
                             response_text = "Sorry, I couldn't generate a prediction at this time. The model might be unavailable. Please try again later."
 
                         # Ask for the next action instead of resetting
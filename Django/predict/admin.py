@@ -1,13 +1,195 @@
 """
 Django admin configuration for prediction history management
 """
-from django.contrib import admin
-from .models import PredictionHistory
+import hashlib
+from datetime import datetime, timedelta
+
+from django.contrib import admin, messages
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import models
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .models import AccuracyAggregate, ForecastRun, PredictionArchive, PredictionHistory
+from .overview import OVERVIEW_SYMBOLS
+
+COUNT_CACHE_SECONDS = 300
+ACTION_BATCH_SIZE = 1000  # ids per queued task
+
+
+class CountCachingPaginator(Paginator):
+    """
+    Paginator whose COUNT(*) is cached per filtered query for COUNT_CACHE_SECONDS,
+    so paging a multi-million-row changelist doesn't recount the table each time
+    """
+
+    @cached_property
+    def count(self):
+        exact = Paginator.count.func
+        query = getattr(self.object_list, 'query', None)
+        if query is None:
+            return exact(self)
+        key = 'admin_count:' + hashlib.md5(str(query).encode()).hexdigest()
+        return cache.get_or_set(key, lambda: exact(self), COUNT_CACHE_SECONDS)
+
+
+class SeekDatesQuerySet(models.QuerySet):
+    """
+    QuerySet whose datetimes() finds each distinct year, month or day with one
+    index seek per period (first row at or after the period's start) instead
+    of truncating every row, which SQLite does in Python. Used for the
+    changelist date hierarchy.
+    """
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None, **kwargs):
+        if kind not in ('year', 'month', 'day'):
+            return super().datetimes(field_name, kind, order, tzinfo, **kwargs)
+        tz = tzinfo or timezone.get_current_timezone()
+        seek = self.order_by(field_name).values_list(field_name, flat=True)
+        periods = []
+        value = seek.first()
+        while value is not None:
+            local = timezone.localtime(value, tz)
+            start = datetime(local.year, 1 if kind == 'year' else local.month, 1 if kind != 'day' else local.day)
+            if kind == 'year':
+                end = start.replace(year=start.year + 1)
+            elif kind == 'month':
+                end = (start + timedelta(days=32)).replace(day=1)
+            else:
+                end = start + timedelta(days=1)
+            periods.append(timezone.make_aware(start, tz))
+            value = seek.filter(**{f'{field_name}__gte': timezone.make_aware(end, tz)}).first()
+        return periods if order == 'ASC' else periods[::-1]
+
+
+class ChoicesFilter(admin.SimpleListFilter):
+    """Filter with fixed choices, so the changelist doesn't scan the table for DISTINCT values"""
+    lookup = None
+    choices_list = ()
+
+    def lookups(self, request, model_admin):
+        return [(value, value) for value in self.choices_list]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.lookup: self.value()})
+        return queryset
+
+
+class CryptoFilter(ChoicesFilter):
+    title = 'crypto'
+    parameter_name = 'crypto'
+    lookup = 'run__crypto'
+    choices_list = OVERVIEW_SYMBOLS
+
+
+class TimeframeFilter(ChoicesFilter):
+    title = 'timeframe'
+    parameter_name = 'timeframe'
+    lookup = 'run__timeframe'
+    choices_list = ('hourly', 'daily')
+
+
+class SentimentFilter(ChoicesFilter):
+    title = 'sentiment'
+    parameter_name = 'sentiment'
+    lookup = 'run__market_sentiment__endswith'  # 'Strongly Bullish', 'Slightly Bullish', ... group by direction
+    choices_list = ('Bullish', 'Bearish', 'Neutral')
+
 
 @admin.register(PredictionHistory)
 class PredictionHistoryAdmin(admin.ModelAdmin):
-    """Admin interface for viewing and managing prediction history records"""
+    """
+    Admin interface for viewing and managing prediction history records.
+    Kept cheap on large tables: joined user/run loading, cached counts, fixed
+    filter choices, a date hierarchy on the indexed created_at, raw-id
+    lookups, and actions that hand the work to Celery.
+    """
     list_display = ['user', 'crypto', 'timeframe', 'current_price', 'predicted_price', 'created_at']
-    list_filter = ['crypto', 'timeframe', 'market_sentiment', 'created_at']
-    search_fields = ['user__username', 'crypto']
+    list_filter = [CryptoFilter, TimeframeFilter, SentimentFilter, 'created_at']
+    list_select_related = ['user', 'run']
+    date_hierarchy = 'created_at'
+    search_fields = ['=user__username']  # exact match uses the username index
+    raw_id_fields = ['user', 'run']
     readonly_fields = ['created_at']
+    paginator = CountCachingPaginator
+    show_full_result_count = False
+    actions = ['resolve_actual_prices', 'archive_rows']
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return SeekDatesQuerySet(model=queryset.model, query=queryset.query.chain(), using=queryset.db)
+
+    @admin.action(description="Resolve actual prices of selected predictions (background)")
+    def resolve_actual_prices(self, request, queryset):
+        from .tasks import update_actual_prices_task
+
+        # Already-resolved runs are skipped: resolving again would count them twice in the accuracy aggregates
+        run_ids = (queryset.filter(run__actual_price__isnull=True, run__prediction_target_time__lte=timezone.now())
+                   .order_by().values_list('run_id', flat=True).distinct())
+        queued = self._dispatch(request, update_actual_prices_task, run_ids)
+        if queued is not None:
+            self.message_user(request, f"Queued {queued} unresolved forecast runs for price resolution.")
+
+    @admin.action(description="Archive selected resolved predictions (background)")
+    def archive_rows(self, request, queryset):
+        from .archive import cutoff
+        from .tasks import archive_prediction_history
+
+        before = cutoff()
+        ids = (queryset.filter(created_at__lt=before, run__actual_price__isnull=False)
+               .order_by().values_list('pk', flat=True))
+        queued = self._dispatch(request, archive_prediction_history, ids)
+        if queued is not None:
+            self.message_user(request, f"Queued {queued} predictions made before {before:%Y-%m-%d} for archival; "
+                                       "unresolved or newer ones stay live.")
+
+    def _dispatch(self, request, task, ids):
+        """Queue `task` once per ACTION_BATCH_SIZE ids, streaming them so selecting everything stays cheap"""
+        queued = 0
+        batch = []
+        try:
+            for pk in ids.iterator(chunk_size=ACTION_BATCH_SIZE):
+                batch.append(pk)
+                if len(batch) == ACTION_BATCH_SIZE:
+                    task.delay(batch)
+                    queued, batch = queued + len(batch), []
+            if batch:
+                task.delay(batch)
+                queued += len(batch)
+        except Exception as e:
+            self.message_user(request, f"Could not queue the task after {queued} rows: {e}", level=messages.ERROR)
+            return None
+        return queued
+
+
+@admin.register(ForecastRun)
+class ForecastRunAdmin(admin.ModelAdmin):
+    """Forecasts shared by every user who requested the same coin, horizon and candle"""
+    list_display = ['crypto', 'timeframe', 'period', 'candle', 'current_price', 'predicted_price', 'actual_price',
+                    'currency']
+    list_filter = ['crypto', 'timeframe', 'market_sentiment', 'candle']
+    search_fields = ['crypto']
+    readonly_fields = ['resolved_at']
+
+
+@admin.register(PredictionArchive)
+class PredictionArchiveAdmin(admin.ModelAdmin):
+    """Read-only view of archived monthly history (written by the archive_prediction_history task)"""
+    list_display = ['user', 'month', 'crypto', 'timeframe', 'count', 'archived_at']
+    list_filter = ['crypto', 'timeframe', 'month']
+    list_select_related = ['user']
+    search_fields = ['user__username', 'crypto']
+    exclude = ['data']
+    readonly_fields = ['user', 'month', 'crypto', 'timeframe', 'count', 'archived_at']
+
+
+@admin.register(AccuracyAggregate)
+class AccuracyAggregateAdmin(admin.ModelAdmin):
+    """Read-only view of the running accuracy aggregates (maintained by update_actual_prices_task)"""
+    list_display = ['user', 'crypto', 'timeframe', 'period', 'count', 'direction_hits', 'updated_at']
+    list_filter = ['crypto', 'timeframe']
+    search_fields = ['user__username', 'crypto']
+    readonly_fields = ['user', 'crypto', 'timeframe', 'period', 'count', 'abs_pct_error_sum', 'accuracy_sum',
+                       'direction_hits', 'updated_at']
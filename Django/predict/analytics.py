@@ -0,0 +1,160 @@
+"""
+Model-accuracy analytics across all users
+
+Accuracy is aggregated in the database, never per row in Python. Each
+resolved ForecastRun falls into a bucket: the week (TIME_ZONE, starting
+Monday) of its prediction_target_time, plus its crypto, timeframe and
+period. A run counts once however many users requested it. AccuracyBucket stores per-bucket sums (count, absolute
+percentage error, clamped accuracy, direction hits), and every report is a
+SUM over those rows.
+
+refresh() is incremental. Only weeks that received a newly resolved run
+(resolved_at after the last refresh, with a small overlap for in-flight
+transactions) are recomputed. refresh(full=True) rebuilds everything, for
+example after runs were deleted.
+"""
+import logging
+from datetime import datetime, time, timedelta
+
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import transaction
+from django.db.models import (Case, Count, DateField, ExpressionWrapper, F, FloatField, IntegerField, Max, Q,
+                              Sum, Value, When)
+from django.db.models.functions import Abs, Cast, Greatest, Least, TruncWeek
+from django.shortcuts import redirect, render
+from django.utils import timezone
+
+from . import metrics
+from .models import AccuracyBucket, ForecastRun
+
+logger = logging.getLogger(__name__)
+
+BUCKET_FIELDS = ('week', 'crypto', 'timeframe', 'period')
+# Runs resolved this long before the previous refresh are re-checked, so a
+# transaction that committed late is never skipped
+REFRESH_OVERLAP = timedelta(minutes=10)
+DEFAULT_WEEKS = 12
+
+
+def resolved_predictions():
+    """Resolved runs annotated with their week, error, clamped accuracy and direction hit"""
+    # Cast first: SQLite divides whole-number decimals as integers
+    actual = Cast('actual_price', FloatField())
+    predicted = Cast('predicted_price', FloatField())
+    error = ExpressionWrapper(Abs((actual - predicted) / actual) * 100, output_field=FloatField())
+    same_direction = (
+        Q(predicted_price__gt=F('current_price'), actual_price__gt=F('current_price')) |
+        Q(predicted_price__lt=F('current_price'), actual_price__lt=F('current_price')) |
+        Q(predicted_price=F('current_price'), actual_price=F('current_price'))
+    )
+    return (ForecastRun.objects
+            .filter(actual_price__isnull=False)
+            .exclude(actual_price=0)
+            .annotate(week=TruncWeek('prediction_target_time', output_field=DateField()),
+                      abs_pct_error=error)
+            .annotate(accuracy=Greatest(Value(0.0), Least(Value(100.0), Value(100.0) - F('abs_pct_error'))),
+                      direction_hit=Case(When(same_direction, then=Value(1)), default=Value(0),
+                                         output_field=IntegerField())))
+
+
+def bucket_totals(queryset):
+    """GROUP BY week, crypto, timeframe, period over annotated resolved runs"""
+    return (queryset.order_by()
+            .values(*BUCKET_FIELDS)
+            .annotate(n=Count('id'), error_sum=Sum('abs_pct_error'), accuracy_total=Sum('accuracy'),
+                      hits=Sum('direction_hit')))
+
+
+def dirty_weeks(since):
+    """Weeks holding at least one run resolved after `since`"""
+    return set(resolved_predictions().filter(resolved_at__gte=since)
+               .order_by().values_list('week', flat=True).distinct())
+
+
+def refresh(full=False):
+    """Recompute the buckets that changed since the last refresh; returns the weeks recomputed"""
+    started = timezone.now()
+    last_refresh = None if full else AccuracyBucket.objects.aggregate(last=Max('computed_at'))['last']
+
+    with metrics.timer('analytics_refresh'):
+        if last_refresh is None:
+            weeks = None
+            rows = resolved_predictions()
+        else:
+            weeks = dirty_weeks(last_refresh - REFRESH_OVERLAP)
+            if not weeks:
+                return []
+            # Range on the indexed target time first, then the exact weeks
+            start = timezone.make_aware(datetime.combine(min(weeks), time.min))
+            end = timezone.make_aware(datetime.combine(max(weeks), time.min)) + timedelta(days=7)
+            rows = resolved_predictions().filter(prediction_target_time__gte=start, prediction_target_time__lt=end,
+                                                 week__in=weeks)
+
+        buckets = [
+            AccuracyBucket(week=total['week'], crypto=total['crypto'], timeframe=total['timeframe'],
+                           period=total['period'], count=total['n'], abs_pct_error_sum=total['error_sum'],
+                           accuracy_sum=total['accuracy_total'], direction_hits=total['hits'], computed_at=started)
+            for total in bucket_totals(rows)
+        ]
+        with transaction.atomic():
+            stale = AccuracyBucket.objects.all() if weeks is None else AccuracyBucket.objects.filter(week__in=weeks)
+            stale.delete()
+            AccuracyBucket.objects.bulk_create(buckets, batch_size=500)
+
+    recomputed = sorted({bucket.week for bucket in buckets} | (weeks or set()))
+    logger.info("Accuracy analytics refreshed: %s weeks, %s buckets%s",
+                len(recomputed), len(buckets), " (full rebuild)" if weeks is None else "")
+    return recomputed
+
+
+def summarize(queryset, *group_by):
+    """Mean error, accuracy and hit rate per group (one row if no group), summed from buckets in the database"""
+    totals = dict(count=Sum('count'), error_sum=Sum('abs_pct_error_sum'), accuracy_total=Sum('accuracy_sum'),
+                  hits=Sum('direction_hits'))
+    if group_by:
+        rows = queryset.order_by().values(*group_by).annotate(**totals).order_by(*group_by)
+    else:
+        rows = [queryset.aggregate(**totals)]
+    return [dict(row,
+                 mape=row['error_sum'] / row['count'],
+                 mean_accuracy=row['accuracy_total'] / row['count'],
+                 hit_rate=100 * row['hits'] / row['count'])
+            for row in rows if row['count']]
+
+
+def report(crypto=None, timeframe=None, weeks=DEFAULT_WEEKS):
+    buckets = AccuracyBucket.objects.all()
+    if crypto:
+        buckets = buckets.filter(crypto=crypto)
+    if timeframe:
+        buckets = buckets.filter(timeframe=timeframe)
+    recent = buckets.filter(week__gte=timezone.localdate() - timedelta(weeks=weeks))
+    return {
+        'overall': summarize(buckets),
+        'by_model': summarize(buckets, 'crypto', 'timeframe'),
+        'by_horizon': summarize(buckets, 'crypto', 'timeframe', 'period'),
+        'by_week': summarize(recent, 'week', 'crypto', 'timeframe'),
+    }
+
+
+@staff_member_required
+def model_accuracy_view(request):
+    """Admin page: accuracy by coin, timeframe, horizon and week, for deciding which models to retrain"""
+    if request.method == 'POST':
+        refresh(full=request.POST.get('full') == '1')
+        return redirect(request.get_full_path())
+    refresh()
+
+    crypto = request.GET.get('crypto') or None
+    timeframe = request.GET.get('timeframe') or None
+    try:
+        weeks = max(1, int(request.GET.get('weeks', DEFAULT_WEEKS)))
+    except ValueError:
+        weeks = DEFAULT_WEEKS
+
+    context = dict(admin.site.each_context(request), title='Model accuracy',
+                   report=report(crypto, timeframe, weeks), crypto=crypto or '', timeframe=timeframe or '',
+                   weeks=weeks, last_refresh=AccuracyBucket.objects.aggregate(last=Max('computed_at'))['last'],
+                   cryptos=AccuracyBucket.objects.order_by('crypto').values_list('crypto', flat=True).distinct())
+    return render(request, 'admin/model_accuracy.html', context)
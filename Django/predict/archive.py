@@ -0,0 +1,235 @@
+"""
+Monthly archival of resolved prediction history
+
+PredictionHistory only grows, and every history page, count and index pays
+for requests nobody looks at again. archive_chunk() moves resolved requests
+made before cutoff() (the start of the month ARCHIVE_AFTER_DAYS ago) into
+PredictionArchive: one row per user, month, coin and timeframe holding a
+zlib-compressed JSON snapshot of each request's forecast and outcome.
+ForecastRun rows stay, since they are shared and feed the model-accuracy
+analytics.
+
+Requests whose run is still unresolved stay live until it resolves; a later
+chunk adds them to the month's archive row. The archive_prediction_history
+task runs chunks of ARCHIVE_CHUNK_SIZE rows, each in its own transaction. A
+chunk appends its entries to an existing row as a separate compressed
+segment rather than re-compressing the whole month, so archiving a busy month
+costs the same per chunk however many chunks it spans.
+
+UserHistory merges a user's live rows and their archive, newest first, into
+one sequence that Paginator can page through.
+"""
+import json
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .models import ForecastRun, PredictionArchive, PredictionHistory, candle_start
+
+# Per-request columns of an archived entry; coin and timeframe are on the archive row
+FIELDS = ('created_at', 'period', 'current_price', 'predicted_price', 'confidence_level', 'market_sentiment',
+          'currency', 'prediction_target_time', 'actual_price', 'resolved_at')
+DECIMALS = {'current_price', 'predicted_price', 'actual_price'}
+DATETIMES = {'created_at', 'prediction_target_time', 'resolved_at'}
+
+
+def month_of(when):
+    """First day of the UTC month containing `when`"""
+    return when.astimezone(dt_timezone.utc).date().replace(day=1)
+
+
+def cutoff(now=None):
+    """Requests made before this are archived once resolved: whole months only, so each is archived once"""
+    return month_start(month_of((now or timezone.now()) - timedelta(days=settings.ARCHIVE_AFTER_DAYS)))
+
+
+def archive_chunk(before, size=None, ids=None):
+    """
+    Move up to `size` resolved requests made before `before` (only those in
+    `ids`, if given) into the archive; returns how many moved
+    """
+    size = size or settings.ARCHIVE_CHUNK_SIZE
+    with transaction.atomic():
+        eligible = PredictionHistory.objects.filter(created_at__lt=before, run__actual_price__isnull=False)
+        if ids is not None:
+            eligible = eligible.filter(pk__in=ids)
+        rows = list(eligible.select_related('run').order_by('created_at', 'id')[:size])
+        if not rows:
+            return 0
+
+        groups = defaultdict(list)
+        for row in rows:
+            groups[(row.user_id, month_of(row.created_at), row.run.crypto, row.run.timeframe)].append(encode(row))
+
+        existing = {
+            (archive.user_id, archive.month, archive.crypto, archive.timeframe): archive
+            for archive in PredictionArchive.objects.filter(user_id__in={key[0] for key in groups},
+                                                            month__in={key[1] for key in groups})
+        }
+        now = timezone.now()
+        created, updated = [], []
+        for key, entries in groups.items():
+            archive = existing.get(key)
+            if archive is None:
+                user_id, month, crypto, timeframe = key
+                archive = PredictionArchive(user_id=user_id, month=month, crypto=crypto, timeframe=timeframe,
+                                            count=0, data=b'')
+                created.append(archive)
+            else:
+                updated.append(archive)
+            # Appended as a segment of its own: earlier chunks' entries are never decompressed again
+            entries.sort(key=lambda entry: entry[0], reverse=True)
+            archive.count += len(entries)
+            archive.data = bytes(archive.data) + pack(entries)
+            archive.archived_at = now
+
+        PredictionArchive.objects.bulk_create(created)
+        PredictionArchive.objects.bulk_update(updated, ['count', 'data', 'archived_at'])
+        PredictionHistory.objects.filter(pk__in=[row.pk for row in rows]).delete()
+    return len(rows)
+
+
+def encode(row):
+    values = []
+    for field in FIELDS:
+        value = getattr(row, field)
+        if value is not None and field in DECIMALS:
+            value = str(value)
+        elif value is not None and field in DATETIMES:
+            value = value.astimezone(dt_timezone.utc).isoformat()
+        values.append(value)
+    return values
+
+
+def decode(entry, user, crypto, timeframe):
+    """An unsaved PredictionHistory (and ForecastRun) for an archived entry, so it renders like a live row"""
+    values = dict(zip(FIELDS, entry))
+    for field in DECIMALS:
+        if values[field] is not None:
+            values[field] = Decimal(values[field])
+    for field in DATETIMES:
+        if values[field] is not None:
+            values[field] = datetime.fromisoformat(values[field])
+    created_at = values.pop('created_at')
+    run = ForecastRun(crypto=crypto, timeframe=timeframe, candle=candle_start(timeframe, created_at), **values)
+    return PredictionHistory(user=user, run=run, created_at=created_at)
+
+
+def pack(entries):
+    """One compressed segment; an archive blob is one or more of them, back to back"""
+    return zlib.compress(json.dumps(entries, separators=(',', ':')).encode(), 9)
+
+
+def unpack(data):
+    """The entries of every segment in an archive blob, newest first"""
+    entries, data = [], bytes(data)
+    while data:
+        segment = zlib.decompressobj()
+        entries += json.loads(segment.decompress(data))
+        data = segment.unused_data
+    entries.sort(key=lambda entry: entry[0], reverse=True)
+    return entries
+
+
+class UserHistory:
+    """
+    A user's predictions, live and archived, newest first; optionally for one
+    coin and/or timeframe. count() and slicing make it a Paginator object
+    list. Live rows from the month after the newest archived one onwards come
+    first and are paged with one query as before. Older months (archived
+    entries plus live rows still waiting to be archived, such as unresolved
+    ones) follow, each merged by created_at and only decompressed when a page
+    reaches it.
+    """
+
+    def __init__(self, user, crypto='', timeframe=''):
+        self.user = user
+        self.live = PredictionHistory.objects.filter(user=user).select_related('run').order_by('-created_at')
+        self.archives = PredictionArchive.objects.filter(user=user)
+        if crypto:
+            self.live = self.live.filter(run__crypto=crypto)
+            self.archives = self.archives.filter(crypto=crypto)
+        if timeframe:
+            self.live = self.live.filter(run__timeframe=timeframe)
+            self.archives = self.archives.filter(timeframe=timeframe)
+
+    @cached_property
+    def archived_counts(self):
+        """{month: archived entries}"""
+        return dict(self.archives.values('month').annotate(total=Sum('count')).order_by()
+                    .values_list('month', 'total'))
+
+    @cached_property
+    def boundary(self):
+        """Start of the month after the newest archived one, or None: later live rows are newer than the archive"""
+        if not self.archived_counts:
+            return None
+        return month_start(next_month(max(self.archived_counts)))
+
+    @cached_property
+    def recent(self):
+        return self.live if self.boundary is None else self.live.filter(created_at__gte=self.boundary)
+
+    @cached_property
+    def recent_count(self):
+        return self.recent.count()
+
+    @cached_property
+    def months(self):
+        """[(month, count)] before the boundary, newest first, counting archived entries and live rows"""
+        totals = defaultdict(int, self.archived_counts)
+        if self.boundary is not None:
+            older = (self.live.filter(created_at__lt=self.boundary).order_by()
+                     .annotate(month=TruncMonth('created_at', tzinfo=dt_timezone.utc))
+                     .values('month').annotate(total=Count('pk')).values_list('month', 'total'))
+            for month, total in older:
+                totals[month.date()] += total
+        return sorted(totals.items(), reverse=True)
+
+    def count(self):
+        return self.recent_count + sum(total for _, total in self.months)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop if index.stop is not None else self.count()
+
+        items = list(self.recent[start:stop]) if start < self.recent_count else []
+        start, stop = max(0, start - self.recent_count), stop - self.recent_count
+        offset = 0
+        for month, total in self.months:
+            if offset >= stop:
+                break
+            if offset + total > start:
+                items += self._month(month)[max(0, start - offset):stop - offset]
+            offset += total
+        return items
+
+    def _month(self, month):
+        entries = list(self.live.filter(created_at__gte=month_start(month),
+                                        created_at__lt=month_start(next_month(month))))
+        if month in self.archived_counts:
+            for archive in self.archives.filter(month=month):
+                entries += [decode(entry, self.user, archive.crypto, archive.timeframe)
+                            for entry in unpack(archive.data)]
+        entries.sort(key=lambda entry: entry.created_at, reverse=True)
+        return entries
+
+
+def month_start(month):
+    return datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+
+
+def next_month(month):
+    return (month.replace(day=1) + timedelta(days=32)).replace(day=1)
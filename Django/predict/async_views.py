@@ -0,0 +1,162 @@
+"""
+Native async versions of the prediction and task-status API views
+
+Served in place of views.prediction_api and views.task_status_api when
+ASYNC_VIEWS is set, which CryptoSight/asgi.py does. Under a sync WSGI worker a
+prediction holds the worker for the whole request: both Binance fetches and
+the model rollout. Here the klines and ticker fetches run concurrently over
+aiohttp (binance_async.py), and the CPU-bound rollout runs on a pool of
+INFERENCE_THREADS threads, so one process keeps hundreds of requests in
+flight while only INFERENCE_THREADS of them are computing. Task status reads
+the Celery result straight from Redis with redis.asyncio.
+
+Anything that touches the database (request.user, the history write) or may
+block on the FX provider goes through sync_to_async. The responses are the
+same as the sync views'.
+"""
+import asyncio
+import functools
+import logging
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import redis.asyncio
+from asgiref.sync import sync_to_async
+from celery import states
+from celery.backends.redis import RedisBackend
+from celery.result import AsyncResult
+from django.conf import settings
+from django.http import HttpResponseNotAllowed, JsonResponse
+
+from . import binance_async, fx, history_buffer, metrics
+from .views import parse_mc_samples, predict_from_data, prediction_payload, sample_prediction, task_status_payload
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_RESULT_CLIENTS = weakref.WeakKeyDictionary()
+
+
+def executor():
+    """The process's inference pool: at most INFERENCE_THREADS rollouts run at once, the rest queue"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.INFERENCE_THREADS, thread_name_prefix='inference')
+    return _executor
+
+
+async def run_inference(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor(), functools.partial(func, *args))
+
+
+async def get_prediction(crypto, timeframe, period, mc_samples=0):
+    """views.get_prediction with the market data fetched concurrently and the rollout on the inference pool"""
+    try:
+        with metrics.timer('total', symbol=crypto, timeframe=timeframe):
+            interval = "1h" if timeframe == 'hourly' else "1d"
+            logger.debug("Starting prediction for %s %s %s", crypto, timeframe, period)
+
+            with metrics.timer('fetch'):
+                historical_df, realtime_price = await asyncio.gather(
+                    binance_async.get_live_data(crypto, interval), binance_async.get_realtime_price(crypto))
+            if historical_df is None or historical_df.empty:
+                raise ValueError(f"Failed to fetch historical data for {crypto}. Binance API may be down.")
+
+            result = await run_inference(predict_from_data, crypto, timeframe, period, historical_df, realtime_price,
+                                         mc_samples)
+        metrics.inc('predictions_total', symbol=crypto, timeframe=timeframe, status='ok')
+        return result
+
+    except Exception as e:
+        metrics.inc('predictions_total', symbol=crypto, timeframe=timeframe, status='error')
+        logger.exception("Prediction error for %s %s %s", crypto, timeframe, period)
+        raise Exception(f"Prediction failed: {str(e)}")
+
+
+async def prediction_api(request):
+    """API endpoint that generates and returns prediction data as JSON"""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    crypto = request.GET.get('crypto', 'BTC')
+    timeframe = request.GET.get('timeframe', 'hourly')
+    period = int(request.GET.get('period', '1'))
+    mc_samples = parse_mc_samples(request)
+
+    try:
+        prediction_data = await get_prediction(crypto, timeframe, period, mc_samples)
+
+        # Save to history if user is authenticated
+        user = await authenticated_user(request)
+        if user is not None:
+            with metrics.timer('db_write'):
+                await sync_to_async(history_buffer.save)(user, crypto, timeframe, period, prediction_data,
+                                                         source='api')
+
+    except Exception as e:
+        logger.warning("Prediction failed, serving sample data: %s", e)
+        prediction_data = sample_prediction(crypto, timeframe, period)
+
+    payload = await sync_to_async(_convert, thread_sensitive=False)(prediction_payload, request, prediction_data)
+    return JsonResponse(payload)
+
+
+async def task_status_api(request):
+    """
+    API endpoint to check the status of a Celery task
+    Returns task status and result if completed
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    task_id = request.GET.get('task_id')
+
+    if not task_id:
+        return JsonResponse({'error': 'task_id parameter is required'}, status=400)
+
+    try:
+        status, result = await task_state(task_id)
+        payload = await sync_to_async(_convert, thread_sensitive=False)(
+            functools.partial(task_status_payload, task_id, status), request, result)
+        return JsonResponse(payload)
+
+    except Exception as e:
+        logger.error("Checking task status: %s", e)
+        return JsonResponse({'status': 'FAILURE', 'error': str(e)}, status=500)
+
+
+async def task_state(task_id):
+    """
+    (status, result) of a Celery task. With the Redis result backend the
+    stored meta is read with redis.asyncio; other backends go through
+    AsyncResult on a worker thread.
+    """
+    task = AsyncResult(task_id)
+    backend = task.backend
+    if type(backend) is not RedisBackend:
+        return await sync_to_async(lambda: (task.status, task.result), thread_sensitive=False)()
+
+    meta = await result_client().get(backend.get_key_for_task(task_id))
+    if not meta:
+        return states.PENDING, None
+    meta = backend.decode_result(meta)
+    return meta['status'], meta['result']
+
+
+def result_client():
+    """redis.asyncio client for the Celery result backend, one per event loop"""
+    loop = asyncio.get_running_loop()
+    client = _RESULT_CLIENTS.get(loop)
+    if client is None:
+        client = _RESULT_CLIENTS[loop] = redis.asyncio.Redis.from_url(settings.CELERY_RESULT_BACKEND,
+                                                                      socket_timeout=5)
+    return client
+
+
+async def authenticated_user(request):
+    """request.user if logged in, else None; resolving it may read the session and user tables"""
+    return await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+
+
+def _convert(build, request, data):
+    # fx.display_currency() may fetch rates on a cache miss, so this runs off the event loop
+    return build(data, fx.display_currency(request))
+
@@ -0,0 +1,194 @@
+"""
+Recorded Binance fixtures and a local stand-in server for benchmarks
+
+Fixtures live in predict/benchmark_fixtures/ as the raw JSON Binance returned:
+- klines_<PAIR>_<interval>.json  (GET /api/v3/klines)
+- ticker_<PAIR>.json             (GET /api/v3/ticker/price)
+
+record_fixtures() (`manage.py bench_prediction --record`) captures them from
+the live API. When a fixture has not been recorded, a deterministic random
+walk in the same wire format is used instead, so benchmarks always run
+offline; fixture_source() says which one a benchmark got, and the reports
+record it.
+"""
+import os
+import json
+import random
+import threading
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import requests
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'benchmark_fixtures')
+
+SYMBOL_PAIRS = {
+    "ADA": "ADAUSDT", "AVAX": "AVAXUSDT", "BNB": "BNBUSDT", "BTC": "BTCUSDT",
+    "DOGE": "DOGEUSDT", "ETH": "ETHUSDT", "SOL": "SOLUSDT", "XRP": "XRPUSDT"
+}
+INTERVAL_MS = {"1h": 3600 * 1000, "1d": 86400 * 1000}
+FIXTURE_CANDLES = 100
+
+# Rough USDT levels used only to synthesize fixtures that have not been recorded
+REFERENCE_PRICES = {
+    "ADAUSDT": 0.85, "AVAXUSDT": 25.0, "BNBUSDT": 900.0, "BTCUSDT": 115000.0,
+    "DOGEUSDT": 0.25, "ETHUSDT": 4500.0, "SOLUSDT": 230.0, "XRPUSDT": 3.0
+}
+
+
+def record_fixtures(base_url='https://api.binance.com', symbols=None, intervals=("1h", "1d")):
+    """Capture live kline and ticker responses into FIXTURES_DIR"""
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    written = []
+    for symbol in symbols or SYMBOL_PAIRS:
+        pair = SYMBOL_PAIRS[symbol]
+        for interval in intervals:
+            response = requests.get(f"{base_url}/api/v3/klines",
+                                    params={"symbol": pair, "interval": interval, "limit": FIXTURE_CANDLES},
+                                    timeout=10)
+            response.raise_for_status()
+            written.append(_write_fixture(f"klines_{pair}_{interval}.json", response.json()))
+        response = requests.get(f"{base_url}/api/v3/ticker/price", params={"symbol": pair}, timeout=10)
+        response.raise_for_status()
+        written.append(_write_fixture(f"ticker_{pair}.json", response.json()))
+    return written
+
+
+def fixture_source(pair, interval):
+    """'recorded' if the pair's klines for `interval` are a captured response, else 'synthetic'"""
+    return 'recorded' if os.path.exists(os.path.join(FIXTURES_DIR, f"klines_{pair}_{interval}.json")) else 'synthetic'
+
+
+def load_klines(pair, interval):
+    recorded = _read_fixture(f"klines_{pair}_{interval}.json")
+    return recorded if recorded is not None else synthesize_klines(pair, interval)
+
+
+def load_ticker(pair):
+    recorded = _read_fixture(f"ticker_{pair}.json")
+    if recorded is not None:
+        return recorded
+    return {"symbol": pair, "price": load_klines(pair, "1h")[-1][4]}
+
+
+def synthesize_klines(pair, interval, count=FIXTURE_CANDLES):
+    """Deterministic random-walk klines in Binance's wire format, ending at the current candle"""
+    rng = random.Random(f"{pair}-{interval}")
+    step = INTERVAL_MS[interval]
+    now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+    open_time = now_ms - now_ms % step - (count - 1) * step
+    price = REFERENCE_PRICES.get(pair, 100.0)
+    vol = 0.01 if interval == "1h" else 0.03
+
+    klines = []
+    for _ in range(count):
+        open_price = price
+        close = open_price * (1 + rng.gauss(0, vol))
+        high = max(open_price, close) * (1 + abs(rng.gauss(0, vol / 2)))
+        low = min(open_price, close) * (1 - abs(rng.gauss(0, vol / 2)))
+        volume = rng.uniform(1000, 5000)
+        klines.append([
+            open_time, f"{open_price:.8f}", f"{high:.8f}", f"{low:.8f}", f"{close:.8f}", f"{volume:.8f}",
+            open_time + step - 1, f"{volume * close:.8f}", rng.randint(1000, 9000),
+            f"{volume / 2:.8f}", f"{volume * close / 2:.8f}", "0"
+        ])
+        open_time += step
+        price = close
+    return klines
+
+
+class _StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # listen backlog; the async view benchmarks open hundreds of connections at once
+
+
+class BinanceStandIn:
+    """Serves /api/v3/klines and /api/v3/ticker/price from fixtures on a local port"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0):
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._klines = {}
+        self.httpd = _StandInServer((host, port), self._handler())
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def klines(self, pair, interval):
+        key = (pair, interval)
+        if key not in self._klines:
+            self._klines[key] = load_klines(pair, interval)
+        return self._klines[key]
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                if server.latency:
+                    threading.Event().wait(server.latency)
+
+                url = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                pair = params.get("symbol", "")
+                if pair not in REFERENCE_PRICES:
+                    return self._send(400, {"code": -1121, "msg": "Invalid symbol."})
+
+                if url.path == "/api/v3/ticker/price":
+                    return self._send(200, load_ticker(pair))
+                if url.path == "/api/v3/klines":
+                    rows = server.klines(pair, params.get("interval", "1h"))
+                    if "startTime" in params:
+                        rows = [k for k in rows if k[0] >= int(params["startTime"])]
+                    limit = int(params.get("limit", 500))
+                    rows = rows[:limit] if "startTime" in params else rows[-limit:]
+                    return self._send(200, rows)
+                self._send(404, {"code": -1, "msg": "Not found"})
+
+            def _send(self, status, body):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+
+def _read_fixture(name):
+    path = os.path.join(FIXTURES_DIR, name)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_fixture(name, data):
+    path = os.path.join(FIXTURES_DIR, name)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    return path
@@ -0,0 +1,82 @@
+"""
+Async Binance market data for the ASGI views
+
+Same endpoints, parsing and metrics as get_live_data()/get_realtime_price()
+in prediction.py, over aiohttp so a fetch waits on the event loop instead of
+holding a thread. Each event loop gets one ClientSession (a pooled, keep-alive
+connector); BINANCE_API_URL is read per call so it can be pointed elsewhere.
+"""
+import asyncio
+import logging
+import weakref
+
+import aiohttp
+
+from . import metrics, prediction
+from .prediction import BINANCE_PAIRS, kline_params, klines_frame
+
+logger = logging.getLogger(__name__)
+
+CONNECTIONS = 100  # concurrent sockets per event loop
+KLINES_TIMEOUT = aiohttp.ClientTimeout(total=10)
+TICKER_TIMEOUT = aiohttp.ClientTimeout(total=5)
+
+_SESSIONS = weakref.WeakKeyDictionary()
+
+
+def session():
+    """The running event loop's ClientSession, created on first use"""
+    loop = asyncio.get_running_loop()
+    client = _SESSIONS.get(loop)
+    if client is None or client.closed:
+        client = _SESSIONS[loop] = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=CONNECTIONS, ttl_dns_cache=300))
+    return client
+
+
+async def close():
+    """Close the running loop's session (the benchmark and tests call this before their loop ends)"""
+    client = _SESSIONS.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+async def get_live_data(symbol="BTC", interval="1h"):
+    """Latest klines for the symbol, OHLC in USDT"""
+    url = f"{prediction.BINANCE_API_URL}/api/v3/klines"
+
+    try:
+        with metrics.binance_timer('klines'):
+            async with session().get(url, params=kline_params(symbol, interval), timeout=KLINES_TIMEOUT) as response:
+                response.raise_for_status()
+                data = await response.json(content_type=None)
+        metrics.inc('binance_requests_total', endpoint='klines', status='ok')
+        return klines_frame(data)
+    except Exception as e:
+        metrics.inc('binance_requests_total', endpoint='klines', status='error')
+        logger.error("Fetching live data for %s %s: %s", symbol, interval, e)
+        return None
+
+
+async def get_realtime_price(symbol="BTC"):
+    """Real-time USDT price for a symbol from the Binance ticker"""
+    pair = BINANCE_PAIRS.get(symbol.upper())
+    if not pair:
+        logger.error("Invalid symbol for real-time price: %s", symbol)
+        return None
+
+    url = f"{prediction.BINANCE_API_URL}/api/v3/ticker/price"
+
+    try:
+        with metrics.binance_timer('ticker'):
+            async with session().get(url, params={"symbol": pair}, timeout=TICKER_TIMEOUT) as response:
+                response.raise_for_status()
+                data = await response.json(content_type=None)
+        price_usdt = float(data['price'])
+        metrics.inc('binance_requests_total', endpoint='ticker', status='ok')
+        logger.debug("Real-time price for %s: $%.2f", symbol, price_usdt)
+        return price_usdt
+    except Exception as e:
+        metrics.inc('binance_requests_total', endpoint='ticker', status='error')
+        logger.error("Fetching real-time price for %s: %s", symbol, e)
+        return None
@@ -0,0 +1,124 @@
+"""
+Streaming export of prediction history as CSV or NDJSON
+
+rows() yields one dict per request: live rows newest first, read with
+.iterator() in chunks, then the monthly archive one PredictionArchive row
+(a user's month for one coin and timeframe) at a time. csv_lines() and
+ndjson_lines() encode them in batches for a StreamingHttpResponse, so memory
+stays flat however many rows are exported. Under ASGI, Django reads a sync
+iterator into a list before sending anything, so the view wraps the lines in
+async_lines(), which produces each batch on a worker thread as it is sent.
+
+Prices are exported in the currency they are stored in (the currency
+column), as decimal strings; times are ISO 8601 in UTC.
+"""
+import csv
+import json
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+
+from .archive import decode, month_of, unpack
+from .models import PredictionArchive, PredictionHistory
+
+COLUMNS = ('user', 'created_at', 'crypto', 'timeframe', 'period', 'currency', 'current_price', 'predicted_price',
+           'actual_price', 'prediction_accuracy', 'confidence_level', 'market_sentiment', 'prediction_target_time',
+           'resolved_at', 'archived')
+CHUNK_SIZE = 2000  # live rows fetched per query
+ARCHIVE_CHUNK_SIZE = 20  # archive rows (compressed months) fetched per query
+LINES_PER_WRITE = 500
+
+
+def rows(user=None, crypto='', timeframe='', start=None, end=None):
+    """
+    Export rows for one user (None: everyone), optionally one coin and/or
+    timeframe, made in [start, end)
+    """
+    live = PredictionHistory.objects.select_related('user', 'run').order_by('-created_at')
+    archives = PredictionArchive.objects.select_related('user').order_by('-month', 'user_id', 'crypto', 'timeframe')
+    if user is not None:
+        live = live.filter(user=user)
+        archives = archives.filter(user=user)
+    if crypto:
+        live = live.filter(run__crypto=crypto)
+        archives = archives.filter(crypto=crypto)
+    if timeframe:
+        live = live.filter(run__timeframe=timeframe)
+        archives = archives.filter(timeframe=timeframe)
+    if start:
+        live = live.filter(created_at__gte=start)
+        archives = archives.filter(month__gte=month_of(start))
+    if end:
+        live = live.filter(created_at__lt=end)
+        archives = archives.filter(month__lte=month_of(end))
+
+    for entry in live.iterator(chunk_size=CHUNK_SIZE):
+        yield _row(entry, archived=False)
+
+    for archive in archives.iterator(chunk_size=ARCHIVE_CHUNK_SIZE):
+        for data in unpack(archive.data):
+            entry = decode(data, archive.user, archive.crypto, archive.timeframe)
+            if (start and entry.created_at < start) or (end and entry.created_at >= end):
+                continue
+            yield _row(entry, archived=True)
+
+
+def _row(entry, archived):
+    row = {'user': entry.user.username}
+    for column in COLUMNS[1:-1]:
+        value = getattr(entry, column)
+        if isinstance(value, Decimal):
+            value = str(value)
+        elif hasattr(value, 'astimezone'):
+            value = value.astimezone(dt_timezone.utc).isoformat()
+        row[column] = value
+    row['archived'] = archived
+    return row
+
+
+class _Echo:
+    """File-like object for csv.writer that returns each line instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMNS)
+    yield from _batched(writer.writerow(['' if row[column] is None else row[column] for column in COLUMNS])
+                        for row in rows)
+
+
+def ndjson_lines(rows):
+    yield from _batched(json.dumps(row, separators=(',', ':')) + "\n" for row in rows)
+
+
+def _batched(lines):
+    """Join lines into larger chunks so the server writes a few KB at a time instead of one line"""
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= LINES_PER_WRITE:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+async def async_lines(lines):
+    """
+    csv_lines()/ndjson_lines() as an async iterator, one batch per
+    sync_to_async call. The calls are thread-sensitive, so the queryset
+    iterators and their database connection stay on one thread.
+    """
+    produce = sync_to_async(next)
+    try:
+        while True:
+            chunk = await produce(lines, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        await sync_to_async(lines.close)()
@@ -0,0 +1,133 @@
+"""
+FX rates for displaying USDT-quoted prices in other currencies
+
+Forecasts, overview snapshots and new ForecastRun rows are all kept in
+USDT, the quote currency of the Binance pairs. Prices are converted only
+when they are rendered, so one cached forecast serves every display currency
+and an FX move never invalidates it.
+
+Rates (units of a currency per USDT, with USDT taken at par with USD) come
+from FX_API_URL and are cached for FX_CACHE_SECONDS. If the provider is
+unreachable, FX_FALLBACK_RATES is used and retried after FX_RETRY_SECONDS.
+"""
+import logging
+from decimal import Decimal
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+QUOTE_CURRENCY = 'USDT'
+CURRENCY_SYMBOLS = {'USDT': '$', 'USD': '$', 'INR': '₹', 'EUR': '€', 'GBP': '£', 'JPY': '¥'}
+RATES_CACHE_KEY = 'fx_rates'
+
+# Payload keys holding prices (single values or lists) in prediction and overview results
+PRICE_KEYS = ('current_price', 'predicted_price', 'min_price', 'max_price', 'next_price',
+              'historical_prices', 'predicted_prices', 'forecast')
+
+
+def get_rates():
+    """{currency: units per USDT}, from cache, the FX provider or the fallback table"""
+    rates = cache.get(RATES_CACHE_KEY)
+    if rates is not None:
+        return rates
+
+    try:
+        with metrics.timer('fx_fetch'):
+            response = requests.get(settings.FX_API_URL, timeout=5)
+        response.raise_for_status()
+        rates = {code.upper(): float(rate) for code, rate in response.json()['rates'].items()}
+        rates['USDT'] = 1.0
+        timeout = settings.FX_CACHE_SECONDS
+        metrics.inc('fx_requests_total', status='ok')
+    except Exception as e:
+        metrics.inc('fx_requests_total', status='error')
+        logger.warning("FX rates unavailable, using fallback rates: %s", e)
+        rates = dict(settings.FX_FALLBACK_RATES)
+        timeout = settings.FX_RETRY_SECONDS
+
+    cache.set(RATES_CACHE_KEY, rates, timeout=timeout)
+    return rates
+
+
+def get_rate(currency, base=QUOTE_CURRENCY):
+    """Units of `currency` per unit of `base`"""
+    if currency == base:
+        return 1.0
+    rates = get_rates()
+    try:
+        return rates[currency] / rates[base]
+    except KeyError:
+        raise ValueError(f"No FX rate for {base} -> {currency}")
+
+
+def convert(amount, currency, base=QUOTE_CURRENCY):
+    if amount is None:
+        return None
+    rate = get_rate(currency, base)
+    if isinstance(amount, Decimal):
+        return amount * Decimal(str(rate))
+    return amount * rate
+
+
+def supported_currencies():
+    return settings.DISPLAY_CURRENCIES
+
+
+def display_currency(request):
+    """?currency=XXX if supported and a rate is available, else default_currency()"""
+    currency = request.GET.get('currency', '').upper()
+    if currency in supported_currencies() and currency in get_rates():
+        return currency
+    return default_currency()
+
+
+def default_currency():
+    """DISPLAY_CURRENCY, or USDT while it has no rate (provider down and not in FX_FALLBACK_RATES)"""
+    if settings.DISPLAY_CURRENCY in get_rates():
+        return settings.DISPLAY_CURRENCY
+    logger.warning("No FX rate for DISPLAY_CURRENCY %s, showing %s", settings.DISPLAY_CURRENCY, QUOTE_CURRENCY)
+    return QUOTE_CURRENCY
+
+
+def symbol_for(currency):
+    return CURRENCY_SYMBOLS.get(currency, f"{currency} ")
+
+
+def convert_payload(data, currency):
+    """
+    Copy of a prediction/overview payload with its prices in `currency`.
+    The payload's own 'currency' key says what it is quoted in (USDT if missing).
+    """
+    rate = get_rate(currency, data.get('currency', QUOTE_CURRENCY))
+    converted = _scale_prices(data, rate)
+    converted['currency'] = currency
+    converted['currency_symbol'] = symbol_for(currency)
+    return converted
+
+
+def _scale_prices(data, rate):
+    def scale(value):
+        if isinstance(value, list):
+            return [None if v is None else v * rate for v in value]
+        return value * rate if isinstance(value, (int, float)) and not isinstance(value, bool) else value
+
+    converted = {key: scale(value) if key in PRICE_KEYS else value for key, value in data.items()}
+    if isinstance(data.get('prediction_bands'), dict):
+        converted['prediction_bands'] = {band: scale(values) for band, values in data['prediction_bands'].items()}
+    if isinstance(data.get('coins'), list):
+        converted['coins'] = [_scale_prices(coin, rate) for coin in data['coins']]
+    return converted
+
+
+def localize_predictions(predictions, currency):
+    """Set display_current_price/display_predicted_price/display_actual_price on PredictionHistory rows"""
+    for prediction in predictions:
+        prediction.display_current_price = convert(prediction.current_price, currency, prediction.currency)
+        prediction.display_predicted_price = convert(prediction.predicted_price, currency, prediction.currency)
+        prediction.display_actual_price = convert(prediction.actual_price, currency, prediction.currency)
+    return predictions
@@ -0,0 +1,189 @@
+"""
+Write-behind buffer for prediction history inserts
+
+With SQLite every history insert takes the database write lock, so web and
+Celery writers serialize on it. When HISTORY_BUFFER_URL is set, save() only
+appends the request to a Redis list, and flush() writes queued requests in
+bulk: one ForecastRun lookup/bulk_create and one PredictionHistory
+bulk_create per batch.
+
+A flush runs when HISTORY_BUFFER_SIZE requests are queued or the oldest is
+HISTORY_BUFFER_SECONDS old (checked on save, with the flush_history_buffer
+beat task as a backstop), at process shutdown, and before a user's history
+is read: views that show history call flush() first, so users always see
+their own requests.
+
+The queue lives in Redis rather than process memory, so a killed process
+loses nothing and any process can flush what another queued. A Redis lock
+lets one flusher run at a time, and entries are trimmed only after their rows
+are committed and only while the flusher still holds the lock. Delivery is
+at least once: the batch of a flusher that dies between commit and trim, or
+whose lock expires mid-write, is written again.
+
+Without HISTORY_BUFFER_URL, or while Redis is unreachable, save() writes
+directly through PredictionHistory.record().
+"""
+import atexit
+import json
+import logging
+import time
+
+import redis
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import metrics
+from .models import ForecastRun, PredictionHistory, candle_start
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = 'history_buffer:queue'
+LOCK_KEY = 'history_buffer:lock'
+LOCK_TIMEOUT = 30  # seconds before a dead flusher's lock expires
+LOCK_WAIT = 10  # seconds a flush waits for a running one
+BATCH_SIZE = 500
+FORECAST_KEYS = ('current_price', 'predicted_price', 'confidence_level', 'market_sentiment', 'currency')
+
+_client = None
+
+
+def enabled():
+    return bool(settings.HISTORY_BUFFER_URL)
+
+
+def client():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.HISTORY_BUFFER_URL, socket_timeout=5)
+    return _client
+
+
+def save(user, crypto, timeframe, period, prediction_data, source):
+    """Queue a user's prediction request for the next flush, or write it now if the buffer is off"""
+    if enabled():
+        entry = {
+            'user_id': user.pk,
+            'crypto': crypto,
+            'timeframe': timeframe,
+            'period': period,
+            'forecast': {key: prediction_data[key] for key in FORECAST_KEYS},
+            'created_at': timezone.now().isoformat(),
+            'queued_at': time.time(),
+        }
+        try:
+            with client().pipeline(transaction=False) as pipe:
+                pipe.rpush(QUEUE_KEY, json.dumps(entry))
+                pipe.lrange(QUEUE_KEY, 0, 0)
+                queued, oldest = pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("History buffer unavailable, writing directly: %s", e)
+        else:
+            metrics.inc('history_buffer_total', source=source, event='queued')
+            age = time.time() - json.loads(oldest[0])['queued_at'] if oldest else 0
+            if queued >= settings.HISTORY_BUFFER_SIZE or age >= settings.HISTORY_BUFFER_SECONDS:
+                flush()
+            return
+
+    _, run_created = PredictionHistory.record(user, crypto, timeframe, period, prediction_data)
+    metrics.inc('history_writes_total', source=source, run='new' if run_created else 'shared')
+
+
+def flush():
+    """Write every queued request to the database; returns how many rows were written"""
+    if not enabled():
+        return 0
+    written = 0
+    try:
+        lock = client().lock(LOCK_KEY, timeout=LOCK_TIMEOUT, blocking_timeout=LOCK_WAIT)
+        if not lock.acquire():
+            logger.warning("History buffer flush skipped: another flush held the lock for %ss", LOCK_WAIT)
+            return 0
+        try:
+            while True:
+                # Restart the lock's timeout for each batch, however long the queue is
+                lock.reacquire()
+                raw = client().lrange(QUEUE_KEY, 0, BATCH_SIZE - 1)
+                if not raw:
+                    break
+                try:
+                    with metrics.timer('history_flush'):
+                        written += _write([json.loads(item) for item in raw])
+                except DatabaseError as e:
+                    # Left queued for the next flush
+                    logger.warning("History buffer flush failed, %s requests stay queued: %s", len(raw), e)
+                    break
+                if not lock.owned():
+                    # The lock expired during the write and another flusher may have trimmed this batch
+                    # already; trimming again would drop requests it never read
+                    logger.warning("History buffer flush lost its lock after writing %s requests; "
+                                   "the flusher now holding it trims the queue", len(raw))
+                    break
+                client().ltrim(QUEUE_KEY, len(raw), -1)
+        finally:
+            try:
+                lock.release()
+            except redis.exceptions.LockError:
+                pass  # expired; another flusher may hold it now
+    except redis.RedisError as e:
+        logger.warning("History buffer flush failed: %s", e)
+    if written:
+        logger.debug("History buffer flushed %s rows", written)
+    return written
+
+
+def _write(entries):
+    # Requests from accounts deleted while they were queued are dropped
+    user_ids = set(User.objects.filter(pk__in={entry['user_id'] for entry in entries})
+                   .values_list('pk', flat=True))
+    queued = len(entries)
+    entries = [entry for entry in entries if entry['user_id'] in user_ids]
+    if len(entries) < queued:
+        metrics.inc('history_buffer_total', queued - len(entries), event='dropped')
+
+    first = {}  # the earliest request in a candle provides the run's forecast
+    for entry in entries:
+        entry['created_at'] = parse_datetime(entry['created_at'])
+        entry['key'] = (entry['crypto'], entry['timeframe'], entry['period'],
+                        candle_start(entry['timeframe'], entry['created_at']))
+        first.setdefault(entry['key'], entry)
+
+    with transaction.atomic():
+        runs = _runs_for(first)
+        missing = []
+        for key, entry in first.items():
+            if key not in runs:
+                crypto, timeframe, period, candle = key
+                missing.append(ForecastRun(crypto=crypto, timeframe=timeframe, period=period, candle=candle,
+                                           **ForecastRun.forecast_fields(timeframe, period, candle,
+                                                                         entry['forecast'])))
+        if missing:
+            # Another writer may have created some of them meanwhile; the unique constraint keeps theirs
+            ForecastRun.objects.bulk_create(missing, ignore_conflicts=True)
+            runs = _runs_for(first)
+        PredictionHistory.objects.bulk_create(
+            [PredictionHistory(user_id=entry['user_id'], run=runs[entry['key']], created_at=entry['created_at'])
+             for entry in entries], batch_size=BATCH_SIZE)
+
+    metrics.inc('history_buffer_total', len(entries), event='flushed')
+    metrics.inc('history_writes_total', len(missing), source='buffer', run='new')
+    metrics.inc('history_writes_total', len(entries) - len(missing), source='buffer', run='shared')
+    return len(entries)
+
+
+def _runs_for(keys):
+    """{(crypto, timeframe, period, candle): run} for the keys that already have a run"""
+    if not keys:
+        return {}
+    cryptos, timeframes, periods, candles = (set(values) for values in zip(*keys))
+    candidates = ForecastRun.objects.filter(crypto__in=cryptos, timeframe__in=timeframes, period__in=periods,
+                                            candle__in=candles)
+    return {key: run for run in candidates
+            if (key := (run.crypto, run.timeframe, run.period, run.candle)) in keys}
+
+
+# Write whatever is still queued when this process exits (Celery pool processes
+# exit without atexit; CryptoSight.celery flushes on worker_process_shutdown)
+atexit.register(flush)
@@ -0,0 +1,165 @@
+"""
+Incremental technical indicators per symbol and interval
+
+Each IndicatorState keeps a fixed window of closes (as many candles as the
+web layer fetches from Binance) and updates its statistics in O(1) per candle:
+- mean absolute return over the window (volatility)
+- up-moves among the last RECENT_WINDOW closes (trend consistency)
+- 10- and 30-candle rate of change (momentum / medium-term trend)
+- EMA of the close
+
+The newest Binance candle is still open, so a candle with the same close time
+as the last one replaces it instead of being appended. `engine.update()`
+feeds a freshly fetched frame into the state for that symbol, touching only
+candles it has not seen.
+"""
+import threading
+from collections import deque
+
+RECENT_WINDOW = 10   # candles for short-term momentum and trend consistency
+MEDIUM_WINDOW = 30   # candles for the medium-term trend
+EMA_SPAN = 12
+
+
+class IndicatorState:
+    def __init__(self, window):
+        self.window = window
+        self.keys = deque(maxlen=window)
+        self.closes = deque(maxlen=window)
+        self.abs_returns = deque()         # one per adjacent pair inside the window
+        self.abs_return_sum = 0.0
+        self.changes = deque()              # last RECENT_WINDOW - 1 signed changes
+        self.up_moves = 0
+        self.ema = None
+        self._ema_before_last = None
+        self._updates_since_resum = 0
+
+    @classmethod
+    def from_prices(cls, prices):
+        state = cls(len(prices))
+        for i, price in enumerate(prices):
+            state.push(i, price)
+        return state
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def last_key(self):
+        return self.keys[-1] if self.keys else None
+
+    def push(self, key, close):
+        """Add a candle, or revise the last one if `key` is the candle still open"""
+        close = float(close)
+        if self.keys and key == self.keys[-1]:
+            self._replace_last(close)
+            return
+        if len(self.keys) == self.window:
+            self._evict_first()
+
+        if self.keys:
+            previous = self.closes[-1]
+            self._add_return(abs(close - previous) / previous)
+            self._add_change(close - previous)
+        self.keys.append(key)
+        self.closes.append(close)
+
+        self._ema_before_last = self.ema
+        self.ema = close if self.ema is None else self._ema_step(self.ema, close)
+
+        self._updates_since_resum += 1
+        if self._updates_since_resum >= self.window:
+            # Re-sum once per window so floating-point drift from add/subtract stays bounded
+            self.abs_return_sum = sum(self.abs_returns)
+            self._updates_since_resum = 0
+
+    def _replace_last(self, close):
+        if len(self.keys) > 1:
+            previous = self.closes[-2]
+            self.abs_return_sum -= self.abs_returns.pop()
+            self._add_return(abs(close - previous) / previous)
+            self.up_moves -= self.changes.pop() > 0
+            self._add_change(close - previous)
+        self.closes[-1] = close
+        self.ema = close if self._ema_before_last is None else self._ema_step(self._ema_before_last, close)
+
+    def _evict_first(self):
+        self.keys.popleft()
+        if self.abs_returns:
+            self.abs_return_sum -= self.abs_returns.popleft()
+
+    def _add_return(self, value):
+        self.abs_returns.append(value)
+        self.abs_return_sum += value
+
+    def _add_change(self, change):
+        self.changes.append(change)
+        self.up_moves += change > 0
+        if len(self.changes) > RECENT_WINDOW - 1:
+            self.up_moves -= self.changes.popleft() > 0
+
+    @staticmethod
+    def _ema_step(ema, close):
+        alpha = 2 / (EMA_SPAN + 1)
+        return ema + alpha * (close - ema)
+
+    def _close_back(self, n):
+        """Close n-1 candles before the last one, limited to the window"""
+        return self.closes[-min(n, len(self.closes))]
+
+    def snapshot(self):
+        points = len(self.keys)
+        last = self.closes[-1]
+        avg_abs_return = self.abs_return_sum / (points - 1) if points > 1 else 0.0
+        recent_base = self._close_back(RECENT_WINDOW)
+        recent_trend = (last - recent_base) / recent_base
+        if points >= MEDIUM_WINDOW:
+            medium_base = self._close_back(MEDIUM_WINDOW)
+            medium_trend = (last - medium_base) / medium_base
+        else:
+            medium_trend = recent_trend
+        changes = len(self.changes)
+        return {
+            'data_points': points,
+            'avg_abs_return': avg_abs_return,
+            'volatility': 'Low' if avg_abs_return < 0.01 else 'Medium' if avg_abs_return < 0.03 else 'High',
+            'up_moves': self.up_moves,
+            'recent_changes': changes,
+            'trend_consistency': abs(self.up_moves - changes / 2) / (changes / 2) if changes else 0.0,
+            'recent_trend': recent_trend,
+            'medium_trend': medium_trend,
+            'ema': self.ema,
+            'ema_gap': (last - self.ema) / self.ema,
+        }
+
+
+class IndicatorEngine:
+    """IndicatorState per (symbol, interval), fed from fetched kline frames"""
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def update(self, symbol, interval, df):
+        """Feed the frame's unseen candles (keyed by close time) and return the snapshot"""
+        keys = df.index
+        closes = df['Close'].to_numpy()
+        with self._lock:
+            state = self._states.get((symbol, interval))
+            if state is not None and state.window == len(keys) and state.last_key in keys:
+                # Resume from the last candle we have, re-fed in case it was still open
+                start = keys.get_loc(state.last_key)
+            else:
+                # First fetch, a gap since the last one, or a different window: reseed
+                state = self._states[(symbol, interval)] = IndicatorState(len(keys))
+                start = 0
+            for key, close in zip(keys[start:], closes[start:]):
+                state.push(key, close)
+            return state.snapshot()
+
+    def reset(self):
+        with self._lock:
+            self._states.clear()
+
+
+engine = IndicatorEngine()
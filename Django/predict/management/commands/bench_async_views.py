@@ -0,0 +1,291 @@
+"""
+Throughput of the sync views under WSGI workers vs the async views under ASGI
+
+    python manage.py bench_async_views [--modes wsgi asgi] [--users 1 16 64 256]
+                                       [--requests 4] [--workers N] [--chat-share 0.25]
+                                       [--binance-latency 0.15] [--output bench_async_views.json]
+
+Each mode runs in its own process against the project's real entry points,
+with Binance replaced by BinanceStandIn:
+
+- wsgi: CryptoSight.wsgi with the sync views, served by --workers handler
+  threads (default 2 * CPUs + 1, gunicorn's recommendation for sync workers).
+  Each takes one request at a time, so a request waits for a free worker the
+  way it waits in gunicorn's backlog.
+- asgi: CryptoSight.asgi (ASYNC_VIEWS on) awaited directly on one event loop,
+  as an ASGI server does, with every request in flight at once.
+
+At each level, --users virtual users send --requests requests each, back to
+back. A request is an anonymous GET /predict/api/predict/ for a random coin and
+horizon, or (a --chat-share fraction) a chatbot price-check POST. Before the
+timed levels, an untimed round loads every model.
+
+Reported per level: completed requests per second, p50/p95/p99 latency,
+failures (non-200 responses, plus predictions that fell back to sample data),
+and the peak number of requests in flight.
+"""
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from argparse import SUPPRESS
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from predict.benchmarking import BinanceStandIn
+
+SYMBOLS = ['ADA', 'AVAX', 'BNB', 'BTC', 'DOGE', 'ETH', 'SOL', 'XRP']
+TIMEFRAMES = {'hourly': [1, 6, 23], 'daily': [1, 7, 30]}
+RESULT_PREFIX = 'RESULT '
+
+
+class Command(BaseCommand):
+    help = "Compare sync views on WSGI workers with the async views on ASGI under concurrent users"
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', default=['wsgi', 'asgi'], choices=['wsgi', 'asgi'])
+        parser.add_argument('--users', nargs='+', type=int, default=[1, 16, 64, 256])
+        parser.add_argument('--requests', type=int, default=4, help="requests per virtual user per level")
+        parser.add_argument('--workers', type=int, default=2 * (os.cpu_count() or 1) + 1,
+                            help="sync worker slots in wsgi mode")
+        parser.add_argument('--chat-share', type=float, default=0.25, help="fraction of chatbot price checks")
+        parser.add_argument('--binance-latency', type=float, default=0.15,
+                            help="simulated Binance round-trip in seconds")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default='bench_async_views.json')
+        # Internal: run one mode in this process
+        parser.add_argument('--run-mode', choices=['wsgi', 'asgi'], help=SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['run_mode']:
+            result = run_mode(options['run_mode'], options)
+            self.stdout.write(RESULT_PREFIX + json.dumps(result))
+            return
+
+        results = []
+        with BinanceStandIn(latency=options['binance_latency']) as binance:
+            for mode in options['modes']:
+                self.stdout.write(f"\n{mode}" + (f" ({options['workers']} sync workers)" if mode == 'wsgi' else
+                                                 f" ({settings.INFERENCE_THREADS} inference threads)"))
+                result = self._spawn(mode, binance.base_url, options)
+                results.append(result)
+                for level in result['levels']:
+                    latency = level['latency_ms']
+                    self.stdout.write(f"  {level['users']:>4} users: {level['throughput']:7.2f} req/s  "
+                                      f"p50 {latency['p50']:8.1f} ms  p95 {latency['p95']:8.1f} ms  "
+                                      f"p99 {latency['p99']:8.1f} ms  {level['failed']:>3} failed  "
+                                      f"{level['peak_in_flight']:>4} peak in flight")
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'requests_per_user': options['requests'],
+            'chat_share': options['chat_share'],
+            'binance_latency': options['binance_latency'],
+            'results': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+        if len(results) == 2:
+            self.stdout.write("")
+            for wsgi, asgi in zip(results[0]['levels'], results[1]['levels']):
+                ratio = asgi['throughput'] / wsgi['throughput'] if wsgi['throughput'] else float('nan')
+                self.stdout.write(f"  {wsgi['users']:>4} users: asgi/wsgi throughput x{ratio:.2f}")
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    def _spawn(self, mode, binance_url, options):
+        command = [sys.executable, 'manage.py', 'bench_async_views', '--run-mode', mode,
+                   '--users', *map(str, options['users']), '--requests', str(options['requests']),
+                   '--workers', str(options['workers']), '--chat-share', str(options['chat_share']),
+                   '--seed', str(options['seed'])]
+        env = dict(os.environ, BINANCE_API_URL=binance_url, ASYNC_VIEWS='1' if mode == 'asgi' else '0')
+        process = subprocess.run(command, cwd=settings.BASE_DIR, env=env, text=True, capture_output=True)
+        for line in reversed(process.stdout.splitlines()):
+            if line.startswith(RESULT_PREFIX):
+                return json.loads(line[len(RESULT_PREFIX):])
+        raise CommandError(f"{mode} run failed (exit {process.returncode}):\n{process.stderr[-3000:]}")
+
+
+def run_mode(mode, options):
+    """Warm up, then measure each user level; runs in the benchmark's subprocess"""
+    return asyncio.run(_run_mode(mode, options))
+
+
+async def _run_mode(mode, options):
+    from predict import binance_async
+
+    server = AsgiServer() if mode == 'asgi' else WsgiServer(options['workers'])
+    rng = random.Random(options['seed'])
+    try:
+        warmup = [prediction_request(symbol, timeframe, periods[-1])
+                  for symbol in SYMBOLS for timeframe, periods in TIMEFRAMES.items()]
+        samples = await asyncio.gather(*(server.request(*request) for request in warmup))
+        if not any(sample['ok'] for sample in samples):
+            raise RuntimeError(f"No successful warm-up request: {samples[0]}")
+
+        levels = []
+        for users in options['users']:
+            levels.append(await measure(server, users, options['requests'], options['chat_share'], rng))
+    finally:
+        server.close()
+        await binance_async.close()
+    return {'mode': mode, 'workers': options['workers'] if mode == 'wsgi' else None,
+            'inference_threads': settings.INFERENCE_THREADS if mode == 'asgi' else None, 'levels': levels}
+
+
+async def measure(server, users, requests, chat_share, rng):
+    plans = [[random_request(rng, chat_share) for _ in range(requests)] for _ in range(users)]
+    samples = []
+
+    async def virtual_user(plan):
+        for request in plan:
+            samples.append(await server.request(*request))
+
+    server.peak = 0
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_user(plan) for plan in plans))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(sample['latency'] for sample in samples if sample['ok'])
+    return {
+        'users': users,
+        'requests': len(samples),
+        'completed': len(latencies),
+        'failed': len(samples) - len(latencies),
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput': round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        'latency_ms': {f"p{q}": round(percentile(latencies, q) * 1000, 1) for q in (50, 95, 99)},
+        'peak_in_flight': server.peak,
+    }
+
+
+def random_request(rng, chat_share):
+    if rng.random() < chat_share:
+        body = json.dumps({'message': rng.choice(SYMBOLS).lower(), 'context': {'awaiting': 'price_check_coin'}})
+        return 'POST', '/chat/', '', body.encode()
+    timeframe = rng.choice(list(TIMEFRAMES))
+    return prediction_request(rng.choice(SYMBOLS), timeframe, rng.choice(TIMEFRAMES[timeframe]))
+
+
+def prediction_request(symbol, timeframe, period):
+    return 'GET', '/predict/api/predict/', urlencode({'crypto': symbol, 'timeframe': timeframe, 'period': period}), b''
+
+
+def check(path, status, body):
+    """A 200 that is a live answer: prediction_api serves sample data (confidence 'High') when it fails"""
+    if status != 200:
+        return False
+    if path == '/predict/api/predict/':
+        return not isinstance(json.loads(body)['result']['confidence_level'], str)
+    return 'current price' in json.loads(body)['message']
+
+
+class WsgiServer:
+    """The WSGI application behind a fixed number of one-request-at-a-time workers"""
+
+    def __init__(self, workers):
+        from CryptoSight.wsgi import application
+
+        self.application = application
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sync-worker')
+        self.in_flight = self.peak = 0
+        self._lock = threading.Lock()
+
+    async def request(self, method, path, query, body):
+        started = time.perf_counter()
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            status, content = await asyncio.get_running_loop().run_in_executor(
+                self.pool, self._handle, method, path, query, body)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        return {'ok': check(path, status, content), 'status': status, 'latency': time.perf_counter() - started}
+
+    def _handle(self, method, path, query, body):
+        environ = {
+            'REQUEST_METHOD': method, 'SCRIPT_NAME': '', 'PATH_INFO': path, 'QUERY_STRING': query,
+            'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': 'localhost', 'REMOTE_ADDR': '127.0.0.1',
+            'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr, 'wsgi.multithread': False, 'wsgi.multiprocess': True, 'wsgi.run_once': False,
+        }
+        status = []
+        response = self.application(environ, lambda line, headers, exc_info=None: status.append(line))
+        try:
+            content = b''.join(response)
+        finally:
+            response.close()
+        return int(status[0].split()[0]), content
+
+    def close(self):
+        self.pool.shutdown()
+
+
+class AsgiServer:
+    """The ASGI application, awaited on the running loop for every request"""
+
+    def __init__(self):
+        from CryptoSight.asgi import application
+
+        self.application = application
+        self.in_flight = self.peak = 0
+
+    async def request(self, method, path, query, body):
+        started = time.perf_counter()
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        status, chunks = [], []
+        received = asyncio.Event()
+
+        async def receive():
+            if received.is_set():
+                await asyncio.Future()  # no disconnect while the response is being produced
+            received.set()
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+            elif message['type'] == 'http.response.body':
+                chunks.append(message.get('body', b''))
+
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'scheme': 'http',
+            'method': method, 'path': path, 'raw_path': path.encode(), 'root_path': '',
+            'query_string': query.encode(), 'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+            'headers': [(b'host', b'localhost'), (b'content-type', b'application/json'),
+                        (b'content-length', str(len(body)).encode())],
+        }
+        try:
+            await self.application(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+        return {'ok': check(path, status[0], b''.join(chunks)), 'status': status[0],
+                'latency': time.perf_counter() - started}
+
+    def close(self):
+        pass
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return float('nan')
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
@@ -0,0 +1,176 @@
+"""
+End-to-end benchmark of the get_prediction path against recorded Binance fixtures
+(synthetic ones where none are recorded; each result says which it used)
+
+    python manage.py bench_prediction [--symbols BTC ETH] [--hourly-horizons 1 6 23]
+                                      [--daily-horizons 1 7 30] [--repeat 5] [--output bench.json]
+                                      [--mc-samples 64]
+    python manage.py bench_prediction --record   # refresh fixtures from the live API
+
+Each stage is timed separately for every model and horizon:
+fetch (klines + ticker), transform (scaler), rollout (LSTM), format
+(inverse scaling + format_prediction_for_web) and db_write (ForecastRun +
+PredictionHistory insert, rolled back). With --mc-samples N, an mc_dropout stage times the
+batched Monte-Carlo dropout rollout that produces the prediction bands.
+Results are written as JSON.
+"""
+import json
+import platform
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from predict import prediction
+from predict.benchmarking import BinanceStandIn, SYMBOL_PAIRS, fixture_source, record_fixtures
+from predict.models import PredictionHistory
+from predict.registry import registry
+from predict.views import format_prediction_for_web
+
+INTERVALS = {'hourly': '1h', 'daily': '1d'}
+
+
+class Command(BaseCommand):
+    help = "Benchmark every stage of get_prediction for all models against recorded Binance fixtures"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--symbols', nargs='+', default=sorted(SYMBOL_PAIRS))
+        parser.add_argument('--hourly-horizons', nargs='+', type=int, default=[1, 6, 23])
+        parser.add_argument('--daily-horizons', nargs='+', type=int, default=[1, 7, 30])
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--output', default='bench_prediction.json')
+        parser.add_argument('--mc-samples', type=int, default=0,
+                            help="also time Monte-Carlo dropout bands with this many samples")
+        parser.add_argument('--record', action='store_true', help="record fresh fixtures from the live Binance API")
+
+    def handle(self, *args, **options):
+        if options['record']:
+            for path in record_fixtures(symbols=options['symbols']):
+                self.stdout.write(f"Recorded {path}")
+            return
+
+        horizons = {'hourly': options['hourly_horizons'], 'daily': options['daily_horizons']}
+        results = []
+
+        with BinanceStandIn() as standin:
+            original_url = prediction.BINANCE_API_URL
+            prediction.BINANCE_API_URL = standin.base_url
+            try:
+                for symbol in options['symbols']:
+                    for timeframe, interval in INTERVALS.items():
+                        cold_load = self._cold_load(symbol, interval)
+                        if cold_load is None:
+                            self.stderr.write(f"Skipping {symbol} {timeframe}: model not available")
+                            continue
+                        for period in horizons[timeframe]:
+                            stages = self._bench_one(symbol, timeframe, interval, period,
+                                                     options['repeat'], options['mc_samples'])
+                            results.append({
+                                'symbol': symbol,
+                                'timeframe': timeframe,
+                                'period': period,
+                                'fixtures': fixture_source(SYMBOL_PAIRS[symbol], interval),
+                                'model_load_seconds': cold_load,
+                                'stages': stages,
+                            })
+                            total = stages['total']['mean_ms']
+                            self.stdout.write(f"{symbol:>5} {timeframe:>6} {period:>3}: {total:8.1f} ms")
+            finally:
+                prediction.BINANCE_API_URL = original_url
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'repeat': options['repeat'],
+            'mc_samples': options['mc_samples'],
+            'results': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        synthetic = sum(result['fixtures'] == 'synthetic' for result in results)
+        if synthetic:
+            self.stdout.write(self.style.WARNING(f"{synthetic} of {len(results)} results used synthetic klines; "
+                                                 f"run with --record to capture live fixtures"))
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} results to {options['output']}"))
+
+    def _cold_load(self, symbol, interval):
+        registry.evict(symbol, interval)
+        start = time.perf_counter()
+        model, scaler = prediction.load_model_and_scaler(symbol, interval)
+        if model is None or scaler is None:
+            return None
+        return round(time.perf_counter() - start, 4)
+
+    def _bench_one(self, symbol, timeframe, interval, period, repeat, mc_samples=0):
+        model, scaler = prediction.load_model_and_scaler(symbol, interval)
+        names = ['fetch', 'transform', 'rollout', 'format', 'db_write', 'total']
+        if mc_samples:
+            names.insert(3, 'mc_dropout')
+        samples = {name: [] for name in names}
+
+        # One untimed pass so TF graph tracing is not attributed to the first sample
+        self._run_stages(symbol, timeframe, interval, period, model, scaler, mc_samples)
+        for _ in range(repeat):
+            for name, seconds in self._run_stages(symbol, timeframe, interval, period,
+                                                  model, scaler, mc_samples).items():
+                samples[name].append(seconds * 1000)
+
+        return {name: _summarize(values) for name, values in samples.items()}
+
+    def _run_stages(self, symbol, timeframe, interval, period, model, scaler, mc_samples=0):
+        timings = {}
+        clock = time.perf_counter
+        started = clock()
+
+        t = clock()
+        historical_df = prediction.get_live_data(symbol, interval)
+        realtime_price = prediction.get_realtime_price(symbol)
+        timings['fetch'] = clock() - t
+        current_price = realtime_price if realtime_price is not None else historical_df['Close'].iloc[-1]
+
+        t = clock()
+        X_input = prediction.prepare_input(historical_df, scaler, prediction.WINDOW_SIZES[interval])
+        timings['transform'] = clock() - t
+
+        t = clock()
+        predictions_scaled = prediction.rollout(model, X_input, period)
+        timings['rollout'] = clock() - t
+
+        if mc_samples:
+            t = clock()
+            samples_scaled = prediction.mc_rollout(model, X_input, period, mc_samples)
+            timings['mc_dropout'] = clock() - t
+
+        t = clock()
+        pred_df = prediction.build_prediction_frame(historical_df, scaler, predictions_scaled, interval)
+        if mc_samples:
+            for column, values in prediction.prediction_bands(scaler, samples_scaled,
+                                                              historical_df.columns).items():
+                pred_df[column] = values
+        result = format_prediction_for_web(symbol, timeframe, period, historical_df, pred_df, current_price)
+        timings['format'] = clock() - t
+
+        t = clock()
+        with transaction.atomic():
+            user, _ = User.objects.get_or_create(username='__bench_prediction__')
+            PredictionHistory.record(user, symbol, timeframe, period, result)
+            transaction.set_rollback(True)
+        timings['db_write'] = clock() - t
+
+        timings['total'] = clock() - started
+        return timings
+
+
+def _summarize(values):
+    ordered = sorted(values)
+    return {
+        'mean_ms': round(statistics.fmean(ordered), 3),
+        'p50_ms': round(ordered[len(ordered) // 2], 3),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        'min_ms': round(ordered[0], 3),
+        'max_ms': round(ordered[-1], 3),
+    }
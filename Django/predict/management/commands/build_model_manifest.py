@@ -0,0 +1,67 @@
+"""
+Write the model registry manifest
+
+    python manage.py build_model_manifest [--output path] [--check]
+
+Scans models_hourly/ and models_daily/ and writes one entry per model
+(files, sha256, version, input window, feature layout) to MODEL_MANIFEST, so
+web and Celery processes start from the manifest instead of hashing every
+file. Run it after deploying or retraining models. Running processes pick up
+changed files by themselves; the manifest only saves them the startup scan.
+
+--check writes nothing. It exits with an error if the manifest is missing
+or out of date, or if a model doesn't fit the app's input layout.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from predict.registry import MODELS_ROOT, describe, discover, problems, read_manifest, write_manifest
+
+COMPARED = ('model_sha256', 'scaler_sha256', 'window', 'features')
+
+
+class Command(BaseCommand):
+    help = "Scan the trained models and write the model registry manifest"
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="manifest path (default: settings.MODEL_MANIFEST)")
+        parser.add_argument('--check', action='store_true', help="only verify the existing manifest")
+
+    def handle(self, *args, **options):
+        path = options['output'] or settings.MODEL_MANIFEST
+        entries = {key: describe(MODELS_ROOT, *key) for key in discover(MODELS_ROOT)}
+        unreadable = sorted(key for key, entry in entries.items() if entry is None)
+        entries = {key: entry for key, entry in entries.items() if entry is not None}
+
+        unfit = []
+        for key in sorted(entries):
+            entry = entries[key]
+            found = problems(entry)
+            if found:
+                unfit.append(key)
+            self.stdout.write(f"  {entry['symbol']:>5} {entry['interval']}  version {entry['version']}  "
+                              f"window {entry['window']}  {len(entry['features'] or []) or entry['n_features']} "
+                              f"features  saved {entry['saved_at']}" + (f"  DOESN'T FIT: {'; '.join(found)}"
+                                                                        if found else ''))
+        for symbol, interval in unreadable:
+            self.stdout.write(self.style.ERROR(f"  {symbol:>5} {interval}  unreadable model or scaler"))
+
+        if options['check']:
+            manifest = read_manifest(path)
+            if manifest is None:
+                raise CommandError(f"No usable manifest at {path}")
+            stale = sorted(key for key in set(manifest) | set(entries)
+                           if key not in manifest or key not in entries
+                           or any(manifest[key].get(field) != entries[key][field] for field in COMPARED))
+            if stale or unfit or unreadable:
+                raise CommandError(f"Manifest {path}: {len(stale)} stale, {len(unfit)} unfit, "
+                                   f"{len(unreadable)} unreadable models")
+            self.stdout.write(self.style.SUCCESS(f"{path} is up to date ({len(entries)} models)"))
+            return
+
+        write_manifest(path, entries)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(entries)} models to {path}"))
+        if unfit or unreadable:
+            raise CommandError(f"{len(unfit)} models don't fit the app's input layout and "
+                               f"{len(unreadable)} are unreadable; they are listed but won't be served")
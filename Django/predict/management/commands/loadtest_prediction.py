@@ -0,0 +1,251 @@
+"""
+Load test of the async prediction flow: prediction_api_async -> Celery -> task_status_api
+
+    python manage.py loadtest_prediction [--pools prefork threads] [--concurrency 1 2 4]
+                                         [--users 1 4 16 32] [--predictions 5]
+                                         [--redis-url redis://...] [--output loadtest.json]
+
+For every pool type and worker concurrency a Celery worker is started against
+a local broker/result backend (the in-process RedisStandIn unless --redis-url
+is given) with Binance replaced by BinanceStandIn. Virtual users then submit
+and poll through the Django test client at each user level.
+
+Reported per level: p50/p95/p99 end-to-end latency (submit until the poll that
+sees the result), throughput, broker ops per prediction (from INFO
+commandstats, so idle worker polling is included) and, per worker
+configuration, the saturation point: the smallest user level whose throughput
+is within 10% of the best observed.
+"""
+import gc
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+
+import redis
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.utils import timezone
+
+from predict.benchmarking import BinanceStandIn
+from predict.redis_standin import RedisStandIn
+
+SYMBOLS = ['ADA', 'AVAX', 'BNB', 'BTC', 'DOGE', 'ETH', 'SOL', 'XRP']
+PERIODS = [1, 6, 23]
+SATURATION_RATIO = 0.9
+
+
+class Command(BaseCommand):
+    help = "Drive virtual users through submit-and-poll against Celery workers and report latency and saturation"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pools', nargs='+', default=['prefork', 'threads'],
+                            choices=['prefork', 'threads', 'solo', 'gevent', 'eventlet'])
+        parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 2, 4])
+        parser.add_argument('--users', nargs='+', type=int, default=[1, 4, 16, 32])
+        parser.add_argument('--predictions', type=int, default=5, help="predictions per virtual user per level")
+        parser.add_argument('--poll-interval', type=float, default=0.25)
+        parser.add_argument('--timeout', type=float, default=120.0, help="give up on a prediction after this many seconds")
+        parser.add_argument('--binance-latency', type=float, default=0.05,
+                            help="simulated Binance round-trip in seconds")
+        parser.add_argument('--redis-url', help="use this Redis server instead of the in-process stand-in")
+        parser.add_argument('--output', default='loadtest_prediction.json')
+
+    def handle(self, *args, **options):
+        standin = None if options['redis_url'] else RedisStandIn().start()
+        broker_url = options['redis_url'] or standin.url
+        # Celery gives these environment variables precedence over settings; the
+        # worker subprocesses inherit them as well
+        os.environ['CELERY_BROKER_URL'] = os.environ['CELERY_RESULT_BACKEND'] = broker_url
+        broker = redis.Redis.from_url(broker_url)
+
+        results = []
+        try:
+            with BinanceStandIn(latency=options['binance_latency']) as binance:
+                for pool, concurrency in itertools.product(options['pools'], options['concurrency']):
+                    broker.flushdb()
+                    self.stdout.write(f"\n{pool} x{concurrency}")
+                    with Worker(pool, concurrency, binance.base_url) as worker:
+                        # Untimed round that doubles as the readiness check, so worker start-up
+                        # and model loads are not attributed to the first level
+                        warmup = self._run_level(concurrency, 1, dict(options, timeout=worker.START_TIMEOUT))
+                        if not any(sample['status'] == 'SUCCESS' for sample in warmup):
+                            raise CommandError(f"Celery worker ({pool} x{concurrency}) did not serve predictions:\n"
+                                               f"{worker.tail()}")
+                        levels = [self._measure(broker, users, options) for users in options['users']]
+                    results.append({
+                        'pool': pool,
+                        'concurrency': concurrency,
+                        'levels': levels,
+                        'saturation': saturation(levels),
+                    })
+        finally:
+            # AsyncResults unsubscribe from the result backend when collected; do it while it is still up
+            gc.collect()
+            if standin:
+                standin.stop()
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'broker': 'stand-in' if standin else options['redis_url'],
+            'predictions_per_user': options['predictions'],
+            'binance_latency': options['binance_latency'],
+            'results': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+        self.stdout.write("")
+        for result in results:
+            point = result['saturation']
+            self.stdout.write(f"{result['pool']:>8} x{result['concurrency']}: saturates at {point['users']} users, "
+                              f"{point['throughput']:.2f} predictions/s")
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    def _measure(self, broker, users, options):
+        before = command_counts(broker)
+        started = time.perf_counter()
+        samples = self._run_level(users, options['predictions'], options)
+        elapsed = time.perf_counter() - started
+        ops = command_counts(broker) - before
+        ops['INFO'] -= 1
+
+        latencies = sorted(s['latency'] for s in samples if s['status'] == 'SUCCESS')
+        completed = len(latencies)
+        level = {
+            'users': users,
+            'submitted': len(samples),
+            'completed': completed,
+            'failed': len(samples) - completed,
+            'elapsed_seconds': round(elapsed, 3),
+            'throughput': round(completed / elapsed, 3) if elapsed else 0.0,
+            'latency_ms': {f"p{q}": round(percentile(latencies, q) * 1000, 1) for q in (50, 95, 99)},
+            'broker_ops': sum(ops.values()),
+            'broker_ops_per_prediction': round(sum(ops.values()) / completed, 1) if completed else None,
+            'broker_commands': dict(ops.most_common()),
+        }
+        p = level['latency_ms']
+        self.stdout.write(f"  {users:>4} users: {level['throughput']:7.2f}/s  p50 {p['p50']:8.1f} ms  "
+                          f"p95 {p['p95']:8.1f} ms  p99 {p['p99']:8.1f} ms  "
+                          f"{level['broker_ops_per_prediction']} broker ops/prediction  {level['failed']} failed")
+        return level
+
+    def _run_level(self, users, predictions, options):
+        samples = []
+        lock = threading.Lock()
+
+        def virtual_user(index):
+            # A view that raises comes back as a 500 sample instead of killing this user's thread
+            client = Client(HTTP_HOST='localhost', raise_request_exception=False)
+            for i in range(predictions):
+                n = index * predictions + i
+                sample = submit_and_poll(client, SYMBOLS[n % len(SYMBOLS)], 'hourly', PERIODS[n % len(PERIODS)],
+                                         options['poll_interval'], options['timeout'])
+                with lock:
+                    samples.append(sample)
+
+        threads = [threading.Thread(target=virtual_user, args=(i,)) for i in range(users)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples
+
+
+def submit_and_poll(client, crypto, timeframe, period, poll_interval, timeout):
+    """One user action: submit a prediction and poll until it finishes"""
+    started = time.perf_counter()
+    response = client.get('/predict/api/predict-async/', {'crypto': crypto, 'timeframe': timeframe, 'period': period})
+    task_id = (json_body(response) or {}).get('task_id')
+    if not task_id:
+        return {'status': 'SUBMIT_FAILED', 'latency': time.perf_counter() - started}
+
+    while time.perf_counter() - started < timeout:
+        data = json_body(client.get('/predict/api/task-status/', {'task_id': task_id}))
+        if data is None:
+            return {'status': 'POLL_FAILED', 'latency': time.perf_counter() - started}
+        if data.get('status') == 'SUCCESS':
+            # generate_prediction_task reports its own failures inside a successful result
+            ok = (data.get('result') or {}).get('status') == 'success'
+            return {'status': 'SUCCESS' if ok else 'ERROR', 'latency': time.perf_counter() - started}
+        if data.get('status') == 'FAILURE':
+            return {'status': 'FAILURE', 'latency': time.perf_counter() - started}
+        time.sleep(poll_interval)
+    return {'status': 'TIMEOUT', 'latency': time.perf_counter() - started}
+
+
+def json_body(response):
+    """The decoded body of a 200 JSON response, else None (error pages under overload are HTML)"""
+    if response.status_code != 200 or not response.get('Content-Type', '').startswith('application/json'):
+        return None
+    try:
+        return json.loads(response.content)
+    except ValueError:
+        return None
+
+
+class Worker:
+    """A celery worker subprocess pointed at the load-test broker and Binance stand-in"""
+
+    START_TIMEOUT = 180.0
+
+    def __init__(self, pool, concurrency, binance_url):
+        self.command = [
+            sys.executable, '-m', 'celery', '-A', 'CryptoSight', 'worker',
+            '-P', pool, '-c', str(concurrency), '-l', 'INFO',
+            '-n', f"loadtest-{pool}-{concurrency}@%h",
+            '--without-gossip', '--without-mingle', '--without-heartbeat',
+        ]
+        self.env = dict(os.environ, BINANCE_API_URL=binance_url, PYTHONUNBUFFERED='1')
+        self.lines = []
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(self.command, cwd=settings.BASE_DIR, env=self.env, text=True,
+                                        stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        threading.Thread(target=self._read_output, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def _read_output(self):
+        for line in self.process.stdout:
+            self.lines.append(line.rstrip())
+
+    def tail(self, lines=20):
+        return "\n".join(self.lines[-lines:])
+
+
+def command_counts(client):
+    stats = client.info('commandstats')
+    return Counter({name[len('cmdstat_'):].upper(): value['calls']
+                    for name, value in stats.items() if name.startswith('cmdstat_')})
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return float('nan')
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+def saturation(levels):
+    """Smallest user level whose throughput is within SATURATION_RATIO of the best level"""
+    best = max(level['throughput'] for level in levels)
+    for level in levels:
+        if level['throughput'] >= best * SATURATION_RATIO:
+            return {'users': level['users'], 'throughput': level['throughput']}
@@ -0,0 +1,276 @@
+"""
+Replay a synthetic week of authenticated prediction traffic against the
+history schema before ForecastRun (one full PredictionHistory row per
+request, migration 0007) and the current one (shared ForecastRun rows plus a
+thin PredictionHistory row per request), and compare write volume and size
+
+    python manage.py replay_history_traffic [--users 300] [--days 7]
+                                            [--requests-per-hour 150] [--seed 42]
+                                            [--output replay_history.json]
+
+The trace follows the selector: coins by popularity, hourly (1-23) or daily
+(1-30) horizons with short ones preferred, a daily cycle peaking in the
+Indian evening, and a few heavy users. Every request is written, then every
+forecast whose target candle closed inside the replay window is resolved,
+the way update_actual_prices_task does it (including the per-user
+AccuracyAggregate updates).
+
+Each schema is migrated into its own scratch SQLite file. Reported per
+schema: rows inserted/updated per table (counted from the executed SQL) and
+table plus index size from SQLite's dbstat.
+"""
+import json
+import math
+import os
+import random
+import re
+import tempfile
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from datetime import timedelta, timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from predict.models import INTERVALS, AccuracyAggregate, ForecastRun, PredictionHistory, candle_start
+
+COIN_WEIGHTS = {'BTC': 0.34, 'ETH': 0.2, 'SOL': 0.1, 'XRP': 0.09, 'BNB': 0.08, 'DOGE': 0.08, 'ADA': 0.06,
+                'AVAX': 0.05}
+START_PRICES = {'BTC': 108000.0, 'ETH': 3900.0, 'SOL': 185.0, 'XRP': 2.4, 'BNB': 1100.0, 'DOGE': 0.19,
+                'ADA': 0.65, 'AVAX': 21.0}
+HORIZONS = {'hourly': 23, 'daily': 30}
+HOURLY_SHARE = 0.7
+PEAK_HOUR_UTC = 14  # 19:30 IST
+
+WRITE_RE = re.compile(r'^\s*(INSERT|UPDATE)\s+(?:OR\s+\w+\s+)?(?:INTO\s+)?"?(\w+)"?', re.IGNORECASE)
+TABLES = ('predict_predictionhistory', 'predict_forecastrun', 'predict_accuracyaggregate')
+
+
+class Command(BaseCommand):
+    help = "Compare history write volume and table size with and without shared ForecastRun rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=300)
+        parser.add_argument('--days', type=int, default=7)
+        parser.add_argument('--requests-per-hour', type=float, default=150.0, help="mean over the day")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', default='replay_history.json')
+
+    def handle(self, *args, **options):
+        trace, end = build_trace(options)
+        self.stdout.write(f"{len(trace)} requests from {options['users']} users over {options['days']} days")
+
+        schemas = {}
+        for name, replay in (('per_request_rows', replay_legacy), ('forecast_runs', replay_runs)):
+            with scratch_database() as db:
+                if name == 'per_request_rows':
+                    call_command('migrate', 'auth', verbosity=0)
+                    call_command('migrate', 'predict', '0007_model_accuracy_analytics', verbosity=0)
+                else:
+                    call_command('migrate', verbosity=0)
+                users = create_users(options['users'])
+                with count_writes() as writes:
+                    replay(trace, users, end)
+                schemas[name] = {
+                    'rows_written': {table: dict(writes[table]) for table in TABLES if table in writes},
+                    'total_rows_written': sum(sum(ops.values()) for ops in writes.values()),
+                    'bytes': table_sizes(db),
+                    'row_counts': row_counts(),
+                }
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'requests': len(trace),
+            'options': {key: options[key] for key in ('users', 'days', 'requests_per_hour', 'seed')},
+            'schemas': schemas,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+        self.stdout.write("")
+        for name, schema in schemas.items():
+            sizes = ', '.join(f"{table.replace('predict_', '')} {size / 1024:.0f} KiB"
+                              for table, size in schema['bytes'].items())
+            self.stdout.write(f"{name:>16}: {schema['total_rows_written']:>7} rows written  "
+                              f"rows {schema['row_counts']}  {sizes}")
+        before, after = schemas['per_request_rows'], schemas['forecast_runs']
+        writes = after['total_rows_written'] / before['total_rows_written']
+        size = sum(after['bytes'].values()) / sum(before['bytes'].values())
+        self.stdout.write(self.style.SUCCESS(f"Rows written x{writes:.2f}, size x{size:.2f}; wrote {options['output']}"))
+
+
+def build_trace(options):
+    """[(time, user index, crypto, timeframe, period, current price)] sorted by time, and the window end"""
+    rng = random.Random(options['seed'])
+    end = candle_start('daily')
+    start = end - timedelta(days=options['days'])
+    coins, coin_weights = zip(*COIN_WEIGHTS.items())
+    # A few heavy users make most of the requests
+    user_weights = [1 / (rank + 1) ** 0.8 for rank in range(options['users'])]
+    prices = dict(START_PRICES)
+
+    trace = []
+    hour = start
+    while hour < end:
+        for coin in prices:
+            prices[coin] *= 1 + rng.gauss(0, 0.006)
+        daily_cycle = 1 + 0.6 * math.cos(2 * math.pi * (hour.hour - PEAK_HOUR_UTC) / 24)
+        for _ in range(_poisson(rng, options['requests_per_hour'] * daily_cycle)):
+            coin = rng.choices(coins, coin_weights)[0]
+            timeframe = 'hourly' if rng.random() < HOURLY_SHARE else 'daily'
+            horizons = range(1, HORIZONS[timeframe] + 1)
+            period = rng.choices(horizons, [1 / h for h in horizons])[0]
+            trace.append((hour + timedelta(seconds=rng.uniform(0, 3600)), rng.choices(range(options['users']),
+                          user_weights)[0], coin, timeframe, period, prices[coin] * (1 + rng.gauss(0, 0.001))))
+        hour += timedelta(hours=1)
+    trace.sort()
+    return trace, end
+
+
+def _poisson(rng, mean):
+    # Knuth's method is fine for the per-hour means used here
+    limit, k, p = math.exp(-mean), 0, 1.0
+    while True:
+        p *= rng.random()
+        if p <= limit:
+            return k
+        k += 1
+
+
+def _rng(*key):
+    # Same numbers in both replays and across runs (hash() of str is salted per process)
+    return random.Random(zlib.crc32(repr(key).encode()))
+
+
+def forecast(request):
+    when, _, coin, timeframe, period, price = request
+    drift = _rng(coin, timeframe, period, when).gauss(0, 0.01)
+    return {'current_price': round(price, 2), 'predicted_price': round(price * (1 + drift), 2),
+            'confidence_level': 75, 'market_sentiment': 'Bullish' if drift > 0 else 'Bearish', 'currency': 'USDT'}
+
+
+def actual_price(coin, target_time):
+    candle = candle_start('hourly', target_time)
+    return START_PRICES[coin] * (1 + _rng(coin, candle).gauss(0, 0.02))
+
+
+def resolvable(timeframe, target_time, end):
+    return candle_start(timeframe, target_time) + INTERVALS[timeframe] <= end
+
+
+def replay_legacy(trace, users, end):
+    """Pre-ForecastRun writes: a full row per request, then one resolution per row"""
+    adapt = connection.ops.adapt_datetimefield_value
+    with connection.cursor() as cursor, transaction.atomic():
+        for request in trace:
+            when, user, coin, timeframe, period, _ = request
+            data = forecast(request)
+            cursor.execute(
+                'INSERT INTO predict_predictionhistory (user_id, crypto, timeframe, period, current_price, '
+                'predicted_price, confidence_level, market_sentiment, created_at, prediction_target_time, '
+                'currency) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)',
+                [users[user], coin, timeframe, period, data['current_price'], data['predicted_price'],
+                 data['confidence_level'], data['market_sentiment'], adapt(when),
+                 adapt(when + period * INTERVALS[timeframe]), data['currency']])
+
+        cursor.execute('SELECT id, user_id, crypto, timeframe, period, current_price, predicted_price, '
+                       'prediction_target_time FROM predict_predictionhistory')
+        rows = cursor.fetchall()
+        for pk, user_id, coin, timeframe, period, current, predicted, target in rows:
+            target = target.replace(tzinfo=dt_timezone.utc)  # stored as naive UTC
+            if not resolvable(timeframe, target, end):
+                continue
+            actual = round(actual_price(coin, target), 2)
+            cursor.execute('UPDATE predict_predictionhistory SET actual_price = %s, resolved_at = %s WHERE id = %s',
+                           [actual, adapt(end), pk])
+            run = ForecastRun(crypto=coin, timeframe=timeframe, period=period, current_price=current,
+                              predicted_price=predicted, actual_price=actual)
+            error, accuracy, hit = run.absolute_percentage_error, run.prediction_accuracy, int(run.direction_hit)
+            for crypto, bucket_timeframe, bucket_period in AccuracyAggregate.buckets_for(run):
+                cursor.execute('INSERT OR IGNORE INTO predict_accuracyaggregate (user_id, crypto, timeframe, period, '
+                               'count, abs_pct_error_sum, accuracy_sum, direction_hits, updated_at) '
+                               'VALUES (%s, %s, %s, %s, 0, 0, 0, 0, %s)',
+                               [user_id, crypto, bucket_timeframe, bucket_period, adapt(end)])
+                cursor.execute('UPDATE predict_accuracyaggregate SET count = count + 1, '
+                               'abs_pct_error_sum = abs_pct_error_sum + %s, accuracy_sum = accuracy_sum + %s, '
+                               'direction_hits = direction_hits + %s, updated_at = %s '
+                               'WHERE user_id = %s AND crypto = %s AND timeframe = %s AND period = %s',
+                               [error, accuracy, hit, adapt(end), user_id, crypto, bucket_timeframe, bucket_period])
+
+
+def replay_runs(trace, users, end):
+    """Current writes, through PredictionHistory.record and ForecastRun.resolve"""
+    user_objects = {user.pk: user for user in User.objects.filter(pk__in=users)}
+    with transaction.atomic():
+        for request in trace:
+            when, user, coin, timeframe, period, _ = request
+            PredictionHistory.record(user_objects[users[user]], coin, timeframe, period, forecast(request), now=when)
+
+        for run in ForecastRun.objects.filter(actual_price__isnull=True):
+            if resolvable(run.timeframe, run.prediction_target_time, end):
+                run.resolve(actual_price(run.crypto, run.prediction_target_time))
+
+
+def create_users(count):
+    User.objects.bulk_create([User(username=f"replay-{i}") for i in range(count)])
+    return list(User.objects.filter(username__startswith='replay-').order_by('pk').values_list('pk', flat=True))
+
+
+@contextmanager
+def scratch_database():
+    """Point the default connection at an empty SQLite file for the duration"""
+    db = connections['default']
+    original = db.settings_dict['NAME']
+    fd, path = tempfile.mkstemp(suffix='.sqlite3', prefix='replay-history-')
+    os.close(fd)
+    db.close()
+    db.settings_dict['NAME'] = path
+    try:
+        yield db
+    finally:
+        db.close()
+        db.settings_dict['NAME'] = original
+        os.remove(path)
+
+
+@contextmanager
+def count_writes():
+    """{table: Counter(INSERT=rows, UPDATE=rows)} for the statements executed inside the block"""
+    writes = {}
+
+    def wrapper(execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        match = WRITE_RE.match(sql)
+        if match:
+            counter = writes.setdefault(match.group(2), Counter())
+            rows = context['cursor'].rowcount
+            if ' RETURNING ' in sql:  # SQLite reports no rowcount for INSERT ... RETURNING
+                rows = len(params) if many else 1
+            counter[match.group(1).upper()] += rows
+        return result
+
+    with connection.execute_wrapper(wrapper):
+        yield writes
+
+
+def table_sizes(db):
+    """Bytes per predict table including its indexes, from dbstat"""
+    with db.cursor() as cursor:
+        cursor.execute('VACUUM')
+        cursor.execute("SELECT m.tbl_name, SUM(s.pgsize) FROM dbstat s JOIN sqlite_master m ON m.name = s.name "
+                       "WHERE m.tbl_name IN (%s) GROUP BY m.tbl_name" % ', '.join(['%s'] * len(TABLES)), TABLES)
+        return dict(sorted(cursor.fetchall()))
+
+
+def row_counts():
+    with connection.cursor() as cursor:
+        counts = {}
+        for table in connection.introspection.table_names(cursor):
+            if table in TABLES:
+                cursor.execute(f'SELECT COUNT(*) FROM {table}')
+                counts[table.replace('predict_', '')] = cursor.fetchone()[0]
+        return counts
@@ -0,0 +1,171 @@
+"""
+Concurrent-writer stress test of the SQLite profiles in settings.SQLITE_PROFILES
+
+    python manage.py stress_sqlite_writers [--profiles rollback wal] [--writers 1 4 8 16]
+                                           [--duration 10] [--output stress_sqlite.json]
+
+For every profile and writer count a scratch database is migrated and that
+many writer processes (like gunicorn and Celery workers) run against it at
+once for --duration seconds. Each operation is one unit of request or task
+work: PredictionHistory.record() for a random coin, horizon and candle
+(history insert, usually creating a ForecastRun), or, one time in five,
+ForecastRun.resolve() for a random unresolved run (actual-price update plus
+the requesting users' AccuracyAggregate rows). Writers call
+close_old_connections() between operations the way Django does between
+requests, so CONN_MAX_AGE applies.
+
+Reported per level: committed operations per second, "database is locked"
+(and other) failures, and p50/p95/p99 operation latency.
+"""
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import SUPPRESS
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections
+from django.utils import timezone
+
+from predict.models import ForecastRun, PredictionHistory
+
+SYMBOLS = ['ADA', 'AVAX', 'BNB', 'BTC', 'DOGE', 'ETH', 'SOL', 'XRP']
+RESOLVE_SHARE = 0.2
+START_DELAY = 0.5  # seconds between the last writer reporting ready and the shared start time
+
+
+class Command(BaseCommand):
+    help = "Measure concurrent SQLite writer throughput and lock errors per SQLite profile"
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='+', default=['rollback', 'wal'],
+                            choices=sorted(settings.SQLITE_PROFILES))
+        parser.add_argument('--writers', nargs='+', type=int, default=[1, 4, 8, 16])
+        parser.add_argument('--duration', type=float, default=10.0, help="seconds per level")
+        parser.add_argument('--output', default='stress_sqlite.json')
+        # Internal: run as one writer process
+        parser.add_argument('--writer', type=int, help=SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['writer'] is not None:
+            return run_writer(options['writer'], options['duration'])
+
+        results = []
+        for profile in options['profiles']:
+            self.stdout.write(f"\n{profile}")
+            for writers in options['writers']:
+                level = self._run_level(profile, writers, options['duration'])
+                results.append(level)
+                latency = level['latency_ms']
+                self.stdout.write(f"  {writers:>3} writers: {level['throughput']:8.1f} ops/s  "
+                                  f"{level['locked']:>5} locked  {level['failed']:>3} other failures  "
+                                  f"p50 {latency['p50']:7.1f} ms  p95 {latency['p95']:7.1f} ms  "
+                                  f"p99 {latency['p99']:7.1f} ms")
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'cpu_count': os.cpu_count(),
+            'duration': options['duration'],
+            'results': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"\nWrote {options['output']}"))
+
+    def _run_level(self, profile, writers, duration):
+        with tempfile.TemporaryDirectory(prefix='stress-sqlite-') as directory:
+            env = dict(os.environ, SQLITE_PROFILE=profile, SQLITE_PATH=os.path.join(directory, 'db.sqlite3'))
+            manage = [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py')]
+            subprocess.run(manage + ['migrate', '--skip-checks', '--verbosity', '0'], env=env, check=True)
+
+            processes = [
+                subprocess.Popen(manage + ['stress_sqlite_writers', '--writer', str(i), '--duration', str(duration)],
+                                 env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                 text=True)
+                for i in range(writers)
+            ]
+            # Start everyone together once every writer has booted (Django setup imports TensorFlow)
+            for process in processes:
+                if process.stdout.readline().strip() != 'ready':
+                    process.wait()
+                    raise CommandError(f"Writer failed to start ({profile}, {writers} writers):\n"
+                                       f"{process.stderr.read()[-2000:]}")
+            start_at = time.time() + START_DELAY
+            for process in processes:
+                process.stdin.write(f"{start_at}\n")
+                process.stdin.flush()
+            outcomes = []
+            for process in processes:
+                stdout, stderr = process.communicate()
+                if process.returncode:
+                    raise CommandError(f"Writer failed ({profile}, {writers} writers):\n{stderr[-2000:]}")
+                outcomes.append(json.loads(stdout.strip().splitlines()[-1]))
+
+        latencies = sorted(latency for outcome in outcomes for latency in outcome['latencies'])
+        committed = sum(outcome['committed'] for outcome in outcomes)
+        return {
+            'profile': profile,
+            'writers': writers,
+            'committed': committed,
+            'locked': sum(outcome['locked'] for outcome in outcomes),
+            'failed': sum(outcome['failed'] for outcome in outcomes),
+            'throughput': round(committed / duration, 1),
+            'latency_ms': {f"p{q}": round(percentile(latencies, q) * 1000, 1) for q in (50, 95, 99)},
+        }
+
+
+def run_writer(index, duration):
+    rng = random.Random(index)
+    user, _ = User.objects.get_or_create(username=f"stress-writer-{index}")
+    data = {'current_price': 100.0, 'predicted_price': 101.0, 'confidence_level': 70,
+            'market_sentiment': 'Bullish', 'currency': 'USDT'}
+    close_old_connections()
+
+    sys.stdout.write("ready\n")
+    sys.stdout.flush()
+    start_at = float(sys.stdin.readline())
+    time.sleep(max(0.0, start_at - time.time()))
+    deadline = start_at + duration
+    committed = locked = failed = 0
+    latencies = []
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            if rng.random() < RESOLVE_SHARE:
+                run = ForecastRun.objects.filter(actual_price__isnull=True).order_by('?').first()
+                if run is not None:
+                    run.resolve(rng.uniform(90, 110))
+            else:
+                # Spread requests over past candles so most of them create a run, like a busy hour
+                when = timezone.now() - timedelta(hours=rng.randrange(24 * 30))
+                PredictionHistory.record(user, rng.choice(SYMBOLS), rng.choice(['hourly', 'daily']),
+                                         rng.randint(1, 23), data, now=when)
+            committed += 1
+            latencies.append(time.perf_counter() - started)
+        except OperationalError as e:
+            if 'locked' in str(e):
+                locked += 1
+            else:
+                failed += 1
+        finally:
+            close_old_connections()
+
+    sys.stdout.write(json.dumps({'committed': committed, 'locked': locked, 'failed': failed,
+                                 'latencies': latencies}) + "\n")
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
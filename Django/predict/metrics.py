@@ -0,0 +1,213 @@
+"""
+Lightweight timers and counters with a Prometheus text endpoint
+
+Each process (runserver/gunicorn workers, Celery workers) keeps its metrics in
+memory and periodically dumps a snapshot to settings.METRICS_DIR. The
+/predict/metrics/ view merges the snapshots of all live processes, so one
+scrape covers the web tier and the workers.
+
+Usage:
+    with metrics.timer('inference'):
+        ...
+    metrics.inc('binance_requests_total', endpoint='klines', status='ok')
+"""
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+PREFIX = 'cryptosight_'
+STAGE_METRIC = 'stage_seconds'
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+FLUSH_INTERVAL = 5.0  # seconds between snapshot dumps per process
+
+HELP = {
+    'stage_seconds': 'Time spent per prediction stage',
+    'binance_request_seconds': 'Latency of Binance REST calls',
+    'binance_requests_total': 'Binance REST calls by endpoint and outcome',
+    'model_cache_total': 'Model/scaler cache lookups',
+    'model_reloads_total': 'Changed model files loaded by the registry, by whether they were swapped in',
+    'predictions_total': 'Predictions served by source and outcome',
+    'history_writes_total': 'PredictionHistory rows written, by whether they created a ForecastRun',
+    'history_buffer_total': 'History requests queued, flushed or dropped by the write-behind buffer',
+    'history_exports_total': 'Prediction history exports started, by format and whose history',
+}
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_last_flush = 0.0
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    with _lock:
+        key = _key(name, labels)
+        _counters[key] = _counters.get(key, 0) + value
+    _maybe_flush()
+
+
+def observe(name, seconds, **labels):
+    with _lock:
+        key = _key(name, labels)
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0}
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                hist['buckets'][i] += 1
+        hist['sum'] += seconds
+        hist['count'] += 1
+    _maybe_flush()
+
+
+@contextmanager
+def timer(stage, metric=STAGE_METRIC, **labels):
+    """Time a block into `metric` (stage_seconds by default) labelled with the stage name"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(metric, time.perf_counter() - start, stage=stage, **labels)
+
+
+@contextmanager
+def binance_timer(endpoint):
+    """Time a Binance REST call into binance_request_seconds"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe('binance_request_seconds', time.perf_counter() - start, endpoint=endpoint)
+
+
+def snapshot():
+    with _lock:
+        return {
+            'pid': os.getpid(),
+            'counters': [[name, list(labels), value] for (name, labels), value in _counters.items()],
+            'histograms': [[name, list(labels), dict(h, buckets=list(h['buckets']))]
+                           for (name, labels), h in _histograms.items()],
+        }
+
+
+def flush():
+    """Write this process's snapshot where the metrics view can merge it"""
+    global _last_flush
+    directory = _metrics_dir()
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot(), f)
+    os.replace(tmp_path, path)
+    _last_flush = time.monotonic()
+
+
+def _maybe_flush():
+    if time.monotonic() - _last_flush >= FLUSH_INTERVAL:
+        try:
+            flush()
+        except OSError:
+            pass
+
+
+def collect():
+    """Merge this process's live metrics with the snapshots of other live processes"""
+    snapshots = [snapshot()]
+    directory = _metrics_dir()
+    for path in glob.glob(os.path.join(directory, '*.json')) if directory else []:
+        pid = int(os.path.basename(path).split('.')[0])
+        if pid == os.getpid():
+            continue
+        if not _pid_alive(pid):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+
+    counters, histograms = {}, {}
+    for snap in snapshots:
+        for name, labels, value in snap['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, hist in snap['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(key, {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0})
+            merged['buckets'] = [a + b for a, b in zip(merged['buckets'], hist['buckets'])]
+            merged['sum'] += hist['sum']
+            merged['count'] += hist['count']
+    return counters, histograms
+
+
+def render_prometheus():
+    """Prometheus text exposition format (version 0.0.4)"""
+    counters, histograms = collect()
+    lines = []
+
+    for name in sorted({name for name, _ in counters}):
+        full = PREFIX + name
+        lines.append(f"# HELP {full} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {full} counter")
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f"{full}{_labels(labels)} {value}")
+
+    for name in sorted({name for name, _ in histograms}):
+        full = PREFIX + name
+        lines.append(f"# HELP {full} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {full} histogram")
+        for (metric, labels), hist in sorted(histograms.items()):
+            if metric != name:
+                continue
+            for bound, count in zip(BUCKETS, hist['buckets']):
+                lines.append(f"{full}_bucket{_labels(labels + (('le', repr(bound)),))} {count}")
+            lines.append(f"{full}_bucket{_labels(labels + (('le', '+Inf'),))} {hist['count']}")
+            lines.append(f"{full}_sum{_labels(labels)} {hist['sum']:.6f}")
+            lines.append(f"{full}_count{_labels(labels)} {hist['count']}")
+
+    return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (f'{k}="{_escape(v)}"' for k, v in labels)
+    return '{' + ','.join(escaped) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _metrics_dir():
+    try:
+        from django.conf import settings
+        return getattr(settings, 'METRICS_DIR', None)
+    except Exception:
+        return os.environ.get('METRICS_DIR')
+
+
+def _pid_alive(pid):
+    if os.name == 'nt':
+        return True  # os.kill(pid, 0) would terminate the process on Windows
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
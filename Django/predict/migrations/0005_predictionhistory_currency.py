@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predict', '0004_predictionhistory_actual_price'),
+    ]
+
+    operations = [
+        # Rows written before this migration hold INR prices
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='currency',
+            field=models.CharField(default='INR', max_length=8),
+        ),
+        migrations.AlterField(
+            model_name='predictionhistory',
+            name='currency',
+            field=models.CharField(default='USDT', max_length=8),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_aggregates(apps, schema_editor):
+    """Build aggregates from predictions resolved before this migration (mirrors AccuracyAggregate.record)"""
+    PredictionHistory = apps.get_model('predict', 'PredictionHistory')
+    AccuracyAggregate = apps.get_model('predict', 'AccuracyAggregate')
+    ALL = '*'
+
+    totals = {}
+    resolved = PredictionHistory.objects.filter(actual_price__isnull=False).exclude(actual_price=0)
+    for prediction in resolved.iterator():
+        actual, predicted, current = prediction.actual_price, prediction.predicted_price, prediction.current_price
+        error = float(abs((actual - predicted) / actual) * 100)
+        accuracy = round(max(0, min(100, 100 - error)), 2)
+        hit = ((predicted > current) - (predicted < current)) == ((actual > current) - (actual < current))
+        for key in ((prediction.crypto, prediction.timeframe, prediction.period),
+                    (prediction.crypto, ALL, 0), (ALL, prediction.timeframe, 0), (ALL, ALL, 0)):
+            bucket = totals.setdefault((prediction.user_id,) + key, [0, 0.0, 0.0, 0])
+            bucket[0] += 1
+            bucket[1] += error
+            bucket[2] += accuracy
+            bucket[3] += hit
+
+    AccuracyAggregate.objects.bulk_create([
+        AccuracyAggregate(user_id=user_id, crypto=crypto, timeframe=timeframe, period=period, count=count,
+                          abs_pct_error_sum=error_sum, accuracy_sum=accuracy_sum, direction_hits=hits)
+        for (user_id, crypto, timeframe, period), (count, error_sum, accuracy_sum, hits) in totals.items()
+    ], batch_size=500)
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('predict', '0005_predictionhistory_currency'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccuracyAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('crypto', models.CharField(max_length=10)),
+                ('timeframe', models.CharField(max_length=10)),
+                ('period', models.IntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('abs_pct_error_sum', models.FloatField(default=0)),
+                ('accuracy_sum', models.FloatField(default=0)),
+                ('direction_hits', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='accuracy_aggregates', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='accuracyaggregate',
+            constraint=models.UniqueConstraint(fields=('user', 'crypto', 'timeframe', 'period'), name='unique_accuracy_bucket'),
+        ),
+        migrations.RunPython(backfill_aggregates, migrations.RunPython.noop),
+    ]
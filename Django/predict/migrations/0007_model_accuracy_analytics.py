@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:02
+
+from django.db import migrations, models
+
+
+def stamp_resolved_rows(apps, schema_editor):
+    """Rows resolved before resolved_at existed: the target time is the best available stamp"""
+    PredictionHistory = apps.get_model('predict', 'PredictionHistory')
+    PredictionHistory.objects.filter(actual_price__isnull=False, resolved_at__isnull=True).update(
+        resolved_at=models.F('prediction_target_time'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predict', '0006_accuracyaggregate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccuracyBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week', models.DateField()),
+                ('crypto', models.CharField(max_length=10)),
+                ('timeframe', models.CharField(max_length=10)),
+                ('period', models.IntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('abs_pct_error_sum', models.FloatField(default=0)),
+                ('accuracy_sum', models.FloatField(default=0)),
+                ('direction_hits', models.PositiveIntegerField(default=0)),
+                ('computed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='resolved_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='predictionhistory',
+            index=models.Index(fields=['prediction_target_time'], name='prediction_target_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='predictionhistory',
+            index=models.Index(fields=['resolved_at'], name='prediction_resolved_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accuracybucket',
+            index=models.Index(fields=['computed_at'], name='accuracy_bucket_computed_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='accuracybucket',
+            constraint=models.UniqueConstraint(fields=('week', 'crypto', 'timeframe', 'period'), name='unique_accuracy_week_bucket'),
+        ),
+        migrations.RunPython(stamp_resolved_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,156 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:04
+
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+INTERVALS = {'hourly': timedelta(hours=1), 'daily': timedelta(days=1)}
+
+
+def candle_start(timeframe, when):
+    when = when.astimezone(dt_timezone.utc)
+    if timeframe == 'daily':
+        return when.replace(hour=0, minute=0, second=0, microsecond=0)
+    return when.replace(minute=0, second=0, microsecond=0)
+
+
+def build_runs(apps, schema_editor):
+    """
+    One ForecastRun per (crypto, timeframe, period) and candle of created_at.
+    Rows that share a key are merged into the earliest one's forecast; the
+    actual price comes from whichever of them was resolved. A later row whose
+    own forecast differed now shows (and is scored by) the earliest one's: the
+    per-row columns are dropped below, so its original values are not kept.
+    The per-user accuracy aggregates are rebuilt from the runs to match.
+    """
+    PredictionHistory = apps.get_model('predict', 'PredictionHistory')
+    ForecastRun = apps.get_model('predict', 'ForecastRun')
+    AccuracyBucket = apps.get_model('predict', 'AccuracyBucket')
+    AccuracyAggregate = apps.get_model('predict', 'AccuracyAggregate')
+
+    runs = {}
+    rows = list(PredictionHistory.objects.order_by('created_at', 'id'))
+    for row in rows:
+        key = (row.crypto, row.timeframe, row.period, candle_start(row.timeframe, row.created_at))
+        run = runs.get(key)
+        if run is None:
+            run = runs[key] = ForecastRun(
+                crypto=row.crypto, timeframe=row.timeframe, period=row.period, candle=key[3],
+                current_price=row.current_price, predicted_price=row.predicted_price,
+                confidence_level=row.confidence_level, market_sentiment=row.market_sentiment,
+                currency=row.currency,
+                prediction_target_time=(row.prediction_target_time
+                                        or row.created_at + row.period * INTERVALS.get(row.timeframe, timedelta(hours=1))),
+            )
+        if run.actual_price is None and row.actual_price is not None:
+            run.actual_price, run.resolved_at = row.actual_price, row.resolved_at
+        row.run = run
+
+    ForecastRun.objects.bulk_create(runs.values(), batch_size=500)
+    for row in rows:
+        row.run_id = row.run.pk
+    PredictionHistory.objects.bulk_update(rows, ['run'], batch_size=500)
+
+    # Weekly buckets counted rows; rebuild them from runs on the next refresh
+    AccuracyBucket.objects.all().delete()
+
+    # The aggregates were built from each row's own forecast (0006); count every request at its run's instead
+    # (mirrors AccuracyAggregate.record)
+    ALL = '*'
+    totals = {}
+    for row in rows:
+        run = row.run
+        actual, predicted, current = run.actual_price, run.predicted_price, run.current_price
+        if actual is None or actual == 0:
+            continue
+        error = float(abs((actual - predicted) / actual) * 100)
+        accuracy = round(max(0, min(100, 100 - error)), 2)
+        hit = ((predicted > current) - (predicted < current)) == ((actual > current) - (actual < current))
+        for key in ((run.crypto, run.timeframe, run.period), (run.crypto, ALL, 0), (ALL, run.timeframe, 0),
+                    (ALL, ALL, 0)):
+            bucket = totals.setdefault((row.user_id,) + key, [0, 0.0, 0.0, 0])
+            bucket[0] += 1
+            bucket[1] += error
+            bucket[2] += accuracy
+            bucket[3] += hit
+
+    AccuracyAggregate.objects.all().delete()
+    AccuracyAggregate.objects.bulk_create([
+        AccuracyAggregate(user_id=user_id, crypto=crypto, timeframe=timeframe, period=period, count=count,
+                          abs_pct_error_sum=error_sum, accuracy_sum=accuracy_sum, direction_hits=hits)
+        for (user_id, crypto, timeframe, period), (count, error_sum, accuracy_sum, hits) in totals.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predict', '0007_model_accuracy_analytics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('crypto', models.CharField(max_length=10)),
+                ('timeframe', models.CharField(max_length=10)),
+                ('period', models.IntegerField()),
+                ('candle', models.DateTimeField()),
+                ('current_price', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('predicted_price', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('confidence_level', models.IntegerField()),
+                ('market_sentiment', models.CharField(max_length=20)),
+                ('currency', models.CharField(default='USDT', max_length=8)),
+                ('prediction_target_time', models.DateTimeField()),
+                ('actual_price', models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-candle'],
+            },
+        ),
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='run',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='requests', to='predict.forecastrun'),
+        ),
+        migrations.RunPython(build_runs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='predictionhistory',
+            name='run',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='requests', to='predict.forecastrun'),
+        ),
+        migrations.RemoveIndex(
+            model_name='predictionhistory',
+            name='prediction_target_time_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='predictionhistory',
+            name='prediction_resolved_at_idx',
+        ),
+        migrations.RemoveField(model_name='predictionhistory', name='crypto'),
+        migrations.RemoveField(model_name='predictionhistory', name='timeframe'),
+        migrations.RemoveField(model_name='predictionhistory', name='period'),
+        migrations.RemoveField(model_name='predictionhistory', name='current_price'),
+        migrations.RemoveField(model_name='predictionhistory', name='predicted_price'),
+        migrations.RemoveField(model_name='predictionhistory', name='confidence_level'),
+        migrations.RemoveField(model_name='predictionhistory', name='market_sentiment'),
+        migrations.RemoveField(model_name='predictionhistory', name='prediction_target_time'),
+        migrations.RemoveField(model_name='predictionhistory', name='actual_price'),
+        migrations.RemoveField(model_name='predictionhistory', name='currency'),
+        migrations.RemoveField(model_name='predictionhistory', name='resolved_at'),
+        migrations.AddIndex(
+            model_name='forecastrun',
+            index=models.Index(fields=['prediction_target_time'], name='forecast_target_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='forecastrun',
+            index=models.Index(fields=['resolved_at'], name='forecast_resolved_at_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='forecastrun',
+            constraint=models.UniqueConstraint(fields=('crypto', 'timeframe', 'period', 'candle'), name='unique_forecast_run'),
+        ),
+    ]
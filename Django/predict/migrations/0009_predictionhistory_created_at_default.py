@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:25
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predict', '0008_forecastrun'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='predictionhistory',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
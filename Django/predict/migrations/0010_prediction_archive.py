@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('predict', '0009_predictionhistory_created_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PredictionArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('crypto', models.CharField(max_length=10)),
+                ('timeframe', models.CharField(max_length=10)),
+                ('count', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+                ('archived_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['-month'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='predictionhistory',
+            index=models.Index(fields=['created_at'], name='history_created_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='predictionarchive',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prediction_archives', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='predictionarchive',
+            constraint=models.UniqueConstraint(fields=('user', 'month', 'crypto', 'timeframe'), name='unique_prediction_archive'),
+        ),
+    ]
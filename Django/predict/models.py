@@ -1,33 +1,102 @@
 """
 Database models for cryptocurrency price prediction app
 """
-from django.db import models
+from collections import Counter
+from datetime import timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 
-class PredictionHistory(models.Model):
-    """Database model for storing cryptocurrency price prediction history"""
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='predictions')
+INTERVALS = {'hourly': timedelta(hours=1), 'daily': timedelta(days=1)}
+
+
+def candle_start(timeframe, when=None):
+    """Open time (UTC) of the hourly/daily Binance candle containing `when` (default: now)"""
+    when = (when or timezone.now()).astimezone(dt_timezone.utc)
+    if timeframe == 'daily':
+        return when.replace(hour=0, minute=0, second=0, microsecond=0)
+    return when.replace(minute=0, second=0, microsecond=0)
+
+
+class ForecastRun(models.Model):
+    """
+    One forecast per (crypto, timeframe, period) and candle. The first request
+    in a candle stores its forecast; later requests in the same candle only
+    add a PredictionHistory row pointing here, and the actual price is
+    resolved once per run instead of once per user.
+
+    A later request still gets the forecast it computed in its response (the
+    chart needs the whole curve, and only its end point is stored here), but
+    its history row shows, and is scored by, the run's forecast. Within one
+    candle the two differ only by how far the live price moved.
+    """
     crypto = models.CharField(max_length=10)  # Cryptocurrency symbol (BTC, ETH, etc.)
     timeframe = models.CharField(max_length=10)  # Prediction timeframe (hourly or daily)
     period = models.IntegerField()  # Number of time periods predicted
-    
+    candle = models.DateTimeField()  # Open time (UTC) of the candle the forecast was made in
+
     current_price = models.DecimalField(max_digits=15, decimal_places=2)
     predicted_price = models.DecimalField(max_digits=15, decimal_places=2)
     confidence_level = models.IntegerField()
     market_sentiment = models.CharField(max_length=20)
-    
-    created_at = models.DateTimeField(auto_now_add=True)
-    prediction_target_time = models.DateTimeField(null=True, blank=True)  # When the prediction was for
+    currency = models.CharField(max_length=8, default='USDT')  # Currency of the stored prices; runs from INR-era rows are INR
+
+    prediction_target_time = models.DateTimeField()  # Inside the candle whose close resolves the forecast
     actual_price = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True)
-    
+    resolved_at = models.DateTimeField(null=True, blank=True)  # When actual_price was filled in
+
     class Meta:
-        ordering = ['-created_at']
-        verbose_name_plural = 'Prediction Histories'
-    
+        ordering = ['-candle']
+        constraints = [
+            models.UniqueConstraint(fields=['crypto', 'timeframe', 'period', 'candle'], name='unique_forecast_run'),
+        ]
+        indexes = [
+            # Pending-price scan and model-accuracy analytics (weekly buckets, runs resolved since the last refresh)
+            models.Index(fields=['prediction_target_time'], name='forecast_target_time_idx'),
+            models.Index(fields=['resolved_at'], name='forecast_resolved_at_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.user.username} - {self.crypto} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
-    
+        return f"{self.crypto}/{self.timeframe}/{self.period} @ {self.candle.strftime('%Y-%m-%d %H:%M')}"
+
+    @classmethod
+    def for_prediction(cls, crypto, timeframe, period, prediction_data, now=None):
+        """(run, created): the run for the current candle, stored from `prediction_data` if it is the first"""
+        candle = candle_start(timeframe, now)
+        return cls.objects.get_or_create(crypto=crypto, timeframe=timeframe, period=period, candle=candle,
+                                         defaults=cls.forecast_fields(timeframe, period, candle, prediction_data))
+
+    @staticmethod
+    def forecast_fields(timeframe, period, candle, prediction_data):
+        """Values for a new run's forecast columns, from a prediction payload"""
+        return {
+            'current_price': prediction_data['current_price'],
+            'predicted_price': prediction_data['predicted_price'],
+            'confidence_level': prediction_data['confidence_level'],
+            'market_sentiment': prediction_data['market_sentiment'],
+            'currency': prediction_data['currency'],
+            # Same candle as created_at + period did per request
+            'prediction_target_time': candle + period * INTERVALS[timeframe],
+        }
+
+    def resolve(self, actual_price):
+        """
+        Store the actual price (in the run's currency) and add the run to the
+        aggregates of every user who requested it. Returns False if another
+        worker resolved the run first.
+        """
+        actual_price = Decimal(str(round(actual_price, 2)))
+        with transaction.atomic():
+            resolved = ForecastRun.objects.filter(pk=self.pk, actual_price__isnull=True).update(
+                actual_price=actual_price, resolved_at=timezone.now())
+            if not resolved:
+                return False
+            self.refresh_from_db()
+            AccuracyAggregate.record(self)
+        return True
+
     def price_change_percentage(self):
         """Calculate percentage change between current and predicted price"""
         if self.current_price > 0:
@@ -45,11 +114,227 @@ class PredictionHistory(models.Model):
         Returns None if actual price is not available.
         Accuracy = 100 - |(Actual - Predicted) / Actual| * 100
         """
-        if self.actual_price is None or self.actual_price == 0:
+        error = self.absolute_percentage_error
+        if error is None:
             return None
         
-        error_margin = abs((self.actual_price - self.predicted_price) / self.actual_price)
-        accuracy = 100 * (1 - error_margin)
+        accuracy = 100 - error
         
         # Clamp accuracy between 0 and 100
         return round(max(0, min(100, accuracy)), 2)
+
+    @property
+    def absolute_percentage_error(self):
+        """|(Actual - Predicted) / Actual| * 100, or None until the actual price is known"""
+        if self.actual_price is None or self.actual_price == 0:
+            return None
+        return float(abs((self.actual_price - self.predicted_price) / self.actual_price) * 100)
+
+    @property
+    def direction_hit(self):
+        """Whether the predicted move (up, down or flat) matched the actual one"""
+        if self.actual_price is None:
+            return None
+        predicted_move = (self.predicted_price > self.current_price) - (self.predicted_price < self.current_price)
+        actual_move = (self.actual_price > self.current_price) - (self.actual_price < self.current_price)
+        return predicted_move == actual_move
+
+
+def _from_run(name):
+    return property(lambda self: getattr(self.run, name))
+
+
+class PredictionHistory(models.Model):
+    """A user's prediction request; the forecast itself is the shared ForecastRun"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='predictions')
+    run = models.ForeignKey(ForecastRun, on_delete=models.CASCADE, related_name='requests')
+    created_at = models.DateTimeField(default=timezone.now, editable=False)  # Set explicitly by buffered writes
+
+    # Read through to the run, so templates and callers see the same attributes as before
+    crypto = _from_run('crypto')
+    timeframe = _from_run('timeframe')
+    period = _from_run('period')
+    current_price = _from_run('current_price')
+    predicted_price = _from_run('predicted_price')
+    confidence_level = _from_run('confidence_level')
+    market_sentiment = _from_run('market_sentiment')
+    currency = _from_run('currency')
+    prediction_target_time = _from_run('prediction_target_time')
+    actual_price = _from_run('actual_price')
+    resolved_at = _from_run('resolved_at')
+    prediction_accuracy = _from_run('prediction_accuracy')
+    absolute_percentage_error = _from_run('absolute_percentage_error')
+    direction_hit = _from_run('direction_hit')
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name_plural = 'Prediction Histories'
+        indexes = [
+            # Archival walks the oldest rows first (predict.archive)
+            models.Index(fields=['created_at'], name='history_created_at_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.crypto} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+
+    @classmethod
+    def record(cls, user, crypto, timeframe, period, prediction_data, now=None):
+        """Save a user's request, creating the candle's ForecastRun if it is the first; returns (entry, run_created)"""
+        run, created = ForecastRun.for_prediction(crypto, timeframe, period, prediction_data, now)
+        return cls.objects.create(user=user, run=run), created
+    
+    def price_change_percentage(self):
+        return self.run.price_change_percentage()
+
+    def is_prediction_time_reached(self):
+        return self.run.is_prediction_time_reached()
+
+
+class PredictionArchive(models.Model):
+    """
+    A user's archived requests for one month, coin and timeframe: resolved
+    PredictionHistory rows moved out of the live table by predict.archive,
+    stored with their forecast and outcome as one compressed blob.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='prediction_archives')
+    month = models.DateField()  # First day of the month (UTC) the requests were made in
+    crypto = models.CharField(max_length=10)
+    timeframe = models.CharField(max_length=10)
+    count = models.PositiveIntegerField()
+    data = models.BinaryField()  # zlib-compressed JSON, see predict.archive
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-month']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month', 'crypto', 'timeframe'], name='unique_prediction_archive'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.crypto}/{self.timeframe} {self.month:%Y-%m} ({self.count})"
+
+
+class AccuracyAggregate(models.Model):
+    """
+    Running accuracy totals per user and (crypto, timeframe, period), updated
+    whenever a forecast run's actual price is resolved. Rows with crypto or
+    timeframe set to ALL (and period 0) are roll-ups, so a user's overall,
+    per-coin and per-timeframe numbers are single-row lookups.
+    """
+    ALL = '*'
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='accuracy_aggregates')
+    crypto = models.CharField(max_length=10)
+    timeframe = models.CharField(max_length=10)
+    period = models.IntegerField()
+
+    count = models.PositiveIntegerField(default=0)
+    abs_pct_error_sum = models.FloatField(default=0)  # sum of absolute percentage errors
+    accuracy_sum = models.FloatField(default=0)  # sum of ForecastRun.prediction_accuracy, per request
+    direction_hits = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'crypto', 'timeframe', 'period'], name='unique_accuracy_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.crypto}/{self.timeframe}/{self.period} ({self.count})"
+
+    @property
+    def mean_absolute_percentage_error(self):
+        return self.abs_pct_error_sum / self.count if self.count else None
+
+    @property
+    def mean_accuracy(self):
+        return self.accuracy_sum / self.count if self.count else None
+
+    @property
+    def direction_hit_rate(self):
+        """Percentage of predictions that got the direction right"""
+        return 100 * self.direction_hits / self.count if self.count else None
+
+    @classmethod
+    def buckets_for(cls, run):
+        """(crypto, timeframe, period) keys a prediction counts towards"""
+        return [
+            (run.crypto, run.timeframe, run.period),
+            (run.crypto, cls.ALL, 0),
+            (cls.ALL, run.timeframe, 0),
+            (cls.ALL, cls.ALL, 0),
+        ]
+
+    @classmethod
+    def record(cls, run):
+        """
+        Add a resolved run to the aggregates of every user who requested it,
+        once per request. Call it in the same transaction that saves
+        actual_price.
+        """
+        error = run.absolute_percentage_error
+        if error is None:
+            return
+        accuracy = run.prediction_accuracy
+        hit = int(run.direction_hit)
+        requests_per_user = Counter(run.requests.values_list('user_id', flat=True))
+        for user_id, n in requests_per_user.items():
+            for crypto, timeframe, period in cls.buckets_for(run):
+                bucket, _ = cls.objects.get_or_create(user_id=user_id, crypto=crypto,
+                                                      timeframe=timeframe, period=period)
+                # F() expressions so concurrent workers never lose an update
+                cls.objects.filter(pk=bucket.pk).update(
+                    count=models.F('count') + n,
+                    abs_pct_error_sum=models.F('abs_pct_error_sum') + error * n,
+                    accuracy_sum=models.F('accuracy_sum') + accuracy * n,
+                    direction_hits=models.F('direction_hits') + hit * n,
+                    updated_at=timezone.now(),
+                )
+
+    @classmethod
+    def summary_for(cls, user):
+        """Overall, per-crypto, per-timeframe and per-(crypto, timeframe, period) rows for one user"""
+        rows = list(cls.objects.filter(user=user, count__gt=0))
+        summary = {'overall': None, 'by_crypto': [], 'by_timeframe': [], 'by_bucket': []}
+        for row in rows:
+            if row.crypto == cls.ALL and row.timeframe == cls.ALL:
+                summary['overall'] = row
+            elif row.timeframe == cls.ALL:
+                summary['by_crypto'].append(row)
+            elif row.crypto == cls.ALL:
+                summary['by_timeframe'].append(row)
+            else:
+                summary['by_bucket'].append(row)
+        summary['by_crypto'].sort(key=lambda row: row.crypto)
+        summary['by_timeframe'].sort(key=lambda row: row.timeframe)
+        summary['by_bucket'].sort(key=lambda row: (row.crypto, row.timeframe, row.period))
+        return summary
+
+
+class AccuracyBucket(models.Model):
+    """
+    Model accuracy for one week of forecast target times and one (crypto,
+    timeframe, period), counting each ForecastRun once. Sums are kept so any
+    roll-up is a DB-side SUM; maintained by predict.analytics.refresh().
+    """
+    week = models.DateField()  # Monday of the week (TIME_ZONE) the forecasts targeted
+    crypto = models.CharField(max_length=10)
+    timeframe = models.CharField(max_length=10)
+    period = models.IntegerField()
+
+    count = models.PositiveIntegerField(default=0)
+    abs_pct_error_sum = models.FloatField(default=0)
+    accuracy_sum = models.FloatField(default=0)
+    direction_hits = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['week', 'crypto', 'timeframe', 'period'], name='unique_accuracy_week_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['computed_at'], name='accuracy_bucket_computed_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.week} {self.crypto}/{self.timeframe}/{self.period} ({self.count})"
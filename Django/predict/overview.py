@@ -0,0 +1,177 @@
+"""
+Market overview: every supported coin's forecast for one interval in one pass
+
+compute_overview() fetches the latest candles for all symbols, stacks their
+input windows and rolls every model out together with
+prediction.stacked_rollout (one compiled graph call per step instead of one
+predict call per coin and step). The result is stored as a snapshot in the
+'overview' cache, which refresh_market_overview re-computes at every candle
+close. get_overview() serves the snapshot; once the candle it was built from
+has closed (e.g. the beat task is late or did not run) it still serves it and
+enqueues one refresh, so requests never run the rollout themselves. On a cold
+cache, with nothing to serve, the one request that takes the refresh lock
+computes the snapshot and the others get None (the endpoint answers 503).
+
+A refresh that misses coins (Binance or a model failed) does not replace the
+previous snapshot, and the next refresh waits RETRY_SECONDS. With nothing
+cached it is stored for RETRY_SECONDS only.
+"""
+import logging
+from datetime import timedelta
+
+import numpy as np
+from django.core.cache import caches
+from django.utils import timezone
+
+from . import metrics, models
+from .fx import QUOTE_CURRENCY
+from .indicators import engine as indicator_engine
+from .prediction import (WINDOW_SIZES, get_live_data, get_realtime_price, load_model_and_scaler, prepare_input,
+                         stacked_rollout)
+
+logger = logging.getLogger(__name__)
+
+OVERVIEW_SYMBOLS = ['ADA', 'AVAX', 'BNB', 'BTC', 'DOGE', 'ETH', 'SOL', 'XRP']
+TIMEFRAMES = {'1h': 'hourly', '1d': 'daily'}
+HORIZONS = {'1h': 23, '1d': 30}   # the longest horizon the selector offers
+CANDLE_LENGTHS = {'1h': timedelta(hours=1), '1d': timedelta(days=1)}
+REFRESH_LOCK_SECONDS = 600  # a queued refresh that never ran stops blocking the next one after this
+RETRY_SECONDS = 120  # wait after a failed or incomplete refresh
+
+
+def cache_key(interval):
+    return f"market_overview:{interval}"
+
+
+def lock_key(interval):
+    return f"market_overview:{interval}:refreshing"
+
+
+def candle_start(interval, now=None):
+    """Open time (UTC) of the Binance candle that is currently forming"""
+    return models.candle_start(TIMEFRAMES[interval], now)
+
+
+def compute_overview(interval):
+    """Forecast every symbol for `interval` and return the snapshot dict (prices in USDT)"""
+    timeframe = TIMEFRAMES[interval]
+    horizon = HORIZONS[interval]
+    window_size = WINDOW_SIZES[interval]
+
+    with metrics.timer('overview', interval=interval):
+        symbols, frames, scalers, lstms, inputs = [], [], [], [], []
+        for symbol in OVERVIEW_SYMBOLS:
+            df = get_live_data(symbol, interval)
+            model, scaler = load_model_and_scaler(symbol, interval)
+            if df is None or len(df) < window_size or model is None or scaler is None:
+                logger.warning("Overview: skipping %s %s (no data or model)", symbol, interval)
+                continue
+            symbols.append(symbol)
+            frames.append(df)
+            scalers.append(scaler)
+            lstms.append(model)
+            inputs.append(prepare_input(df, scaler, window_size)[0])
+
+        coins = []
+        if symbols:
+            with metrics.timer('inference', interval=interval):
+                predictions_scaled = stacked_rollout(lstms, np.stack(inputs), horizon)
+            for i, symbol in enumerate(symbols):
+                predictions = scalers[i].inverse_transform(predictions_scaled[:, i, :])
+                coins.append(_coin_summary(symbol, interval, frames[i], predictions))
+
+    return {
+        'interval': interval,
+        'timeframe': timeframe,
+        'horizon': horizon,
+        'currency': QUOTE_CURRENCY,
+        'candle_start': candle_start(interval).isoformat(),
+        'generated_at': timezone.now().isoformat(),
+        'coins': coins,
+    }
+
+
+def _coin_summary(symbol, interval, df, predictions):
+    # Imported here: views imports this module lazily for the endpoint
+    from .views import calculate_confidence_level, calculate_market_sentiment
+
+    close_index = list(df.columns).index('Close')
+    forecast = [float(p) for p in predictions[:, close_index]]
+    historical_prices = df['Close'].tolist()
+
+    realtime_price = get_realtime_price(symbol)
+    current_price = float(realtime_price if realtime_price is not None else historical_prices[-1])
+
+    indicators = indicator_engine.update(symbol, interval, df)
+    confidence_level = calculate_confidence_level(historical_prices, forecast, indicators['volatility'],
+                                                  TIMEFRAMES[interval], len(forecast), indicators)
+    return {
+        'crypto': symbol,
+        'current_price': current_price,
+        'next_price': forecast[0],
+        'predicted_price': forecast[-1],
+        'change_pct': round((forecast[-1] - current_price) / current_price * 100, 3),
+        'forecast': forecast,
+        'volatility': indicators['volatility'],
+        'confidence_level': confidence_level,
+        'market_sentiment': calculate_market_sentiment(historical_prices, forecast[-1], current_price, indicators),
+    }
+
+
+def refresh_overview(interval):
+    """Compute the snapshot and store it if it is complete; returns the snapshot to serve"""
+    cache = caches['overview']
+    try:
+        snapshot = compute_overview(interval)
+    except Exception:
+        cache.set(lock_key(interval), True, timeout=RETRY_SECONDS)
+        raise
+
+    if len(snapshot['coins']) == len(OVERVIEW_SYMBOLS):
+        # Kept for two candles so a late refresh still has something to serve
+        cache.set(cache_key(interval), snapshot, timeout=CANDLE_LENGTHS[interval].total_seconds() * 2)
+        cache.delete(lock_key(interval))
+        logger.info("Market overview %s refreshed: %s coins", interval, len(snapshot['coins']))
+        return snapshot
+
+    cache.set(lock_key(interval), True, timeout=RETRY_SECONDS)
+    previous = cache.get(cache_key(interval))
+    logger.warning("Market overview %s incomplete (%s of %s coins); %s, retrying in %ss", interval,
+                   len(snapshot['coins']), len(OVERVIEW_SYMBOLS),
+                   "keeping the previous snapshot" if previous else "serving it briefly", RETRY_SECONDS)
+    if previous is not None:
+        return previous
+    cache.set(cache_key(interval), snapshot, timeout=RETRY_SECONDS)
+    return snapshot
+
+
+def get_overview(interval):
+    """
+    Cached snapshot for `interval`; a stale one is served while a single queued
+    refresh replaces it. None while another request computes the first one.
+    """
+    snapshot = caches['overview'].get(cache_key(interval))
+    if snapshot is None:
+        metrics.inc('overview_cache_total', interval=interval, result='miss')
+        if not caches['overview'].add(lock_key(interval), True, timeout=REFRESH_LOCK_SECONDS):
+            return None
+        return refresh_overview(interval)
+    if snapshot['candle_start'] < candle_start(interval).isoformat():
+        metrics.inc('overview_cache_total', interval=interval, result='stale')
+        schedule_refresh(interval)
+        return snapshot
+    metrics.inc('overview_cache_total', interval=interval, result='hit')
+    return snapshot
+
+
+def schedule_refresh(interval):
+    """Enqueue refresh_market_overview unless a refresh is already queued or running"""
+    from .tasks import refresh_market_overview
+
+    if not caches['overview'].add(lock_key(interval), True, timeout=REFRESH_LOCK_SECONDS):
+        return
+    try:
+        refresh_market_overview.delay(interval)
+    except Exception as e:
+        caches['overview'].delete(lock_key(interval))
+        logger.error("Could not enqueue market overview %s refresh: %s", interval, e)
@@ -1,118 +1,131 @@
 import os
+import logging
+import copy
+import weakref
 from dotenv import load_dotenv
 import requests
 import pandas as pd
 import numpy as np
 import tensorflow as tf
-import joblib
 from datetime import datetime, timedelta
 
-# Global cache for models and scalers to avoid reloading
-_MODEL_CACHE = {}
-_SCALER_CACHE = {}
+from . import metrics
 
-def get_live_data(symbol="BTC", interval="1h", usd_to_inr=88.75):
-    symbol_map = {
-        "ADA": "ADAUSDT", "AVAX": "AVAXUSDT", "BNB": "BNBUSDT", "BTC": "BTCUSDT", 
-        "DOGE": "DOGEUSDT", "ETH": "ETHUSDT", "SOL": "SOLUSDT", "XRP": "XRPUSDT"
-    }
-    pair = symbol_map.get(symbol.upper(), "BTCUSDT")
-    limit = 30 if interval == "1d" else 24 
+logger = logging.getLogger(__name__)
 
-    url = "https://api.binance.com/api/v3/klines"
-    params = {"symbol": pair, "interval": interval, "limit": limit}
+# Overridable so benchmarks and load tests can point at a local stand-in
+BINANCE_API_URL = os.environ.get('BINANCE_API_URL', 'https://api.binance.com')
 
-    try:
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+# The models and scalers were trained on INR-quoted prices. Live prices are
+# USDT, so loaded scalers are re-expressed in USDT with this fixed rate: the
+# forecasts then depend only on market data, never on the live FX rate.
+MODEL_USD_TO_INR = float(os.environ.get('MODEL_USD_TO_INR', '88.75'))
+
+# How a rollout step runs the model:
+# - "predict":          model.predict (builds a data pipeline and callbacks on every call)
+# - "predict_on_batch": single batch through the compiled predict function
+# - "call":             model(x, training=False) eagerly; the recurrent loop runs op by op
+# - "function":         model call wrapped in tf.function, traced once per model
+INFERENCE_BACKENDS = ('predict', 'predict_on_batch', 'call', 'function')
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'predict')
+_COMPILED_STEPS = weakref.WeakKeyDictionary()
+
+# Monte-Carlo dropout: samples are rolled out together as one batch per step
+MC_SAMPLES_MAX = int(os.environ.get('MC_SAMPLES_MAX', '256'))
+PREDICTION_BANDS = (5, 25, 50, 75, 95)
+_MC_STEPS = weakref.WeakKeyDictionary()
+_STACKED_STEPS = {}
+
+# Model input layout: candles per window for each interval, and the columns of each candle
+WINDOW_SIZES = {'1h': 24, '1d': 30}
+FEATURES = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+BINANCE_PAIRS = {
+    "ADA": "ADAUSDT", "AVAX": "AVAXUSDT", "BNB": "BNBUSDT", "BTC": "BTCUSDT",
+    "DOGE": "DOGEUSDT", "ETH": "ETHUSDT", "SOL": "SOLUSDT", "XRP": "XRPUSDT"
+}
+KLINE_COLUMNS = ["open_time", "open", "high", "low", "close", "volume",
+                 "close_time", "quote_volume", "num_trades", "taker_base", "taker_quote", "ignore"]
 
-        df = pd.DataFrame(data, columns=[
-            "open_time","open","high","low","close","volume",
-            "close_time","quote_volume","num_trades","taker_base","taker_quote","ignore"
-        ])
 
-        for col in ["open","high","low","close"]:
-            df[col] = df[col].astype(float) * usd_to_inr
-        df["volume"] = df["volume"].astype(float)
+def kline_params(symbol, interval):
+    """Query parameters for the klines endpoint: one model input window of candles"""
+    return {"symbol": BINANCE_PAIRS.get(symbol.upper(), "BTCUSDT"), "interval": interval,
+            "limit": WINDOW_SIZES.get(interval, 24)}
 
-        df.index = pd.to_datetime(df["close_time"], unit='ms')
 
-        df_result = df[["open","high","low","close","volume"]]
-        df_result.columns = ["Open", "High", "Low", "Close", "Volume"]
-        return df_result
+def klines_frame(data):
+    """OHLCV frame (USDT) indexed by candle close time, from a klines response"""
+    df = pd.DataFrame(data, columns=KLINE_COLUMNS)
+
+    for col in ["open","high","low","close","volume"]:
+        df[col] = df[col].astype(float)
+
+    df.index = pd.to_datetime(df["close_time"], unit='ms')
+
+    df_result = df[["open","high","low","close","volume"]]
+    df_result.columns = ["Open", "High", "Low", "Close", "Volume"]
+    return df_result
+
+
+def get_live_data(symbol="BTC", interval="1h"):
+    """Latest klines for the symbol, OHLC in USDT"""
+    url = f"{BINANCE_API_URL}/api/v3/klines"
+
+    try:
+        with metrics.binance_timer('klines'):
+            response = requests.get(url, params=kline_params(symbol, interval), timeout=10)
+        response.raise_for_status()
+        data = response.json()
+        metrics.inc('binance_requests_total', endpoint='klines', status='ok')
+        return klines_frame(data)
     except Exception as e:
-        print(f"[ERROR] Fetching live data: {e}")
+        metrics.inc('binance_requests_total', endpoint='klines', status='error')
+        logger.error("Fetching live data for %s %s: %s", symbol, interval, e)
         return None
 
-def get_realtime_price(symbol="BTC", usd_to_inr=88.75):
-    """Fetches the real-time price for a symbol from Binance ticker."""
-    symbol_map = {
-        "ADA": "ADAUSDT", "AVAX": "AVAXUSDT", "BNB": "BNBUSDT", "BTC": "BTCUSDT", 
-        "DOGE": "DOGEUSDT", "ETH": "ETHUSDT", "SOL": "SOLUSDT", "XRP": "XRPUSDT"
-    }
-    pair = symbol_map.get(symbol.upper())
+def get_realtime_price(symbol="BTC"):
+    """Fetches the real-time USDT price for a symbol from Binance ticker."""
+    pair = BINANCE_PAIRS.get(symbol.upper())
     if not pair:
-        print(f"[ERROR] Invalid symbol for real-time price: {symbol}")
+        logger.error("Invalid symbol for real-time price: %s", symbol)
         return None
 
-    url = "https://api.binance.com/api/v3/ticker/price"
+    url = f"{BINANCE_API_URL}/api/v3/ticker/price"
     params = {"symbol": pair}
 
     try:
-        response = requests.get(url, params=params, timeout=5)
+        with metrics.binance_timer('ticker'):
+            response = requests.get(url, params=params, timeout=5)
         response.raise_for_status()
         data = response.json()
-        price_usd = float(data['price'])
-        print(f"[INFO] Real-time price for {symbol}: ${price_usd:.2f}")
-        return price_usd * usd_to_inr
+        price_usdt = float(data['price'])
+        metrics.inc('binance_requests_total', endpoint='ticker', status='ok')
+        logger.debug("Real-time price for %s: $%.2f", symbol, price_usdt)
+        return price_usdt
     except Exception as e:
-        print(f"[ERROR] Fetching real-time price for {symbol}: {e}")
+        metrics.inc('binance_requests_total', endpoint='ticker', status='error')
+        logger.error("Fetching real-time price for %s: %s", symbol, e)
         return None
 
 
 def load_model_and_scaler(symbol="BTC", interval="1h"):
-    # Create cache key
-    cache_key = f"{symbol}_{interval}"
-    
-    # Check if already cached
-    if cache_key in _MODEL_CACHE and cache_key in _SCALER_CACHE:
-        print(f"[INFO] Using cached model and scaler for {symbol} {interval}")
-        return _MODEL_CACHE[cache_key], _SCALER_CACHE[cache_key]
-    
-    base_folder = 'models_hourly' if interval == "1h" else 'models_daily'
-    model_file = f"{symbol}_{'hourly' if interval=='1h' else 'daily'}_lstm.keras"
-    scaler_file = f"{symbol}_scaler.pkl"
-
-    model_path = os.path.join(os.path.dirname(__file__), base_folder, model_file)
-    scaler_path = os.path.join(os.path.dirname(__file__), base_folder, scaler_file)
-
-    if not os.path.exists(model_path):
-        print(f"[ERROR] Model file not found: {model_path}")
-        return None, None
-    if not os.path.exists(scaler_path):
-        print(f"[ERROR] Scaler file not found: {scaler_path}")
-        return None, None
+    """Current model and USDT scaler for the symbol and interval from the model registry; (None, None) if unavailable"""
+    from .registry import registry
+    return registry.get(symbol, interval)
 
-    try:
-        model = tf.keras.models.load_model(model_path)
-        scaler = joblib.load(scaler_path)
-        
-        # Cache the loaded model and scaler
-        _MODEL_CACHE[cache_key] = model
-        _SCALER_CACHE[cache_key] = scaler
-        
-        print(f"[INFO] Successfully loaded and cached model and scaler for {symbol} {interval}")
-        return model, scaler
-    except Exception as e:
-        print(f"[ERROR] Loading model/scaler for {symbol} {interval}: {e}")
-        return None, None
 
+def get_live_prediction(symbol="BTC", interval="1h", steps_ahead=3, mc_samples=0, df=None):
+    """
+    Point forecast (USDT) for the next `steps_ahead` candles. With `mc_samples`, the
+    frame also holds Close_p5 .. Close_p95 percentile bands from that many
+    Monte-Carlo dropout samples. `df` is the klines frame if the caller already
+    fetched it; otherwise it is fetched here.
+    """
+    window_size = WINDOW_SIZES[interval]
 
-def get_live_prediction(symbol="BTC", interval="1h", steps_ahead=3, usd_to_inr=88.75):
-    window_size = 30 if interval=="1d" else 24
-
-    df = get_live_data(symbol, interval, usd_to_inr)
+    if df is None:
+        df = get_live_data(symbol, interval)
     if df is None or df.empty:
         return None
 
@@ -120,18 +133,158 @@ def get_live_prediction(symbol="BTC", interval="1h", steps_ahead=3, usd_to_inr=8
     if model is None or scaler is None:
         return None
 
+    with metrics.timer('transform'):
+        X_input = prepare_input(df, scaler, window_size)
+    with metrics.timer('inference'):
+        predictions_scaled = rollout(model, X_input, steps_ahead)
+    pred_df = build_prediction_frame(df, scaler, predictions_scaled, interval)
+
+    if mc_samples:
+        with metrics.timer('mc_dropout'):
+            samples_scaled = mc_rollout(model, X_input, steps_ahead, mc_samples)
+        for column, values in prediction_bands(scaler, samples_scaled, df.columns).items():
+            pred_df[column] = values
+    return pred_df
+
+
+def quote_scaler(scaler, inr_per_usdt):
+    """Copy of an INR-fitted MinMaxScaler that takes and returns USDT prices (Volume is left as is)"""
+    scaler = copy.deepcopy(scaler)
+    names = list(getattr(scaler, 'feature_names_in_', FEATURES))
+    prices = [i for i, name in enumerate(names) if name != 'Volume']
+    # x_inr * scale_ == x_usdt * (scale_ * rate); min_ stays the same
+    scaler.scale_[prices] *= inr_per_usdt
+    for attr in ('data_min_', 'data_max_', 'data_range_'):
+        getattr(scaler, attr)[prices] /= inr_per_usdt
+    return scaler
+
+
+def prepare_input(df, scaler, window_size):
+    """Scale the latest `window_size` candles into a (1, window, features) model input"""
     scaled_data = scaler.transform(df)
-    X_input = np.expand_dims(scaled_data[-window_size:], axis=0)
+    return np.expand_dims(scaled_data[-window_size:], axis=0)
+
+
+def predict_step(model, X_input, backend=None):
+    """One forward pass with the configured inference backend; returns a numpy array"""
+    backend = backend or INFERENCE_BACKEND
+    if backend == 'predict':
+        return model.predict(X_input, verbose=0)
+    if backend == 'predict_on_batch':
+        return model.predict_on_batch(X_input)
+    if backend == 'call':
+        return model(X_input, training=False).numpy()
+    if backend == 'function':
+        return _compiled_step(model)(np.asarray(X_input, dtype=np.float32)).numpy()
+    raise ValueError(f"Unknown inference backend: {backend}")
 
+
+def _compiled_step(model):
+    step = _COMPILED_STEPS.get(model)
+    if step is None:
+        def forward(inputs):
+            return model(inputs, training=False)
+        step = _COMPILED_STEPS[model] = tf.function(forward, reduce_retracing=True)
+    return step
+
+
+def rollout(model, X_input, steps_ahead, backend=None):
+    """Autoregressive rollout: each scaled prediction is fed back in as the newest candle"""
     predictions_scaled = []
     current_input = X_input.copy()
 
     for _ in range(steps_ahead):
-        pred = model.predict(current_input, verbose=0)
+        pred = predict_step(model, current_input, backend)
         predictions_scaled.append(pred[0])
         current_input = np.append(current_input[:,1:,:], np.expand_dims(pred, axis=1), axis=1)
 
-    predictions = scaler.inverse_transform(np.array(predictions_scaled))
+    return np.array(predictions_scaled)
+
+
+def mc_rollout(model, X_input, steps_ahead, samples):
+    """
+    Rollout with dropout active: the window is tiled into `samples` rows and
+    each step is one batched forward pass, so every row follows its own
+    stochastic trajectory. Returns an array of shape (steps, samples, features).
+    """
+    samples = max(1, min(int(samples), MC_SAMPLES_MAX))
+    step = _mc_step(model)
+    current_input = np.repeat(np.asarray(X_input, dtype=np.float32), samples, axis=0)
+    predictions_scaled = []
+
+    for _ in range(steps_ahead):
+        pred = step(current_input).numpy()
+        predictions_scaled.append(pred)
+        current_input = np.append(current_input[:,1:,:], np.expand_dims(pred, axis=1), axis=1)
+
+    return np.array(predictions_scaled)
+
+
+def _mc_step(model):
+    """
+    Forward pass with only the Dropout layers in training mode; BatchNormalization
+    keeps its moving statistics. Layers are applied in order (Sequential models).
+    """
+    step = _MC_STEPS.get(model)
+    if step is None:
+        layers = model.layers
+        def forward(inputs):
+            x = inputs
+            for layer in layers:
+                x = layer(x, training=isinstance(layer, tf.keras.layers.Dropout))
+            return x
+        step = _MC_STEPS[model] = tf.function(forward, reduce_retracing=True)
+    return step
+
+
+def prediction_bands(scaler, samples_scaled, columns, column='Close'):
+    """Percentiles of `column` per horizon across samples, e.g. {'Close_p5': [...], ...}"""
+    steps, samples, features = samples_scaled.shape
+    values = scaler.inverse_transform(samples_scaled.reshape(-1, features)).reshape(steps, samples, features)
+    percentiles = np.percentile(values[:, :, list(columns).index(column)], PREDICTION_BANDS, axis=1)
+    return {f"{column}_p{band}": percentiles[i] for i, band in enumerate(PREDICTION_BANDS)}
+
+
+def stacked_rollout(models, X_inputs, steps_ahead):
+    """
+    Roll out several models together: X_inputs is (models, window, features)
+    and each step runs every model on its own window inside one compiled
+    graph. Returns an array of shape (steps, models, features).
+    """
+    step = _stacked_step(models)
+    current_input = np.asarray(X_inputs, dtype=np.float32)
+    predictions_scaled = []
+
+    for _ in range(steps_ahead):
+        pred = step(current_input).numpy()
+        predictions_scaled.append(pred)
+        current_input = np.append(current_input[:,1:,:], np.expand_dims(pred, axis=1), axis=1)
+
+    return np.array(predictions_scaled)
+
+
+def _stacked_step(models):
+    key = tuple(id(model) for model in models)
+    cached = _STACKED_STEPS.get(key)
+    if cached is None:
+        def forward(inputs):
+            return tf.concat([model(inputs[i:i+1], training=False) for i, model in enumerate(models)], axis=0)
+        # Keep the models referenced so their ids cannot be reused by other objects
+        cached = _STACKED_STEPS[key] = (tuple(models), tf.function(forward))
+    return cached[1]
+
+
+def release_model(model):
+    """Drop the compiled multi-model steps holding `model` (the registry calls this when it replaces one)"""
+    for key, (models, _) in list(_STACKED_STEPS.items()):
+        if any(m is model for m in models):
+            _STACKED_STEPS.pop(key, None)
+
+
+def build_prediction_frame(df, scaler, predictions_scaled, interval):
+    """Inverse-scale the rollout and index it by the future candle close times"""
+    predictions = scaler.inverse_transform(predictions_scaled)
+    steps_ahead = len(predictions)
 
     last_time = df.index[-1]
     delta = timedelta(days=1) if interval=="1d" else timedelta(hours=1)
@@ -147,16 +300,15 @@ if __name__ == "__main__":
     root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
     dotenv_path = os.path.join(root_path, '.env')
     load_dotenv(dotenv_path=dotenv_path)
-    USD_TO_INR = float(os.getenv("USD_TO_INR"))
 
     SYMBOL = input("Enter coin symbol (ADA, AVAX, BNB, BTC, DOGE, ETH, SOL, XRP): ").upper()
     mode = input("Enter mode (daily/hourly): ").lower()
     INTERVAL = "1d" if mode=="daily" else "1h"
     STEPS_AHEAD = int(input("Enter number of future steps to predict: "))
 
-    pred_df = get_live_prediction(SYMBOL, INTERVAL, STEPS_AHEAD, USD_TO_INR)
+    pred_df = get_live_prediction(SYMBOL, INTERVAL, STEPS_AHEAD)
     if pred_df is not None:
-        print(f"\n--- {SYMBOL} Predictions ({INTERVAL}) ---")
+        print(f"\n--- {SYMBOL} Predictions ({INTERVAL}, USDT) ---")
         print(pred_df)
     else:
         print("Prediction failed")
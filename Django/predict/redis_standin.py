@@ -0,0 +1,676 @@
+"""
+In-process Redis stand-in for load tests
+
+Speaks RESP2 and implements the subset of commands used by kombu's Redis
+transport, Celery's Redis result backend and the history buffer: strings
+with expiry, lists with BRPOP and LTRIM, sets, hashes, sorted sets,
+MULTI/EXEC, pub/sub, and the Lua scripts redis-py's Lock registers (emulated
+by their SHA1, not interpreted).
+
+Every command is counted, and INFO commandstats reports the counts in Redis'
+own format, so a load test can measure broker ops the same way against this
+stand-in or a real Redis server. Like Redis, commands run one at a time under
+a single lock.
+"""
+import fnmatch
+import hashlib
+import socketserver
+import threading
+import time
+from collections import Counter, deque
+
+from redis.lock import Lock
+
+
+class CommandError(Exception):
+    pass
+
+
+def _sha(script):
+    return hashlib.sha1(script.encode('utf-8') if isinstance(script, str) else script).hexdigest()
+
+
+class RedisStandIn:
+    """Serves a single in-memory database on a local port"""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.commands = Counter()
+        self._cond = threading.Condition()
+        self._data = {}
+        self._expires = {}
+        self._channels = {}
+        self._patterns = {}
+        self._closed = False
+        self._scripts = {
+            _sha(Lock.LUA_RELEASE_SCRIPT): self._lock_release,
+            _sha(Lock.LUA_EXTEND_SCRIPT): self._lock_extend,
+            _sha(Lock.LUA_REACQUIRE_SCRIPT): self._lock_reacquire,
+        }
+        self.server = socketserver.ThreadingTCPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --- keyspace -------------------------------------------------------
+
+    def _alive(self, key):
+        deadline = self._expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self._data.pop(key, None)
+            del self._expires[key]
+        return key in self._data
+
+    def _get(self, key, kind, create=False):
+        if self._alive(key):
+            value = self._data[key]
+            if not isinstance(value, kind):
+                raise CommandError("WRONGTYPE Operation against a key holding the wrong kind of value")
+            return value
+        if create:
+            value = self._data[key] = kind()
+            return value
+        return None
+
+    def _set(self, key, value):
+        self._data[key] = value
+        self._expires.pop(key, None)
+
+    def _delete(self, key):
+        self._expires.pop(key, None)
+        return self._data.pop(key, None) is not None
+
+    def _drop_if_empty(self, key):
+        if key in self._data and not self._data[key]:
+            self._delete(key)
+
+    # --- command dispatch -------------------------------------------------
+
+    def execute(self, conn, args):
+        name = args[0].decode().upper()
+        with self._cond:
+            self.commands[name] += 1
+        handler = getattr(self, f"cmd_{name.lower()}", None)
+        if handler is None:
+            raise CommandError(f"ERR unknown command '{name}'")
+        if conn.queued is not None and name not in ('EXEC', 'DISCARD', 'MULTI', 'WATCH'):
+            conn.queued.append((handler, args[1:]))
+            return Status('QUEUED')
+        if name in ('BRPOP', 'BLPOP', 'SUBSCRIBE', 'PSUBSCRIBE', 'UNSUBSCRIBE', 'PUNSUBSCRIBE', 'PUBLISH'):
+            return handler(conn, *args[1:])
+        with self._cond:
+            return handler(conn, *args[1:])
+
+    # connection
+    def cmd_ping(self, conn, message=None):
+        return message if message is not None else Status('PONG')
+
+    def cmd_echo(self, conn, message):
+        return message
+
+    def cmd_select(self, conn, index):
+        return Status('OK')
+
+    def cmd_auth(self, conn, *args):
+        return Status('OK')
+
+    def cmd_client(self, conn, *args):
+        return Status('OK')
+
+    def cmd_info(self, conn, section=None):
+        lines = ["# Server", "redis_version:7.0.0", "redis_mode:standalone", "", "# Commandstats"]
+        lines += [f"cmdstat_{name.lower()}:calls={calls},usec=0,usec_per_call=0.00"
+                  for name, calls in sorted(self.commands.items())]
+        return "\r\n".join(lines).encode() + b"\r\n"
+
+    def cmd_config(self, conn, *args):
+        if args and args[0].upper() == b'RESETSTAT':
+            self.commands.clear()
+            return Status('OK')
+        return []
+
+    def cmd_flushdb(self, conn, *args):
+        self._data.clear()
+        self._expires.clear()
+        return Status('OK')
+
+    cmd_flushall = cmd_flushdb
+
+    def cmd_dbsize(self, conn):
+        return sum(1 for key in list(self._data) if self._alive(key))
+
+    def cmd_keys(self, conn, pattern):
+        pattern = pattern.decode()
+        return [key for key in list(self._data) if self._alive(key) and fnmatch.fnmatchcase(key.decode(), pattern)]
+
+    # generic keys
+    def cmd_del(self, conn, *keys):
+        return sum(self._delete(key) for key in keys if self._alive(key))
+
+    cmd_unlink = cmd_del
+
+    def cmd_exists(self, conn, *keys):
+        return sum(1 for key in keys if self._alive(key))
+
+    def cmd_type(self, conn, key):
+        if not self._alive(key):
+            return Status('none')
+        kinds = {bytes: 'string', deque: 'list', set: 'set', dict: 'hash', ZSet: 'zset'}
+        return Status(kinds[type(self._data[key])])
+
+    def cmd_expire(self, conn, key, seconds):
+        return self.cmd_pexpire(conn, key, int(seconds) * 1000)
+
+    def cmd_pexpire(self, conn, key, millis):
+        if not self._alive(key):
+            return 0
+        self._expires[key] = time.monotonic() + int(millis) / 1000
+        return 1
+
+    def cmd_ttl(self, conn, key):
+        ttl = self.cmd_pttl(conn, key)
+        return ttl if ttl < 0 else ttl // 1000
+
+    def cmd_pttl(self, conn, key):
+        if not self._alive(key):
+            return -2
+        deadline = self._expires.get(key)
+        return -1 if deadline is None else int((deadline - time.monotonic()) * 1000)
+
+    # strings
+    def cmd_get(self, conn, key):
+        return self._get(key, bytes)
+
+    def cmd_mget(self, conn, *keys):
+        return [self._data[key] if self._alive(key) and isinstance(self._data[key], bytes) else None
+                for key in keys]
+
+    def cmd_set(self, conn, key, value, *options):
+        options = [opt.upper() if opt.isalpha() else opt for opt in options]
+        exists = self._alive(key)
+        if (b'NX' in options and exists) or (b'XX' in options and not exists):
+            return None
+        ttl = None
+        for flag, scale in ((b'EX', 1000), (b'PX', 1)):
+            if flag in options:
+                ttl = int(options[options.index(flag) + 1]) * scale
+        self._set(key, value)
+        if ttl is not None:
+            self._expires[key] = time.monotonic() + ttl / 1000
+        return Status('OK')
+
+    def cmd_setex(self, conn, key, seconds, value):
+        return self.cmd_set(conn, key, value, b'EX', seconds)
+
+    def cmd_psetex(self, conn, key, millis, value):
+        return self.cmd_set(conn, key, value, b'PX', millis)
+
+    def cmd_setnx(self, conn, key, value):
+        return 0 if self.cmd_set(conn, key, value, b'NX') is None else 1
+
+    def cmd_incrby(self, conn, key, amount):
+        value = int(self._get(key, bytes) or 0) + int(amount)
+        deadline = self._expires.get(key)
+        self._set(key, str(value).encode())
+        if deadline is not None:
+            self._expires[key] = deadline
+        return value
+
+    def cmd_incr(self, conn, key):
+        return self.cmd_incrby(conn, key, 1)
+
+    def cmd_decr(self, conn, key):
+        return self.cmd_incrby(conn, key, -1)
+
+    # lists
+    def cmd_lpush(self, conn, key, *values):
+        items = self._get(key, deque, create=True)
+        items.extendleft(values)
+        self._cond.notify_all()
+        return len(items)
+
+    def cmd_rpush(self, conn, key, *values):
+        items = self._get(key, deque, create=True)
+        items.extend(values)
+        self._cond.notify_all()
+        return len(items)
+
+    def cmd_lpop(self, conn, key):
+        return self._pop(key, deque.popleft)
+
+    def cmd_rpop(self, conn, key):
+        return self._pop(key, deque.pop)
+
+    def _pop(self, key, pop):
+        items = self._get(key, deque)
+        if not items:
+            return None
+        value = pop(items)
+        self._drop_if_empty(key)
+        return value
+
+    def cmd_llen(self, conn, key):
+        return len(self._get(key, deque) or ())
+
+    def cmd_lrange(self, conn, key, start, stop):
+        items = list(self._get(key, deque) or ())
+        return items[_slice(len(items), int(start), int(stop))]
+
+    def cmd_ltrim(self, conn, key, start, stop):
+        items = self._get(key, deque)
+        if items:
+            self._data[key] = deque(list(items)[_slice(len(items), int(start), int(stop))])
+            self._drop_if_empty(key)
+        return Status('OK')
+
+    def cmd_lrem(self, conn, key, count, value):
+        items = self._get(key, deque)
+        if not items:
+            return 0
+        count = int(count)
+        kept, removed = deque(), 0
+        for item in (items if count >= 0 else reversed(items)):
+            if item == value and (count == 0 or removed < abs(count)):
+                removed += 1
+                continue
+            kept.append(item)
+        if count < 0:
+            kept.reverse()
+        self._data[key] = kept
+        self._drop_if_empty(key)
+        return removed
+
+    def cmd_brpop(self, conn, *args):
+        return self._blocking_pop(args, deque.pop)
+
+    def cmd_blpop(self, conn, *args):
+        return self._blocking_pop(args, deque.popleft)
+
+    def _blocking_pop(self, args, pop):
+        *keys, timeout = args
+        timeout = float(timeout)
+        deadline = time.monotonic() + timeout if timeout else None
+        with self._cond:
+            while not self._closed:
+                for key in keys:
+                    items = self._get(key, deque)
+                    if items:
+                        value = pop(items)
+                        self._drop_if_empty(key)
+                        return [key, value]
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return Array(None)
+                self._cond.wait(remaining)
+        return Array(None)
+
+    # sets
+    def cmd_sadd(self, conn, key, *members):
+        members_set = self._get(key, set, create=True)
+        before = len(members_set)
+        members_set.update(members)
+        return len(members_set) - before
+
+    def cmd_srem(self, conn, key, *members):
+        members_set = self._get(key, set)
+        if not members_set:
+            return 0
+        before = len(members_set)
+        members_set.difference_update(members)
+        removed = before - len(members_set)
+        self._drop_if_empty(key)
+        return removed
+
+    def cmd_smembers(self, conn, key):
+        return list(self._get(key, set) or ())
+
+    def cmd_scard(self, conn, key):
+        return len(self._get(key, set) or ())
+
+    def cmd_sismember(self, conn, key, member):
+        return int(member in (self._get(key, set) or ()))
+
+    # hashes
+    def cmd_hset(self, conn, key, *pairs):
+        fields = self._get(key, dict, create=True)
+        added = 0
+        for field, value in zip(pairs[::2], pairs[1::2]):
+            added += field not in fields
+            fields[field] = value
+        return added
+
+    def cmd_hget(self, conn, key, field):
+        return (self._get(key, dict) or {}).get(field)
+
+    def cmd_hmget(self, conn, key, *fields):
+        values = self._get(key, dict) or {}
+        return [values.get(field) for field in fields]
+
+    def cmd_hdel(self, conn, key, *fields):
+        values = self._get(key, dict)
+        if not values:
+            return 0
+        removed = sum(values.pop(field, None) is not None for field in fields)
+        self._drop_if_empty(key)
+        return removed
+
+    def cmd_hgetall(self, conn, key):
+        return [item for pair in (self._get(key, dict) or {}).items() for item in pair]
+
+    def cmd_hexists(self, conn, key, field):
+        return int(field in (self._get(key, dict) or {}))
+
+    def cmd_hlen(self, conn, key):
+        return len(self._get(key, dict) or {})
+
+    # sorted sets
+    def cmd_zadd(self, conn, key, *args):
+        args = list(args)
+        while args and args[0].upper() in (b'NX', b'XX', b'CH', b'GT', b'LT'):
+            args.pop(0)
+        scores = self._get(key, ZSet, create=True)
+        added = 0
+        for score, member in zip(args[::2], args[1::2]):
+            added += member not in scores
+            scores[member] = float(score)
+        return added
+
+    def cmd_zrem(self, conn, key, *members):
+        scores = self._get(key, ZSet)
+        if not scores:
+            return 0
+        removed = sum(scores.pop(member, None) is not None for member in members)
+        self._drop_if_empty(key)
+        return removed
+
+    def cmd_zcard(self, conn, key):
+        return len(self._get(key, ZSet) or ())
+
+    def cmd_zscore(self, conn, key, member):
+        score = (self._get(key, ZSet) or {}).get(member)
+        return None if score is None else _format_score(score)
+
+    def cmd_zrange(self, conn, key, start, stop, *options):
+        ordered = (self._get(key, ZSet) or ZSet()).ordered()
+        return _with_scores(ordered[_slice(len(ordered), int(start), int(stop))], options)
+
+    def cmd_zrangebyscore(self, conn, key, low, high, *options):
+        return self._range_by_score(key, low, high, options, reverse=False)
+
+    def cmd_zrevrangebyscore(self, conn, key, high, low, *options):
+        return self._range_by_score(key, low, high, options, reverse=True)
+
+    def _range_by_score(self, key, low, high, options, reverse):
+        low_ok, high_ok = _score_bound(low, lower=True), _score_bound(high, lower=False)
+        ordered = (self._get(key, ZSet) or ZSet()).ordered(reverse=reverse)
+        matched = [(m, s) for m, s in ordered if low_ok(s) and high_ok(s)]
+        upper = [opt.upper() for opt in options]
+        if b'LIMIT' in upper:
+            i = upper.index(b'LIMIT')
+            offset, count = int(options[i + 1]), int(options[i + 2])
+            matched = matched[offset:] if count < 0 else matched[offset:offset + count]
+        return _with_scores(matched, options)
+
+    # transactions
+    def cmd_multi(self, conn):
+        if conn.queued is not None:
+            raise CommandError("ERR MULTI calls can not be nested")
+        conn.queued = []
+        return Status('OK')
+
+    def cmd_exec(self, conn):
+        if conn.queued is None:
+            raise CommandError("ERR EXEC without MULTI")
+        queued, conn.queued = conn.queued, None
+        replies = []
+        for handler, args in queued:
+            try:
+                replies.append(handler(conn, *args))
+            except CommandError as exc:
+                replies.append(exc)
+        return replies
+
+    def cmd_discard(self, conn):
+        conn.queued = None
+        return Status('OK')
+
+    def cmd_watch(self, conn, *keys):
+        # Commands are serialised, so a watched key can only change between WATCH and EXEC
+        # from another client; load tests don't exercise that race, so WATCH is accepted as-is
+        return Status('OK')
+
+    cmd_unwatch = cmd_watch
+
+    # scripts
+    def cmd_script(self, conn, subcommand, *args):
+        subcommand = subcommand.upper()
+        if subcommand == b'LOAD':
+            sha = _sha(args[0])
+            if sha not in self._scripts:
+                raise CommandError("ERR only redis-py Lock scripts are supported by the stand-in")
+            return sha.encode()
+        if subcommand == b'EXISTS':
+            return [int(sha.decode() in self._scripts) for sha in args]
+        return Status('OK')
+
+    def cmd_evalsha(self, conn, sha, numkeys, *args):
+        script = self._scripts.get(sha.decode().lower())
+        if script is None:
+            raise CommandError("NOSCRIPT No matching script. Please use EVAL.")
+        numkeys = int(numkeys)
+        return script(conn, list(args[:numkeys]), list(args[numkeys:]))
+
+    def cmd_eval(self, conn, script, numkeys, *args):
+        return self.cmd_evalsha(conn, _sha(script).encode(), numkeys, *args)
+
+    def _lock_release(self, conn, keys, argv):
+        if self._get(keys[0], bytes) != argv[0]:
+            return 0
+        self._delete(keys[0])
+        return 1
+
+    def _lock_extend(self, conn, keys, argv):
+        if self._get(keys[0], bytes) != argv[0] or self.cmd_pttl(conn, keys[0]) < 0:
+            return 0
+        extra = int(argv[1]) + (self.cmd_pttl(conn, keys[0]) if argv[2] == b'0' else 0)
+        return self.cmd_pexpire(conn, keys[0], extra)
+
+    def _lock_reacquire(self, conn, keys, argv):
+        if self._get(keys[0], bytes) != argv[0]:
+            return 0
+        return self.cmd_pexpire(conn, keys[0], argv[1])
+
+    # pub/sub
+    def cmd_publish(self, conn, channel, message):
+        with self._cond:
+            receivers = [(c, [b'message', channel, message]) for c in self._channels.get(channel, ())]
+            for pattern, subscribers in self._patterns.items():
+                if fnmatch.fnmatchcase(channel.decode(), pattern.decode()):
+                    receivers += [(c, [b'pmessage', pattern, channel, message]) for c in subscribers]
+        for subscriber, frame in receivers:
+            subscriber.push(frame)
+        return len(receivers)
+
+    def cmd_subscribe(self, conn, *channels):
+        return self._subscribe(conn, channels, self._channels, conn.channels, b'subscribe')
+
+    def cmd_psubscribe(self, conn, *patterns):
+        return self._subscribe(conn, patterns, self._patterns, conn.patterns, b'psubscribe')
+
+    def cmd_unsubscribe(self, conn, *channels):
+        return self._unsubscribe(conn, channels, self._channels, conn.channels, b'unsubscribe')
+
+    def cmd_punsubscribe(self, conn, *patterns):
+        return self._unsubscribe(conn, patterns, self._patterns, conn.patterns, b'punsubscribe')
+
+    def _subscribe(self, conn, names, registry, own, kind):
+        for name in names:
+            with self._cond:
+                registry.setdefault(name, set()).add(conn)
+                own.add(name)
+            conn.push([kind, name, len(conn.channels) + len(conn.patterns)])
+        return NoReply
+
+    def _unsubscribe(self, conn, names, registry, own, kind):
+        names = names or list(own)
+        if not names:
+            conn.push([kind, None, len(conn.channels) + len(conn.patterns)])
+        for name in names:
+            with self._cond:
+                registry.get(name, set()).discard(conn)
+                if not registry.get(name, True):
+                    del registry[name]
+                own.discard(name)
+            conn.push([kind, name, len(conn.channels) + len(conn.patterns)])
+        return NoReply
+
+    def disconnect(self, conn):
+        self._unsubscribe(conn, list(conn.channels), self._channels, conn.channels, b'unsubscribe')
+        self._unsubscribe(conn, list(conn.patterns), self._patterns, conn.patterns, b'punsubscribe')
+
+    def _handler(self):
+        standin = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def setup(self):
+                super().setup()
+                self.queued = None
+                self.channels = set()
+                self.patterns = set()
+                self.write_lock = threading.Lock()
+
+            def push(self, reply):
+                payload = encode(reply)
+                with self.write_lock:
+                    try:
+                        self.wfile.write(payload)
+                        self.wfile.flush()
+                    except OSError:
+                        pass
+
+            def handle(self):
+                while True:
+                    try:
+                        args = read_command(self.rfile)
+                    except (OSError, ValueError):
+                        break
+                    if args is None:
+                        break
+                    if not args:
+                        continue
+                    try:
+                        reply = standin.execute(self, args)
+                    except CommandError as exc:
+                        reply = exc
+                    except (TypeError, ValueError, IndexError) as exc:
+                        reply = CommandError(f"ERR {exc}")
+                    if reply is not NoReply:
+                        self.push(reply)
+                    if args[0].upper() == b'QUIT':
+                        break
+                standin.disconnect(self)
+
+        return Handler
+
+
+class ZSet(dict):
+    """member -> score"""
+
+    def ordered(self, reverse=False):
+        return sorted(self.items(), key=lambda item: (item[1], item[0]), reverse=reverse)
+
+
+class Status(str):
+    """Simple string reply (+OK)"""
+
+
+class Array(list):
+    """Array reply; Array(None) encodes the null array"""
+
+    def __init__(self, items=()):
+        super().__init__(items or ())
+        self.null = items is None
+
+
+NoReply = object()
+
+
+def encode(reply):
+    if isinstance(reply, CommandError):
+        return f"-{reply}\r\n".encode()
+    if isinstance(reply, Status):
+        return f"+{reply}\r\n".encode()
+    if isinstance(reply, bool):
+        reply = int(reply)
+    if isinstance(reply, int):
+        return f":{reply}\r\n".encode()
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, str):
+        reply = reply.encode()
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    if isinstance(reply, Array) and reply.null:
+        return b"*-1\r\n"
+    return b"*%d\r\n" % len(reply) + b"".join(encode(item) for item in reply)
+
+
+def read_command(rfile):
+    """Read one RESP array of bulk strings (or an inline command); None on EOF"""
+    line = rfile.readline()
+    if not line:
+        return None
+    if not line.startswith(b'*'):
+        return line.split()
+    args = []
+    for _ in range(int(line[1:])):
+        header = rfile.readline()
+        if not header.startswith(b'$'):
+            raise ValueError("expected bulk string")
+        size = int(header[1:])
+        args.append(rfile.read(size + 2)[:size])
+    return args
+
+
+def _slice(length, start, stop):
+    start = max(length + start, 0) if start < 0 else start
+    stop = length + stop if stop < 0 else stop
+    return slice(start, stop + 1)
+
+
+def _score_bound(raw, lower):
+    text = raw.decode()
+    exclusive = text.startswith('(')
+    value = float(text.lstrip('(').replace('+inf', 'inf'))
+    if lower:
+        return (lambda s: s > value) if exclusive else (lambda s: s >= value)
+    return (lambda s: s < value) if exclusive else (lambda s: s <= value)
+
+
+def _format_score(score):
+    return repr(score).encode() if score != int(score) else str(int(score)).encode()
+
+
+def _with_scores(pairs, options):
+    if any(opt.upper() == b'WITHSCORES' for opt in options):
+        return [item for member, score in pairs for item in (member, _format_score(score))]
+    return [member for member, _ in pairs]
@@ -0,0 +1,308 @@
+"""
+Model registry: the trained LSTM and scaler for every symbol and interval
+
+Each process builds the registry once, on first use. It reads the manifest
+that `manage.py build_model_manifest` writes to MODEL_MANIFEST, or, if there
+is none, scans models_hourly/ and models_daily/. Views and tasks then look
+models up in memory instead of globbing or stat-ing per request. Each entry
+records:
+- the model and scaler files, with their sha256;
+- a version (a hash of both);
+- the input window and feature layout;
+- the (mtime, size) signature the files had when hashed.
+A manifest entry whose files no longer match its signature is described
+afresh.
+
+Models load on first use. Every MODEL_POLL_SECONDS the next lookup re-stats
+the files and lists the folders; there is no background thread, so this
+works the same in web and Celery processes. New or changed files are picked
+up once they have been unchanged for MODEL_SETTLE_SECONDS, because training
+writes the model and then the scaler. A changed model that is already
+loaded is loaded again and checked against the app's input layout. It then
+replaces the old pair in one assignment: requests already holding the old
+model finish with it, and no request can see a new model with an old
+scaler. If the new files fail to load or don't fit, the old version keeps
+serving until the files change again.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zipfile
+
+import joblib
+import tensorflow as tf
+from django.conf import settings
+from django.utils import timezone
+
+from . import metrics
+from .prediction import FEATURES, MODEL_USD_TO_INR, WINDOW_SIZES, quote_scaler, release_model
+
+logger = logging.getLogger(__name__)
+
+MODELS_ROOT = os.path.dirname(os.path.abspath(__file__))
+FOLDERS = {'1h': 'models_hourly', '1d': 'models_daily'}
+TIMEFRAMES = {'1h': 'hourly', '1d': 'daily'}
+MANIFEST_VERSION = 1
+
+
+def model_files(symbol, interval):
+    """Model and scaler paths, relative to the models root"""
+    folder = FOLDERS[interval]
+    return (os.path.join(folder, f"{symbol}_{TIMEFRAMES[interval]}_lstm.keras"),
+            os.path.join(folder, f"{symbol}_scaler.pkl"))
+
+
+def discover(root=MODELS_ROOT):
+    """(symbol, interval) for every model file under `root`"""
+    found = []
+    for interval, folder in FOLDERS.items():
+        suffix = f"_{TIMEFRAMES[interval]}_lstm.keras"
+        try:
+            names = os.listdir(os.path.join(root, folder))
+        except FileNotFoundError:
+            continue
+        found += [(name[:-len(suffix)], interval) for name in names if name.endswith(suffix)]
+    return sorted(found)
+
+
+def signature(root, symbol, interval):
+    """[[mtime_ns, size]] of the model and scaler files, or None if either is missing"""
+    try:
+        stats = [os.stat(os.path.join(root, path)) for path in model_files(symbol, interval)]
+    except FileNotFoundError:
+        return None
+    return [[stat.st_mtime_ns, stat.st_size] for stat in stats]
+
+
+def describe(root, symbol, interval):
+    """Registry entry for one model, from its files; None if they are missing or unreadable"""
+    model_path, scaler_path = model_files(symbol, interval)
+    # Stat before reading, so a write that lands while hashing shows up as a change on the next poll
+    entry = {'symbol': symbol, 'interval': interval, 'model': model_path, 'scaler': scaler_path,
+             'signature': signature(root, symbol, interval)}
+    if entry['signature'] is None:
+        return None
+    try:
+        entry['model_sha256'] = file_sha256(os.path.join(root, model_path))
+        entry['scaler_sha256'] = file_sha256(os.path.join(root, scaler_path))
+        with zipfile.ZipFile(os.path.join(root, model_path)) as archive:
+            config = json.loads(archive.read('config.json'))
+            saved = json.loads(archive.read('metadata.json'))
+        scaler = joblib.load(os.path.join(root, scaler_path))
+    except Exception as e:
+        logger.error("Reading model files for %s %s: %s", symbol, interval, e)
+        return None
+
+    shape = (config.get('build_config') or {}).get('input_shape') or config['config']['build_input_shape']
+    names = getattr(scaler, 'feature_names_in_', None)
+    entry.update({
+        'version': hashlib.sha256((entry['model_sha256'] + entry['scaler_sha256']).encode()).hexdigest()[:12],
+        'window': shape[1],
+        'features': [str(name) for name in names] if names is not None else None,
+        'n_features': shape[2],
+        'saved_at': saved.get('date_saved'),
+        'keras_version': saved.get('keras_version'),
+    })
+    return entry
+
+
+def problems(entry):
+    """Why the app can't feed this model (empty if it can)"""
+    found = []
+    window = WINDOW_SIZES[entry['interval']]
+    if entry['window'] != window:
+        found.append(f"input window {entry['window']}, the app feeds {window} candles")
+    if entry['n_features'] != len(FEATURES) or entry['features'] not in (None, FEATURES):
+        found.append(f"features {entry['features'] or entry['n_features']}, the app feeds {FEATURES}")
+    return found
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_manifest(path):
+    """{(symbol, interval): entry} from a manifest file, or None if there is no usable one"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring model manifest %s: %s", path, e)
+        return None
+    if data.get('version') != MANIFEST_VERSION:
+        logger.warning("Ignoring model manifest %s: version %s, expected %s", path, data.get('version'),
+                       MANIFEST_VERSION)
+        return None
+    return {(entry['symbol'], entry['interval']): entry for entry in data['models']}
+
+
+def write_manifest(path, entries):
+    data = {
+        'version': MANIFEST_VERSION,
+        'generated_at': timezone.now().isoformat(),
+        'models': [entries[key] for key in sorted(entries)],
+    }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class ModelRegistry:
+    """The models available to this process and the loaded version of each (see module docstring)"""
+
+    def __init__(self, root=MODELS_ROOT, manifest=None):
+        self.root = root
+        self.manifest = manifest
+        self._entries = None
+        self._loaded = {}  # (symbol, interval) -> (version, model, scaler), replaced whole
+        self._rejected = {}  # (symbol, interval) -> signature of files that failed to load
+        self._lock = threading.RLock()  # held while building, polling and loading
+        self._next_poll = 0.0
+
+    @property
+    def entries(self):
+        """{(symbol, interval): entry}"""
+        if self._entries is None:
+            with self._lock:
+                if self._entries is None:
+                    self._entries = self._build()
+                    self._next_poll = time.monotonic() + settings.MODEL_POLL_SECONDS
+        return self._entries
+
+    def symbols(self, interval=None):
+        return sorted({symbol for symbol, i in self.entries if interval in (None, i)})
+
+    def get(self, symbol, interval):
+        """(model, scaler) of the current version, loaded on first use; (None, None) if unavailable"""
+        self.poll()
+        key = (symbol, interval)
+        loaded = self._loaded.get(key)
+        if loaded is not None:
+            metrics.inc('model_cache_total', result='hit')
+            return loaded[1], loaded[2]
+
+        metrics.inc('model_cache_total', result='miss')
+        with self._lock:
+            loaded = self._loaded.get(key)
+            if loaded is None:
+                entry = self.entries.get(key)
+                if entry is None:
+                    logger.error("No model registered for %s %s", symbol, interval)
+                    return None, None
+                loaded = self._load(entry)
+                if loaded is None:
+                    return None, None
+                self._loaded[key] = loaded
+        return loaded[1], loaded[2]
+
+    def evict(self, symbol, interval):
+        """Forget the loaded model so the next get() loads it from disk (benchmarks use this)"""
+        self._loaded.pop((symbol, interval), None)
+
+    def poll(self):
+        """refresh(), at most once per MODEL_POLL_SECONDS and never while another thread is polling or loading"""
+        if not settings.MODEL_POLL_SECONDS or self._entries is None or time.monotonic() < self._next_poll:
+            return
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._next_poll = time.monotonic() + settings.MODEL_POLL_SECONDS
+            self.refresh()
+        finally:
+            self._lock.release()
+
+    def refresh(self):
+        """Pick up new, changed and removed model files now; returns the keys that changed"""
+        with self._lock:
+            entries = dict(self.entries)
+            changed = []
+            for key in sorted(set(entries) | set(discover(self.root))):
+                entry = entries.get(key)
+                current = signature(self.root, *key)
+                if entry is not None and current == entry['signature']:
+                    continue
+                if current is None:
+                    logger.warning("Model %s %s removed", *key)
+                    del entries[key]
+                    self._loaded.pop(key, None)
+                    changed.append(key)
+                    continue
+                if current == self._rejected.get(key) or not self._settled(current):
+                    continue
+
+                new = describe(self.root, *key)
+                if new is None:
+                    self._rejected[key] = current
+                    continue
+                if entry is not None and new['version'] == entry['version']:
+                    entries[key] = new  # touched or copied again; same content
+                    continue
+                if key in self._loaded:
+                    loaded = self._load(new)
+                    if loaded is None:
+                        self._rejected[key] = current
+                        metrics.inc('model_reloads_total', result='rejected')
+                        continue
+                    old = self._loaded[key]
+                    self._loaded[key] = loaded
+                    release_model(old[1])
+                    metrics.inc('model_reloads_total', result='swapped')
+                self._rejected.pop(key, None)
+                entries[key] = new
+                changed.append(key)
+                logger.info("Model %s %s now at version %s (was %s)", *key, new['version'],
+                            entry['version'] if entry else 'none')
+            self._entries = entries
+            return changed
+
+    def _build(self):
+        manifest = read_manifest(self.manifest or settings.MODEL_MANIFEST)
+        if manifest is None:
+            entries = {key: describe(self.root, *key) for key in discover(self.root)}
+            source = 'scan'
+        else:
+            entries = {key: self._current(entry) for key, entry in manifest.items()}
+            source = 'manifest'
+        entries = {key: entry for key, entry in entries.items() if entry is not None}
+        logger.info("Model registry: %d models from %s", len(entries), source)
+        return entries
+
+    def _current(self, entry):
+        """A manifest entry, described afresh if its files changed since the manifest was written"""
+        if signature(self.root, entry['symbol'], entry['interval']) == entry['signature']:
+            return entry
+        return describe(self.root, entry['symbol'], entry['interval'])
+
+    def _settled(self, current):
+        newest = max(mtime_ns for mtime_ns, _ in current) / 1e9
+        return time.time() - newest >= settings.MODEL_SETTLE_SECONDS
+
+    def _load(self, entry):
+        symbol, interval = entry['symbol'], entry['interval']
+        found = problems(entry)
+        if found:
+            logger.error("Model %s %s version %s doesn't fit: %s", symbol, interval, entry['version'],
+                         '; '.join(found))
+            return None
+        try:
+            with metrics.timer('model_load'):
+                model = tf.keras.models.load_model(os.path.join(self.root, entry['model']))
+                scaler = quote_scaler(joblib.load(os.path.join(self.root, entry['scaler'])), MODEL_USD_TO_INR)
+        except Exception as e:
+            logger.error("Loading model/scaler for %s %s: %s", symbol, interval, e)
+            return None
+        logger.info("Loaded model and scaler for %s %s (version %s)", symbol, interval, entry['version'])
+        return entry['version'], model, scaler
+
+
+registry = ModelRegistry()
@@ -1,17 +1,17 @@
 from celery import shared_task
 from django.conf import settings
 from .views import get_prediction
-from .models import PredictionHistory
-import os
+from . import prediction as prediction_module
+from . import fx, history_buffer, metrics
+from .models import INTERVALS, ForecastRun, candle_start
 import logging
 import requests
 from django.utils import timezone
-from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
 @shared_task(bind=True)
-def generate_prediction_task(self, user_id, crypto, timeframe, period):
+def generate_prediction_task(self, user_id, crypto, timeframe, period, mc_samples=0):
     """
     Celery task to run prediction asynchronously.
 
@@ -23,45 +23,23 @@ def generate_prediction_task(self, user_id, crypto, timeframe, period):
     from django.contrib.auth.models import User
 
     try:
-        logger.info(f"\n🚀 Celery Task Started: {crypto} | {timeframe} | {period} | user_id={user_id}")
-        print(f"\n🚀 Celery Task Started: {crypto} | {timeframe} | {period} | user_id={user_id}")
-        usd_to_inr = float(os.environ.get('USD_TO_INR', '88.75'))
-        logger.info(f"💱 USD to INR (env): {usd_to_inr}")
-        print(f"💱 USD to INR (env): {usd_to_inr}")
+        logger.debug("Celery task started: %s | %s | %s | user_id=%s", crypto, timeframe, period, user_id)
 
         # Run prediction logic from views.py
-        prediction_data = get_prediction(crypto, timeframe, int(period))
+        prediction_data = get_prediction(crypto, timeframe, int(period), mc_samples)
 
         # If user exists and is authenticated, store result in PredictionHistory
         if user_id > 0:
             user = User.objects.filter(id=user_id).first()
             if user:
-                # Calculate the target time for the prediction
-                target_time = timezone.now() + timedelta(
-                    hours=period if timeframe == 'hourly' else period * 24
-                )
-                
-                history_entry = PredictionHistory.objects.create(
-                    user=user,
-                    crypto=crypto,
-                    timeframe=timeframe,
-                    period=period,
-                    current_price=prediction_data['current_price'],
-                    predicted_price=prediction_data['predicted_price'],
-                    confidence_level=prediction_data['confidence_level'],
-                    market_sentiment=prediction_data['market_sentiment'],
-                    prediction_target_time=target_time  # <-- Add this line
-                )
-                logger.info(f"✅ Prediction saved in DB (ID: {history_entry.id})")
-                print(f"✅ Prediction saved in DB (ID: {history_entry.id})")
+                with metrics.timer('db_write'):
+                    history_buffer.save(user, crypto, timeframe, period, prediction_data, source='celery')
+                logger.debug("Prediction saved to history for user_id=%s", user_id)
         else:
-            logger.info(f"ℹ️  Anonymous user - prediction not saved to history")
-            print(f"ℹ️  Anonymous user - prediction not saved to history")
+            logger.debug("Anonymous user - prediction not saved to history")
 
-        logger.info("🎯 Celery task completed successfully!")
-        print("🎯 Celery task completed successfully!")
         # Return the complete prediction data including chart arrays
-        return {
+        result = {
             'status': 'success',
             'crypto': prediction_data['crypto'],
             'timeframe': prediction_data['timeframe'],
@@ -75,149 +53,178 @@ def generate_prediction_task(self, user_id, crypto, timeframe, period):
             'predicted_prices': prediction_data['predicted_prices'],
             'min_price': prediction_data.get('min_price', prediction_data['predicted_price'] * 0.95),
             'max_price': prediction_data.get('max_price', prediction_data['predicted_price'] * 1.05),
-            'volatility': prediction_data.get('volatility', 'Medium')
+            'volatility': prediction_data.get('volatility', 'Medium'),
+            'currency': prediction_data['currency'],
         }
+        if 'prediction_bands' in prediction_data:
+            result['prediction_bands'] = prediction_data['prediction_bands']
+        return result
 
     except Exception as e:
-        logger.error(f"❌ Error in Celery Task: {str(e)}")
-        print(f"❌ Error in Celery Task: {str(e)}")
-        import traceback
-        logger.error(traceback.format_exc())
+        logger.exception("❌ Error in Celery Task: %s", e)
         return {'status': 'error', 'message': str(e)}
 
 
 @shared_task
-def update_actual_prices_task(prediction_ids):
+def update_actual_prices_task(run_ids):
     """
-    Celery task to fetch actual prices for predictions in the background.
+    Celery task to fetch actual prices for forecast runs in the background.
     This makes the history page load instantly without waiting for API calls.
+    One price resolves every user's history entry for the run.
     
     Args:
-        prediction_ids: List of PredictionHistory IDs to update
+        run_ids: List of ForecastRun IDs to update
     """
-    logger.info(f"🔄 Starting background task to update {len(prediction_ids)} actual prices")
+    logger.info("🔄 Starting background task to update %s actual prices", len(run_ids))
     
-    usd_to_inr = float(os.environ.get('USD_TO_INR', '88.75'))
     updated_count = 0
     
-    for pred_id in prediction_ids:
+    for run_id in run_ids:
         try:
-            prediction = PredictionHistory.objects.get(id=pred_id)
+            run = ForecastRun.objects.get(id=run_id)
             
             # Skip if actual price already exists
-            if prediction.actual_price:
+            if run.actual_price:
                 continue
             
             # Check if target time has been reached
-            if not prediction.is_prediction_time_reached():
+            if not run.is_prediction_time_reached():
                 continue
             
             # To get the price at the target time, we need to find the candlestick
             # that CONTAINS our target time. We do this by fetching the kline
             # that starts just before our target time.
-            symbol = f"{prediction.crypto}USDT"
-            interval = "1h" if prediction.timeframe == 'hourly' else "1d"
-            
-            # Round down the target time to the start of the hour/day
-            # CRITICAL FIX: Convert target time to UTC before calculations to match Binance API's timezone.
-            target_dt_utc = prediction.prediction_target_time.astimezone(timezone.utc)
+            symbol = f"{run.crypto}USDT"
+            interval = "1h" if run.timeframe == 'hourly' else "1d"
             
-            target_dt = target_dt_utc
-            if interval == "1h":
-                start_dt = target_dt.replace(minute=0, second=0, microsecond=0)
-            else: # "1d"
-                start_dt = target_dt.replace(hour=0, minute=0, second=0, microsecond=0)
+            # Round down the target time to the start of the hour/day (UTC, like Binance)
+            start_dt = candle_start(run.timeframe, run.prediction_target_time)
             
             start_timestamp_ms = int(start_dt.timestamp() * 1000)
-            url = f"https://api.binance.com/api/v3/klines?symbol={symbol}&interval={interval}&startTime={start_timestamp_ms}&limit=1"
-            response = requests.get(url, timeout=10)
+            url = f"{prediction_module.BINANCE_API_URL}/api/v3/klines?symbol={symbol}&interval={interval}&startTime={start_timestamp_ms}&limit=1"
+            with metrics.binance_timer('klines'):
+                response = requests.get(url, timeout=10)
+            metrics.inc('binance_requests_total', endpoint='klines',
+                        status='ok' if response.status_code == 200 else 'error')
             
             if response.status_code == 200:
                 data = response.json()
                 
                 if data and len(data) > 0:
-                    close_price_usd = float(data[0][4])
+                    close_price_usdt = float(data[0][4])
                     # The 'close' price of the kline is the price at the END of that interval.
                     # This is the most accurate available price for our target time.
                     
-                    price_inr = close_price_usd * usd_to_inr
+                    # Stored in the run's own currency so it compares with predicted_price
+                    actual_price = fx.convert(close_price_usdt, run.currency)
                     
-                    prediction.actual_price = round(price_inr, 2)
-                    prediction.save(update_fields=['actual_price'])
+                    # Only the worker that actually resolves the run updates the aggregates
+                    with metrics.timer('actual_price_write'):
+                        resolved = run.resolve(actual_price)
+                    if not resolved:
+                        continue
                     
                     updated_count += 1
-                    target_time_str = prediction.prediction_target_time.strftime('%Y-%m-%d %H:%M')
-                    logger.info(f"✅ Updated actual price for {prediction.crypto} (ID: {pred_id}) at {target_time_str}: ₹{price_inr:.2f}")
+                    target_time_str = run.prediction_target_time.strftime('%Y-%m-%d %H:%M')
+                    logger.debug("✅ Updated actual price for %s (run %s) at %s: %.2f %s",
+                                 run.crypto, run_id, target_time_str, actual_price, run.currency)
                 else:
-                    logger.warning(f"⚠️ No historical data from Binance for {prediction.crypto} (ID: {pred_id}) at timestamp {start_timestamp_ms}")
+                    logger.warning("⚠️ No historical data from Binance for %s (run %s) at timestamp %s",
+                                   run.crypto, run_id, start_timestamp_ms)
             else:
-                logger.warning(f"⚠️ Binance API failed for {prediction.crypto} (ID: {pred_id}) - Status: {response.status_code}, Response: {response.text}")
+                logger.warning("⚠️ Binance API failed for %s (run %s) - Status: %s, Response: %s",
+                               run.crypto, run_id, response.status_code, response.text)
                 
-        except PredictionHistory.DoesNotExist:
-            logger.error(f"❌ Prediction ID {pred_id} not found")
+        except ForecastRun.DoesNotExist:
+            logger.error("❌ Forecast run %s not found", run_id)
         except Exception as e:
-            logger.error(f"❌ Error updating prediction ID {pred_id}: {str(e)}")
+            logger.error("❌ Error updating forecast run %s: %s", run_id, e)
             continue
     
-    logger.info(f"📊 Background task completed: Updated {updated_count}/{len(prediction_ids)} actual prices")
-    return {'updated': updated_count, 'total': len(prediction_ids)}
+    logger.info("📊 Background task completed: Updated %s/%s actual prices", updated_count, len(run_ids))
+    return {'updated': updated_count, 'total': len(run_ids)}
 
 
 @shared_task(name="check_and_update_all_pending_predictions")
 def check_and_update_all_pending_predictions():
     """
-    Periodically scans the database for all predictions that are past their
-    target time but don't have an actual_price yet. It then dispatches
+    Periodically scans the database for all forecast runs whose target candle
+    has closed but don't have an actual_price yet. It then dispatches
     a background task to update them.
     
     This task is scheduled to run automatically by Celery Beat.
     """
-    # --- Self-healing step: Fix old predictions with missing target times ---
-    predictions_to_fix = PredictionHistory.objects.filter(prediction_target_time__isnull=True)
-    fix_count = predictions_to_fix.count()
-    
-    if fix_count > 0:
-        logger.info(f"Found {fix_count} historical predictions with missing target times. Backfilling now...")
-        for prediction in predictions_to_fix:
-            # Calculate the correct target time based on when the prediction was created
-            time_delta = timedelta(
-                hours=prediction.period if prediction.timeframe == 'hourly' else prediction.period * 24
-            )
-            correct_target_time = prediction.created_at + time_delta
-            prediction.prediction_target_time = correct_target_time
-            prediction.save(update_fields=['prediction_target_time'])
-        logger.info(f"✅ Successfully backfilled target times for {fix_count} predictions.")
-    # --- End of self-healing step ---
-
-
-    # --- Original logic: Find due predictions and dispatch update task ---
-    # Find predictions where the actual price is not yet set.
-    pending_predictions = PredictionHistory.objects.filter(actual_price__isnull=True)
-    
-    prediction_ids_to_update = []
+    # Find runs where the actual price is not yet set and the target time has passed.
     now = timezone.now()
+    pending_runs = ForecastRun.objects.filter(actual_price__isnull=True, prediction_target_time__lte=now)
+    
+    run_ids_to_update = []
 
-    for prediction in pending_predictions:
-        if not prediction.prediction_target_time:
-            continue
-
+    for run in pending_runs.only('id', 'timeframe', 'prediction_target_time'):
         # **CRITICAL FIX**: Determine the 'safe' time to fetch the actual price.
         # This is the time when the candlestick containing the target time has *closed*.
-        target_time = prediction.prediction_target_time
-        
-        if prediction.timeframe == 'hourly':
-            # For hourly, the candle closes at the start of the NEXT hour.
-            # e.g., a 17:52 target is in the 17:00-18:00 candle, which closes at 18:00.
-            safe_update_time = target_time.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
-        else: # 'daily'
-            # For daily, the candle closes at the start of the NEXT day (in UTC).
-            # We convert to UTC for this calculation to align with Binance's daily candle close.
-            target_time_utc = target_time.astimezone(timezone.utc)
-            safe_update_time = (target_time_utc.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1))
+        # e.g., a 17:52 target is in the 17:00-18:00 candle, which closes at 18:00;
+        # daily candles close at the start of the next day in UTC, like Binance.
+        safe_update_time = candle_start(run.timeframe, run.prediction_target_time) + INTERVALS[run.timeframe]
 
         if now >= safe_update_time:
-            prediction_ids_to_update.append(prediction.id)
+            run_ids_to_update.append(run.id)
+
+    if run_ids_to_update:
+        logger.info("Found %s forecast runs to update. Dispatching task.", len(run_ids_to_update))
+        update_actual_prices_task.delay(run_ids_to_update)
+
+
+@shared_task(name="flush_history_buffer")
+def flush_history_buffer():
+    """Write queued prediction history requests; scheduled when HISTORY_BUFFER_URL is set"""
+    return {'written': history_buffer.flush()}
+
 
-    if prediction_ids_to_update:
-        logger.info(f"Found {len(prediction_ids_to_update)} predictions to update. Dispatching task.")
-        update_actual_prices_task.delay(prediction_ids_to_update)
+@shared_task(name="refresh_market_overview")
+def refresh_market_overview(interval='1h'):
+    """
+    Recompute the market overview snapshot for one interval.
+    Scheduled by Celery Beat at every candle close.
+    """
+    from .overview import refresh_overview
+
+    snapshot = refresh_overview(interval)
+    return {'interval': interval, 'coins': len(snapshot['coins'])}
+
+
+@shared_task(name="refresh_accuracy_analytics")
+def refresh_accuracy_analytics(full=False):
+    """Recompute the model-accuracy buckets for weeks with newly resolved predictions"""
+    from .analytics import refresh
+
+    weeks = refresh(full=full)
+    return {'weeks': [week.isoformat() for week in weeks]}
+
+
+@shared_task(name="archive_prediction_history")
+def archive_prediction_history(ids=None):
+    """
+    Move resolved prediction history older than ARCHIVE_AFTER_DAYS into the
+    monthly archive, one transaction per chunk. After ARCHIVE_TASK_CHUNKS
+    chunks the task re-queues itself rather than holding the worker.
+    Scheduled daily by Celery Beat; the admin action passes `ids` to archive
+    only those rows (the ones that are eligible) ahead of schedule.
+    """
+    from .archive import archive_chunk, cutoff
+
+    before = cutoff()
+    moved = chunks = 0
+    while chunks < settings.ARCHIVE_TASK_CHUNKS:
+        archived = archive_chunk(before, ids=ids)
+        if not archived:
+            break
+        moved += archived
+        chunks += 1
+    more = chunks == settings.ARCHIVE_TASK_CHUNKS
+    if more:
+        archive_prediction_history.delay(ids)
+
+    logger.info("🗄️ Archived %s prediction history rows made before %s%s", moved, before.date(),
+                " (continuing in a new task)" if more else "")
+    return {'archived': moved, 'chunks': chunks, 'before': before.isoformat(), 'more': more}
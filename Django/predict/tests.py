@@ -1,3 +1,280 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.paginator import Paginator
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from . import fx, history_buffer, overview
+from .archive import UserHistory, archive_chunk, unpack
+from .models import ForecastRun, PredictionArchive, PredictionHistory
+from .redis_standin import RedisStandIn
+from .registry import MODELS_ROOT, ModelRegistry, model_files
+
+
+def make_run(crypto, timeframe, created_at, resolved=True):
+    target = created_at + timedelta(hours=1)
+    return ForecastRun.objects.create(
+        crypto=crypto, timeframe=timeframe, period=1, candle=created_at, current_price=Decimal('100.00'),
+        predicted_price=Decimal('101.00'), confidence_level=60, market_sentiment='Bullish',
+        prediction_target_time=target, actual_price=Decimal('102.00') if resolved else None,
+        resolved_at=target if resolved else None)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('archive-user')
+        self.start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+    def request(self, hours, crypto='BTC', resolved=True):
+        created_at = self.start + timedelta(hours=hours)
+        return PredictionHistory.objects.create(user=self.user, run=make_run(crypto, 'hourly', created_at, resolved),
+                                                created_at=created_at)
+
+    def test_chunks_append_to_the_month(self):
+        for hours in range(25):
+            self.request(hours)
+
+        while archive_chunk(datetime(2024, 3, 1, tzinfo=dt_timezone.utc), size=10):
+            pass
+
+        archive = PredictionArchive.objects.get(user=self.user)
+        self.assertEqual(archive.count, 25)
+        self.assertFalse(PredictionHistory.objects.exists())
+        created = [entry[0] for entry in unpack(archive.data)]
+        self.assertEqual(created, sorted(created, reverse=True))
+        self.assertEqual(len(set(created)), 25)
+
+    def test_history_pages_merge_live_and_archived_rows(self):
+        # January and February are archived apart from one unresolved January request
+        # and March stays live
+        for hours in range(0, 24 * 60, 24):
+            self.request(hours, crypto='ETH' if hours % 48 else 'BTC')
+        unresolved = self.request(24 * 15 + 12, resolved=False)
+        for hours in range(24 * 60, 24 * 70, 24):
+            self.request(hours)
+        expected = list(PredictionHistory.objects.filter(user=self.user).order_by('-created_at')
+                        .values_list('created_at', flat=True))
+        expected_btc = list(PredictionHistory.objects.filter(user=self.user, run__crypto='BTC')
+                            .order_by('-created_at').values_list('created_at', flat=True))
+
+        while archive_chunk(datetime(2024, 3, 1, tzinfo=dt_timezone.utc), size=7):
+            pass
+        self.assertEqual(PredictionHistory.objects.filter(user=self.user).count(), 11)
+        self.assertTrue(PredictionHistory.objects.filter(pk=unresolved.pk).exists())
+
+        history = UserHistory(self.user)
+        self.assertEqual(history.count(), len(expected))
+        pages = Paginator(history, 8)
+        listed = [entry.created_at for number in pages.page_range for entry in pages.page(number)]
+        self.assertEqual(listed, expected)
+
+        btc = UserHistory(self.user, crypto='BTC')
+        self.assertEqual([entry.created_at for entry in btc[0:btc.count()]], expected_btc)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                           'overview': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                        'LOCATION': 'overview-tests'}})
+class OverviewTests(SimpleTestCase):
+    def setUp(self):
+        caches['overview'].clear()
+
+    def snapshot(self, coins, candle=None):
+        return {'candle_start': (candle or overview.candle_start('1h')).isoformat(),
+                'coins': [{'crypto': symbol} for symbol in overview.OVERVIEW_SYMBOLS[:coins]]}
+
+    def test_cold_cache_is_computed_by_one_request(self):
+        complete = self.snapshot(len(overview.OVERVIEW_SYMBOLS))
+
+        def compute(interval):
+            # A second request arriving mid-refresh gets nothing rather than computing too
+            self.assertIsNone(overview.get_overview(interval))
+            return complete
+
+        with mock.patch.object(overview, 'compute_overview', side_effect=compute) as compute_overview:
+            self.assertEqual(overview.get_overview('1h'), complete)
+            self.assertEqual(overview.get_overview('1h'), complete)
+        self.assertEqual(compute_overview.call_count, 1)
+
+        response = self.client.get(reverse('predict:market_overview_api'), {'timeframe': 'hourly'})
+        self.assertEqual(response.status_code, 200)
+        caches['overview'].clear()
+        caches['overview'].add(overview.lock_key('1h'), True)
+        response = self.client.get(reverse('predict:market_overview_api'), {'timeframe': 'hourly'})
+        self.assertEqual(response.status_code, 503)
+
+    def test_incomplete_refresh_keeps_the_previous_snapshot(self):
+        previous = self.snapshot(len(overview.OVERVIEW_SYMBOLS), overview.candle_start('1h') - timedelta(hours=1))
+        caches['overview'].set(overview.cache_key('1h'), previous)
+
+        with mock.patch.object(overview, 'compute_overview', return_value=self.snapshot(0)):
+            self.assertEqual(overview.refresh_overview('1h'), previous)
+        self.assertEqual(caches['overview'].get(overview.cache_key('1h')), previous)
+        # The stale snapshot is served without queueing another refresh until the retry delay passes
+        with mock.patch('predict.tasks.refresh_market_overview.delay') as delay:
+            self.assertEqual(overview.get_overview('1h'), previous)
+        delay.assert_not_called()
+
+
+@override_settings(DISPLAY_CURRENCY='EUR', FX_API_URL='http://127.0.0.1:9/latest')
+class FxFallbackTests(TestCase):
+    """The FX provider is unreachable and the fallback table has no EUR rate"""
+
+    def setUp(self):
+        cache.delete(fx.RATES_CACHE_KEY)
+        self.addCleanup(cache.delete, fx.RATES_CACHE_KEY)
+
+    def test_pages_fall_back_to_usdt(self):
+        self.assertEqual(fx.default_currency(), 'USDT')
+
+        user = User.objects.create_user('fx-user')
+        run = make_run('BTC', 'hourly', datetime(2024, 1, 1, tzinfo=dt_timezone.utc))
+        PredictionHistory.objects.create(user=user, run=run)
+        self.client.force_login(user)
+        response = self.client.get(reverse('predict:history'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['currency'], 'USDT')
+
+
+@override_settings(MODEL_POLL_SECONDS=0, MODEL_SETTLE_SECONDS=5)
+class ModelRegistryTests(SimpleTestCase):
+    """Hot-swapping on a copy of two hourly models"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='registry-test-')
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        os.makedirs(os.path.join(self.root, 'models_hourly'))
+        self.install('BTC', '1h', 'BTC', '1h')
+        self.registry = ModelRegistry(root=self.root, manifest=os.path.join(self.root, 'model_manifest.json'))
+
+    def install(self, symbol, interval, source_symbol, source_interval, settled=True):
+        """Copy a shipped model and scaler into the test root as `symbol` `interval`"""
+        for source, target in zip(model_files(source_symbol, source_interval), model_files(symbol, interval)):
+            path = os.path.join(self.root, target)
+            shutil.copyfile(os.path.join(MODELS_ROOT, source), path)
+            if settled:
+                self.age(path)
+
+    def age(self, path, seconds=60):
+        then = time.time() - seconds
+        os.utime(path, (then, then))
+
+    def version(self):
+        return self.registry.entries[('BTC', '1h')]['version']
+
+    def test_changed_files_swap_once_settled(self):
+        model, scaler = self.registry.get('BTC', '1h')
+        old_version = self.version()
+
+        self.install('BTC', '1h', 'ETH', '1h', settled=False)
+        self.assertEqual(self.registry.refresh(), [])  # still being written
+        self.assertIs(self.registry.get('BTC', '1h')[0], model)
+
+        for path in model_files('BTC', '1h'):
+            self.age(os.path.join(self.root, path))
+        self.assertEqual(self.registry.refresh(), [('BTC', '1h')])
+        new_model, new_scaler = self.registry.get('BTC', '1h')
+        self.assertIsNot(new_model, model)
+        self.assertIsNot(new_scaler, scaler)
+        self.assertNotEqual(self.version(), old_version)
+
+    def test_bad_files_are_rejected_and_the_old_version_keeps_serving(self):
+        model, _ = self.registry.get('BTC', '1h')
+        version = self.version()
+
+        model_path = os.path.join(self.root, model_files('BTC', '1h')[0])
+        with open(model_path, 'wb') as f:
+            f.write(b'not a keras archive')
+        self.age(model_path)
+        self.assertEqual(self.registry.refresh(), [])
+        self.assertIs(self.registry.get('BTC', '1h')[0], model)
+        self.assertEqual(self.version(), version)
+
+        # Loads, but takes 30 daily candles where the app feeds 24 hourly ones
+        self.install('BTC', '1h', 'BTC', '1d')
+        self.assertEqual(self.registry.refresh(), [])
+        self.assertIs(self.registry.get('BTC', '1h')[0], model)
+        self.assertEqual(self.version(), version)
+
+    def test_new_and_removed_models(self):
+        self.assertEqual(self.registry.symbols(), ['BTC'])
+        self.install('ETH', '1h', 'ETH', '1h')
+        self.assertEqual(self.registry.refresh(), [('ETH', '1h')])
+        self.assertEqual(self.registry.symbols(), ['BTC', 'ETH'])
+
+        os.remove(os.path.join(self.root, model_files('ETH', '1h')[0]))
+        self.assertEqual(self.registry.refresh(), [('ETH', '1h')])
+        self.assertEqual(self.registry.get('ETH', '1h'), (None, None))
+
+
+@override_settings(HISTORY_BUFFER_SIZE=1000, HISTORY_BUFFER_SECONDS=3600, DISPLAY_CURRENCY='USDT')
+class HistoryBufferTests(TestCase):
+    """The buffer against the in-process RedisStandIn"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.redis = RedisStandIn().start()
+        cls.addClassCleanup(cls.redis.stop)
+
+    def setUp(self):
+        self.enterContext(override_settings(HISTORY_BUFFER_URL=self.redis.url))
+        history_buffer._client = None
+        self.addCleanup(setattr, history_buffer, '_client', None)
+        history_buffer.client().flushdb()
+        self.user = User.objects.create_user('buffer-user')
+        self.forecast = {'current_price': 100.0, 'predicted_price': 101.0,
+                         'confidence_level': 60, 'market_sentiment': 'Bullish', 'currency': 'USDT'}
+
+    def test_history_page_flushes_queued_requests(self):
+        for period in (1, 1, 6):
+            history_buffer.save(self.user, 'BTC', 'hourly', period, self.forecast, source='web')
+        self.assertEqual(history_buffer.client().llen(history_buffer.QUEUE_KEY), 3)
+        self.assertFalse(PredictionHistory.objects.filter(user=self.user).exists())
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('predict:history'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(history_buffer.client().llen(history_buffer.QUEUE_KEY), 0)
+        rows = PredictionHistory.objects.filter(user=self.user)
+        self.assertEqual(rows.count(), 3)
+        # Requests for the same horizon in one candle share a run
+        self.assertEqual(rows.values('run').distinct().count(), 2)
+        self.assertEqual(response.context['predictions'].paginator.count, 3)
+
+    def test_flush_that_loses_its_lock_does_not_trim(self):
+        for period in (1, 1, 6):
+            history_buffer.save(self.user, 'BTC', 'hourly', period, self.forecast, source='web')
+        write = history_buffer._write
+        second = []
+
+        def slow_write(entries):
+            if _write.call_count == 1:
+                # The lock expires mid-write: a second flusher takes over and writes and trims the same
+                # batch, and a new request is queued behind it
+                history_buffer.client().delete(history_buffer.LOCK_KEY)
+                second.append(history_buffer.flush())
+                history_buffer.save(self.user, 'ETH', 'hourly', 1, self.forecast, source='web')
+            return write(entries)
+
+        with mock.patch.object(history_buffer, '_write', side_effect=slow_write) as _write:
+            self.assertEqual(history_buffer.flush(), 3)
+        self.assertEqual(second, [3])
+        # The late request was not trimmed with the first flusher's batch
+        self.assertEqual(history_buffer.client().llen(history_buffer.QUEUE_KEY), 1)
+        self.assertFalse(history_buffer.client().exists(history_buffer.LOCK_KEY))
+
+        self.assertEqual(history_buffer.flush(), 1)
+        rows = PredictionHistory.objects.filter(user=self.user)
+        # At least once: the batch in flight when the lock expired was written by both flushers
+        self.assertEqual(rows.count(), 7)
+        self.assertEqual(rows.filter(run__crypto='ETH').count(), 1)
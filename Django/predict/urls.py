@@ -1,17 +1,29 @@
 """
 URL routing for cryptocurrency price prediction features
+
+With ASYNC_VIEWS (set by CryptoSight/asgi.py) the prediction and task-status
+APIs are served by the native async views in async_views.py.
 """
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if settings.ASYNC_VIEWS:
+    from . import async_views as api_views
+else:
+    api_views = views
+
 app_name = 'predict'
 
 urlpatterns = [
     path('selector/', views.selector_view, name='selector'),
     path('processing/', views.processing_view, name='processing'),
     path('results/', views.results_view, name='results'),
-    path('api/predict/', views.prediction_api, name='prediction_api'),
+    path('api/predict/', api_views.prediction_api, name='prediction_api'),
     path('api/predict-async/', views.prediction_api_async, name='prediction_api_async'),
-    path('api/task-status/', views.task_status_api, name='task_status_api'),
+    path('api/task-status/', api_views.task_status_api, name='task_status_api'),
+    path('api/overview/', views.market_overview_api, name='market_overview_api'),
     path('history/', views.prediction_history, name='history'),
+    path('history/export/', views.export_history, name='export_history'),
+    path('metrics/', views.metrics_view, name='metrics'),
 ]
\ No newline at end of file
@@ -10,40 +10,31 @@ Features:
 """
 from datetime import datetime, timedelta
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
 import os
 import sys
+import logging
 from django.conf import settings
 from .models import PredictionHistory
+from celery import states
 from celery.result import AsyncResult
 
-from .prediction import get_live_data, get_live_prediction, get_realtime_price
+from . import fx, history_buffer, metrics
+from .archive import UserHistory
+from .indicators import IndicatorState, engine as indicator_engine
+from .prediction import MC_SAMPLES_MAX, PREDICTION_BANDS, get_live_data, get_live_prediction, get_realtime_price
+
+logger = logging.getLogger(__name__)
 
 def selector_view(request):
     """Display cryptocurrency selection page with available trained models"""
-    import glob
-    
-    hourly_models_dir = os.path.join(settings.BASE_DIR, 'predict', 'models_hourly')
-    daily_models_dir = os.path.join(settings.BASE_DIR, 'predict', 'models_daily')
-    
-    # Collect all cryptocurrencies that have trained models
-    available_cryptos = set()
-    
-    # Scan hourly models directory
-    if os.path.exists(hourly_models_dir):
-        hourly_files = glob.glob(os.path.join(hourly_models_dir, '*_hourly_lstm.keras'))
-        for file in hourly_files:
-            crypto = os.path.basename(file).split('_')[0]
-            available_cryptos.add(crypto)
-    
-    # Scan daily models directory
-    if os.path.exists(daily_models_dir):
-        daily_files = glob.glob(os.path.join(daily_models_dir, '*_daily_lstm.keras'))
-        for file in daily_files:
-            crypto = os.path.basename(file).split('_')[0]
-            available_cryptos.add(crypto)
+    from .registry import registry
+
+    # Cryptocurrencies with a trained hourly or daily model
+    registry.poll()
+    available_cryptos = registry.symbols()
     
     # Cryptocurrency metadata (full names and display icons)
     crypto_details = {
@@ -88,11 +79,14 @@ def results_view(request):
     crypto = request.GET.get('crypto', 'BTC')
     timeframe = request.GET.get('timeframe', 'hourly')
     period = request.GET.get('period', '1')
+    currency = fx.display_currency(request)
     
     context = {
         'crypto': crypto,
         'timeframe': timeframe,
-        'period': period
+        'period': period,
+        'currency': currency,
+        'currency_symbol': fx.symbol_for(currency),
     }
     return render(request, 'predict/results.html', context)
 
@@ -102,56 +96,53 @@ def prediction_api(request):
     crypto = request.GET.get('crypto', 'BTC')
     timeframe = request.GET.get('timeframe', 'hourly')
     period = int(request.GET.get('period', '1'))
+    mc_samples = parse_mc_samples(request)
+    currency = fx.display_currency(request)
     
     try:
         # Try to get a real prediction
-        prediction_data = get_prediction(crypto, timeframe, period)
+        prediction_data = get_prediction(crypto, timeframe, period, mc_samples)
         
         # Save to history if user is authenticated
         if request.user.is_authenticated:
-            from django.utils import timezone
-            target_time = timezone.now() + timedelta(
-                hours=period if timeframe == 'hourly' else period * 24
-            )
-            
-            PredictionHistory.objects.create(
-                user=request.user,
-                crypto=crypto,
-                timeframe=timeframe,
-                period=period,
-                current_price=prediction_data['current_price'],
-                predicted_price=prediction_data['predicted_price'],
-                confidence_level=prediction_data['confidence_level'],
-                market_sentiment=prediction_data['market_sentiment'],
-                prediction_target_time=target_time
-            )
+            with metrics.timer('db_write'):
+                history_buffer.save(request.user, crypto, timeframe, period, prediction_data, source='api')
             
     except Exception as e:
-        print(f"Prediction failed: {str(e)}")
-        # Return sample data for testing
-        prediction_data = {
-            'crypto': crypto,
-            'timeframe': timeframe,
-            'period': period,
-            'current_price': 50000.00,
-            'predicted_price': 52000.00,
-            'confidence_level': 'High',
-            'market_sentiment': 'Bullish',
-            'timestamps': ['2025-10-16 12:00', '2025-10-16 13:00'],
-            'historical_prices': [49000, 49500, 49800, 50000],
-            'predicted_prices': [50200, 51000, 51500, 52000],
-            'min_price': 49000,
-            'max_price': 53000,
-            'volatility': 'Medium'
-        }
+        logger.warning("Prediction failed, serving sample data: %s", e)
+        prediction_data = sample_prediction(crypto, timeframe, period)
     
-    return JsonResponse({
+    return JsonResponse(prediction_payload(prediction_data, currency))
+
+
+def sample_prediction(crypto, timeframe, period):
+    """Sample data served when a live prediction fails"""
+    return {
+        'crypto': crypto,
+        'timeframe': timeframe,
+        'period': period,
+        'current_price': 50000.00,
+        'predicted_price': 52000.00,
+        'confidence_level': 'High',
+        'market_sentiment': 'Bullish',
+        'timestamps': ['2025-10-16 12:00', '2025-10-16 13:00'],
+        'historical_prices': [49000, 49500, 49800, 50000],
+        'predicted_prices': [50200, 51000, 51500, 52000],
+        'min_price': 49000,
+        'max_price': 53000,
+        'volatility': 'Medium'
+    }
+
+
+def prediction_payload(prediction_data, currency):
+    """prediction_api response body, prices converted to `currency`"""
+    return {
         'status': 'SUCCESS',
         'result': {
             'status': 'success',
-            **prediction_data
+            **fx.convert_payload(prediction_data, currency)
         }
-    })
+    }
 
 
 @require_http_methods(["GET"])
@@ -165,20 +156,16 @@ def prediction_api_async(request):
     crypto = request.GET.get('crypto', 'BTC')
     timeframe = request.GET.get('timeframe', 'hourly')
     period = int(request.GET.get('period', '1'))
+    mc_samples = parse_mc_samples(request)
     
     try:
-        print(f"\nAsync Prediction Request: {crypto} | {timeframe} | {period}")
-        print(f"Submitting task to Celery worker...")
-        
         # Get user_id (0 for anonymous users)
         user_id = request.user.id if request.user.is_authenticated else 0
         
         # Submit task to Celery
-        task = generate_prediction_task.delay(user_id, crypto, timeframe, period)
+        task = generate_prediction_task.delay(user_id, crypto, timeframe, period, mc_samples)
         
-        print(f"Task submitted to Celery!")
-        print(f"   Task ID: {task.id}")
-        print(f"   Status: {task.status}")
+        logger.debug("Submitted prediction task %s for %s %s %s", task.id, crypto, timeframe, period)
         
         return JsonResponse({
             'status': 'PENDING',
@@ -187,9 +174,7 @@ def prediction_api_async(request):
         })
         
     except Exception as e:
-        print(f"❌ Error submitting async task: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error submitting async prediction task")
         return JsonResponse({'status': 'FAILURE', 'error': str(e)}, status=500)
 
 
@@ -207,32 +192,37 @@ def task_status_api(request):
     try:
         # Get task result from Celery
         task_result = AsyncResult(task_id)
-        
-        response_data = {
-            'task_id': task_id,
-            'status': task_result.status,
-        }
-        
-        if task_result.ready():
-            # Task is complete
-            if task_result.successful():
-                response_data['result'] = task_result.result
-                print(f"Task {task_id} completed successfully")
-            else:
-                response_data['error'] = str(task_result.result)
-                print(f"ERROR: Task {task_id} failed: {task_result.result}")
-        else:
-            # Task is still pending or running
-            response_data['message'] = 'Task is still processing...'
-            print(f"Task {task_id} status: {task_result.status}")
-        
-        return JsonResponse(response_data)
-        
+        return JsonResponse(task_status_payload(task_id, task_result.status, task_result.result,
+                                                fx.display_currency(request)))
+
     except Exception as e:
-        print(f"ERROR checking task status: {str(e)}")
+        logger.error("Checking task status: %s", e)
         return JsonResponse({'status': 'FAILURE', 'error': str(e)}, status=500)
 
 
+def task_status_payload(task_id, status, result, currency):
+    """task_status_api response for a task's state and stored result (prices converted to `currency`)"""
+    response_data = {
+        'task_id': task_id,
+        'status': status,
+    }
+
+    if status in states.READY_STATES:
+        # Task is complete
+        if status == states.SUCCESS:
+            # Results are stored in USDT; convert for display here
+            if isinstance(result, dict) and result.get('status') == 'success':
+                result = fx.convert_payload(result, currency)
+            response_data['result'] = result
+        else:
+            response_data['error'] = str(result)
+            logger.warning("Task %s failed: %s", task_id, result)
+    else:
+        # Task is still pending or running
+        response_data['message'] = 'Task is still processing...'
+    return response_data
+
+
 @login_required
 def prediction_history(request):
     """Display user's prediction history with filtering and pagination"""
@@ -242,38 +232,29 @@ def prediction_history(request):
     crypto_filter = request.GET.get('crypto', '')
     timeframe_filter = request.GET.get('timeframe', '')
     
-    # Query all predictions for current user
-    all_predictions = PredictionHistory.objects.filter(user=request.user)
-    
-    # Apply cryptocurrency and timeframe filters if provided
-    if crypto_filter:
-        all_predictions = all_predictions.filter(crypto=crypto_filter)
-    if timeframe_filter:
-        all_predictions = all_predictions.filter(timeframe=timeframe_filter)
+    # Write any queued requests first so the user sees all of their own
+    history_buffer.flush()
+
+    # All of the user's predictions, live rows and the monthly archive merged newest first
+    all_predictions = UserHistory(request.user, crypto_filter, timeframe_filter)
     
-    # Prepare filter dropdown options
-    all_user_predictions = PredictionHistory.objects.filter(user=request.user)
     # Display all supported cryptocurrencies in filter dropdown
     available_cryptos = ['ADA', 'AVAX', 'BNB', 'BTC', 'DOGE', 'ETH', 'SOL', 'XRP']
     available_timeframes = ['hourly', 'daily']
     
-    # Sort predictions by creation date (newest first)
-    all_predictions = all_predictions.order_by('-created_at')
-    
     # Implement pagination (10 items per page)
     paginator = Paginator(all_predictions, 10)
     page_number = request.GET.get('page', 1)
     predictions = paginator.get_page(page_number)
     
+    # Prices are stored in each row's currency; convert them for display
+    currency = fx.display_currency(request)
+    fx.localize_predictions(predictions, currency)
+    
     # Log pagination and filter information for debugging
-    total_count = all_predictions.count()
-    print(f"\nHistory Page for {request.user.username}:")
-    print(f"   Filters: Crypto={crypto_filter}, Timeframe={timeframe_filter}")
-    print(f"   Total predictions: {total_count}")
-    print(f"   Current page: {page_number}")
-    print(f"   Showing: {len(predictions)} predictions")
-    if predictions:
-        print(f"   Latest on this page: {predictions[0].crypto} at {predictions[0].created_at}")
+    total_count = paginator.count
+    logger.debug("History page for %s: crypto=%s timeframe=%s total=%s page=%s",
+                 request.user.username, crypto_filter, timeframe_filter, total_count, page_number)
     
     context = {
         'predictions': predictions,
@@ -282,9 +263,111 @@ def prediction_history(request):
         'timeframe_filter': timeframe_filter,
         'available_cryptos': available_cryptos,
         'available_timeframes': available_timeframes,
+        'currency': currency,
+        'currency_symbol': fx.symbol_for(currency),
     }
     return render(request, 'predict/history.html', context)
 
+@require_http_methods(["GET"])
+@login_required
+def export_history(request):
+    """
+    Stream the user's prediction history, archived months included, as a download.
+    ?format=csv|ndjson (default csv), ?crypto=, ?timeframe=, and ?start=/?end=
+    dates (YYYY-MM-DD, inclusive, in TIME_ZONE). Staff may pass ?user=<username>,
+    or ?user=* for every user.
+    """
+    from django.contrib.auth.models import User
+    from django.core.handlers.asgi import ASGIRequest
+    from django.http import StreamingHttpResponse
+    from django.utils import timezone
+    from django.utils.dateparse import parse_date
+    from . import export
+
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return JsonResponse({'error': 'format must be csv or ndjson'}, status=400)
+
+    scope = request.GET.get('user', '')
+    if scope and not request.user.is_staff:
+        return JsonResponse({'error': 'only staff can export other users'}, status=403)
+    if scope == '*':
+        user = None
+    elif scope:
+        user = User.objects.filter(username=scope).first()
+        if user is None:
+            return JsonResponse({'error': f'unknown user {scope}'}, status=404)
+    else:
+        user = request.user
+
+    bounds = {}
+    for name, days in (('start', 0), ('end', 1)):
+        value = request.GET.get(name)
+        if not value:
+            bounds[name] = None
+            continue
+        day = parse_date(value)
+        if day is None:
+            return JsonResponse({'error': f'{name} must be a YYYY-MM-DD date'}, status=400)
+        # Midnight in TIME_ZONE; the end date is included, so stop at the next midnight
+        bounds[name] = timezone.make_aware(datetime.combine(day + timedelta(days=days), datetime.min.time()))
+
+    # Write any queued requests first so the export includes them
+    history_buffer.flush()
+
+    rows = export.rows(user, request.GET.get('crypto', ''), request.GET.get('timeframe', ''), **bounds)
+    if fmt == 'csv':
+        lines, content_type = export.csv_lines(rows), 'text/csv; charset=utf-8'
+    else:
+        lines, content_type = export.ndjson_lines(rows), 'application/x-ndjson'
+    if isinstance(request, ASGIRequest):
+        lines = export.async_lines(lines)
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    filename = f"cryptosight-history-{user.username if user else 'all'}-{timezone.localdate():%Y%m%d}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    metrics.inc('history_exports_total', format=fmt, scope='user' if user == request.user else 'staff')
+    return response
+
+@require_http_methods(["GET"])
+def market_overview_api(request):
+    """
+    Forecasts for every supported coin from the candle-close snapshot.
+    ?timeframe=hourly|daily limits the response to one interval (default: both),
+    ?currency= picks the display currency.
+    """
+    from .overview import TIMEFRAMES, get_overview
+
+    timeframe = request.GET.get('timeframe')
+    intervals = [i for i, name in TIMEFRAMES.items() if timeframe in (None, name)]
+    if not intervals:
+        return JsonResponse({'status': 'FAILURE', 'error': 'timeframe must be hourly or daily'}, status=400)
+
+    try:
+        currency = fx.display_currency(request)
+        snapshots = {TIMEFRAMES[interval]: get_overview(interval) for interval in intervals}
+    except Exception as e:
+        logger.exception("Market overview failed")
+        return JsonResponse({'status': 'FAILURE', 'error': str(e)}, status=500)
+    if None in snapshots.values():
+        # Another request is computing the first snapshot
+        response = JsonResponse({'status': 'PENDING', 'error': 'Market overview is warming up, retry shortly'},
+                                status=503)
+        response['Retry-After'] = '10'
+        return response
+    overview = {timeframe: fx.convert_payload(snapshot, currency) for timeframe, snapshot in snapshots.items()}
+    return JsonResponse({'status': 'SUCCESS', 'result': overview})
+
+@require_http_methods(["GET"])
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint covering the web process and Celery workers.
+    If METRICS_TOKEN is set, requests must send it as a Bearer token.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and request.headers.get('Authorization') != f"Bearer {token}":
+        return HttpResponse(status=401)
+    return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @require_http_methods(["GET"])
 @login_required
 def get_actual_price_api(request, prediction_id):
@@ -293,12 +376,15 @@ def get_actual_price_api(request, prediction_id):
     Used by the history page for live updates.
     """
     try:
-        prediction = PredictionHistory.objects.get(id=prediction_id, user=request.user)
+        prediction = PredictionHistory.objects.select_related('run').get(id=prediction_id, user=request.user)
         
         if prediction.actual_price is not None:
+            currency = fx.display_currency(request)
+            actual_price = fx.convert(prediction.actual_price, currency, prediction.currency)
             return JsonResponse({
                 'status': 'SUCCESS',
-                'actual_price': f"{prediction.actual_price:,.2f}",
+                'actual_price': f"{actual_price:,.2f}",
+                'currency': currency,
                 'prediction_accuracy': prediction.prediction_accuracy
             })
         else:
@@ -308,65 +394,70 @@ def get_actual_price_api(request, prediction_id):
     except PredictionHistory.DoesNotExist:
         return JsonResponse({'status': 'ERROR', 'message': 'Prediction not found.'}, status=404)
 
-def get_prediction(crypto, timeframe, period):
-    """Generate price prediction using trained LSTM model from Model_Training"""
+def parse_mc_samples(request):
+    """Monte-Carlo dropout sample count from ?mc_samples=N (0 = off), capped at MC_SAMPLES_MAX"""
     try:
-        print(f"\n{'='*50}")
-        print(f"Starting prediction for {crypto} {timeframe} {period}")
-        print(f"Checking Model_Training imports...")
-        print(f"   - get_live_data: {get_live_data}")
-        print(f"   - get_live_prediction: {get_live_prediction}")
-        
-        # Convert timeframe to Binance API interval format
-        interval = "1h" if timeframe == 'hourly' else "1d"
-        # Get USD to INR conversion rate from environment variable
-        usd_to_inr = float(os.environ.get('USD_TO_INR', '88.75'))
-        
-        print(f"Fetching live data from Binance...")
-        print(f"   - Symbol: {crypto}")
-        print(f"   - Interval: {interval}")
-        print(f"   - USD to INR: {usd_to_inr}")
-        
-        # Fetch historical price data from Binance API
-        historical_df = get_live_data(crypto, interval, usd_to_inr)
-        if historical_df is None or historical_df.empty:
-            raise ValueError(f"Failed to fetch historical data for {crypto}. Binance API may be down.")
-        
-        # Get the absolute latest price using the ticker
-        realtime_price = get_realtime_price(crypto, usd_to_inr)
-        current_price = realtime_price if realtime_price is not None else historical_df['Close'].iloc[-1]
-        
-        print(f"Got {len(historical_df)} historical data points")
-        print(f"Running LSTM prediction model...")
-        
-        # Generate predictions using trained LSTM model
-        pred_df = get_live_prediction(crypto, interval, int(period), usd_to_inr)
-        
-        if pred_df is None or pred_df.empty:
-            raise ValueError(f"Model prediction failed for {crypto}. Model may not be trained or data insufficient.")
-        
-        print(f"Generated {len(pred_df)} future predictions")
-        print(f"Current: Rs.{current_price:.2f}, Predicted: Rs.{pred_df['Close'].iloc[-1]:.2f}")
-        
-        # Format prediction data for web display
-        result = format_prediction_for_web(crypto, timeframe, period, historical_df, pred_df, current_price)
-        print(f"Prediction complete!")
-        print(f"{'='*50}\n")
+        return max(0, min(int(request.GET.get('mc_samples', '0')), MC_SAMPLES_MAX))
+    except ValueError:
+        return 0
+
+def get_prediction(crypto, timeframe, period, mc_samples=0):
+    """
+    Generate price prediction using trained LSTM model from Model_Training.
+    With `mc_samples`, the price range comes from Monte-Carlo dropout bands.
+    """
+    try:
+        with metrics.timer('total', symbol=crypto, timeframe=timeframe):
+            # Convert timeframe to Binance API interval format
+            interval = "1h" if timeframe == 'hourly' else "1d"
+            logger.debug("Starting prediction for %s %s %s", crypto, timeframe, period)
+
+            # Fetch historical price data from Binance API
+            with metrics.timer('fetch'):
+                historical_df = get_live_data(crypto, interval)
+                if historical_df is None or historical_df.empty:
+                    raise ValueError(f"Failed to fetch historical data for {crypto}. Binance API may be down.")
+
+                # Get the absolute latest price using the ticker
+                realtime_price = get_realtime_price(crypto)
+
+            result = predict_from_data(crypto, timeframe, period, historical_df, realtime_price, mc_samples)
+        metrics.inc('predictions_total', symbol=crypto, timeframe=timeframe, status='ok')
         return result
-        
+
     except Exception as e:
-        print(f"\n{'='*50}")
-        print(f"PREDICTION ERROR for {crypto}")
-        print(f"Error type: {type(e).__name__}")
-        print(f"Error message: {str(e)}")
-        print(f"{'='*50}")
-        import traceback
-        traceback.print_exc()
-        print(f"{'='*50}\n")
+        metrics.inc('predictions_total', symbol=crypto, timeframe=timeframe, status='error')
+        logger.exception("Prediction error for %s %s %s", crypto, timeframe, period)
         raise Exception(f"Prediction failed: {str(e)}")
 
-def format_prediction_for_web(crypto, timeframe, period, historical_df, pred_df, current_price):
-    """Transform model output into JSON format for frontend visualization"""
+def predict_from_data(crypto, timeframe, period, historical_df, realtime_price, mc_samples=0):
+    """
+    Model rollout, indicators and formatting for already-fetched market data;
+    CPU-bound, so the async view runs it in its inference executor
+    """
+    interval = "1h" if timeframe == 'hourly' else "1d"
+    current_price = realtime_price if realtime_price is not None else historical_df['Close'].iloc[-1]
+
+    # Generate predictions using trained LSTM model
+    pred_df = get_live_prediction(crypto, interval, int(period), mc_samples, df=historical_df)
+
+    if pred_df is None or pred_df.empty:
+        raise ValueError(f"Model prediction failed for {crypto}. Model may not be trained or data insufficient.")
+
+    # Format prediction data for web display
+    with metrics.timer('format'):
+        indicators = indicator_engine.update(crypto, interval, historical_df)
+        result = format_prediction_for_web(crypto, timeframe, period, historical_df, pred_df, current_price,
+                                           indicators)
+    logger.debug("Prediction for %s: current=%.2f predicted=%.2f",
+                 crypto, current_price, result['predicted_price'])
+    return result
+
+def format_prediction_for_web(crypto, timeframe, period, historical_df, pred_df, current_price, indicators=None):
+    """
+    Transform model output into JSON format for frontend visualization.
+    `indicators` is an IndicatorState snapshot for historical_df; computed here if not given.
+    """
     # Extract price data from dataframes
     historical_prices = historical_df['Close'].tolist()
     predicted_prices_list = pred_df['Close'].tolist()
@@ -386,20 +477,29 @@ def format_prediction_for_web(crypto, timeframe, period, historical_df, pred_df,
     # Combine historical and predicted prices for continuous chart line
     full_predicted_prices = [None] * len(historical_prices) + predicted_prices_list
     
-    # Calculate volatility from historical data
-    avg_change = sum([abs(historical_prices[i] - historical_prices[i-1]) / historical_prices[i-1] 
-                      for i in range(1, len(historical_prices))]) / (len(historical_prices) - 1)
-    volatility = 'Low' if avg_change < 0.01 else 'Medium' if avg_change < 0.03 else 'High'
+    # Volatility (mean absolute return) and trend statistics of the historical window
+    if indicators is None:
+        indicators = IndicatorState.from_prices(historical_prices).snapshot()
+    volatility = indicators['volatility']
     
     # Calculate confidence level based on multiple factors
-    confidence_level = calculate_confidence_level(historical_prices, predicted_prices_list, volatility, timeframe, period)
+    confidence_level = calculate_confidence_level(historical_prices, predicted_prices_list, volatility, timeframe, period,
+                                                  indicators)
     
     # Calculate market sentiment based on price trend and momentum
-    market_sentiment = calculate_market_sentiment(historical_prices, predicted_price, current_price)
+    market_sentiment = calculate_market_sentiment(historical_prices, predicted_price, current_price, indicators)
     
     range_factor = (100 - confidence_level) / 100 * 0.5
+    min_price = predicted_price * (1 - range_factor)
+    max_price = predicted_price * (1 + range_factor)
+
+    # Monte-Carlo dropout bands per horizon, when get_live_prediction was asked for them
+    bands = {f"p{band}": pred_df[f"Close_p{band}"].tolist()
+             for band in PREDICTION_BANDS if f"Close_p{band}" in pred_df}
+    if bands:
+        min_price, max_price = bands['p5'][-1], bands['p95'][-1]
     
-    return {
+    result = {
         'crypto': crypto,
         'timeframe': timeframe,
         'period': period,
@@ -408,14 +508,18 @@ def format_prediction_for_web(crypto, timeframe, period, historical_df, pred_df,
         'predicted_prices': full_predicted_prices,
         'current_price': float(current_price),
         'predicted_price': float(predicted_price),
-        'min_price': float(predicted_price * (1 - range_factor)),
-        'max_price': float(predicted_price * (1 + range_factor)),
+        'min_price': float(min_price),
+        'max_price': float(max_price),
         'confidence_level': confidence_level,
         'volatility': volatility,
-        'market_sentiment': market_sentiment
+        'market_sentiment': market_sentiment,
+        'currency': fx.QUOTE_CURRENCY,
     }
+    if bands:
+        result['prediction_bands'] = {name: [float(p) for p in values] for name, values in bands.items()}
+    return result
 
-def calculate_confidence_level(historical_prices, predicted_prices, volatility, timeframe, period):
+def calculate_confidence_level(historical_prices, predicted_prices, volatility, timeframe, period, indicators=None):
     """
     Calculate confidence level based on multiple factors:
     - Data quality and quantity
@@ -449,8 +553,11 @@ def calculate_confidence_level(historical_prices, predicted_prices, volatility,
         else:
             horizon_adjustment = -10
     
+    if indicators is None:
+        indicators = IndicatorState.from_prices(historical_prices).snapshot()
+
     # Factor 3: Data quality (more historical data = better predictions)
-    data_points = len(historical_prices)
+    data_points = indicators['data_points']
     if data_points >= 100:
         data_adjustment = 3
     elif data_points >= 50:
@@ -458,11 +565,8 @@ def calculate_confidence_level(historical_prices, predicted_prices, volatility,
     else:
         data_adjustment = -5
     
-    # Factor 4: Trend consistency (check if recent prices show clear trend)
-    recent_prices = historical_prices[-10:]
-    price_changes = [recent_prices[i] - recent_prices[i-1] for i in range(1, len(recent_prices))]
-    positive_changes = sum(1 for change in price_changes if change > 0)
-    trend_consistency = abs(positive_changes - len(price_changes)/2) / (len(price_changes)/2)
+    # Factor 4: Trend consistency (share of up-moves among the last 10 closes)
+    trend_consistency = indicators['trend_consistency']
     trend_adjustment = int(trend_consistency * 4)  # 0-4 points for strong trends
     
     # Calculate final confidence
@@ -473,7 +577,7 @@ def calculate_confidence_level(historical_prices, predicted_prices, volatility,
     
     return round(confidence, 1)
 
-def calculate_market_sentiment(historical_prices, predicted_price, current_price):
+def calculate_market_sentiment(historical_prices, predicted_price, current_price, indicators=None):
     """
     Calculate market sentiment based on:
     - Price prediction direction and magnitude
@@ -483,16 +587,12 @@ def calculate_market_sentiment(historical_prices, predicted_price, current_price
     # Calculate predicted price change percentage
     price_change_pct = (predicted_price - current_price) / current_price
     
-    # Analyze recent momentum (last 10 data points)
-    recent_prices = historical_prices[-10:]
-    recent_trend = (recent_prices[-1] - recent_prices[0]) / recent_prices[0]
-    
-    # Analyze medium-term trend (last 30 data points if available)
-    if len(historical_prices) >= 30:
-        medium_prices = historical_prices[-30:]
-        medium_trend = (medium_prices[-1] - medium_prices[0]) / medium_prices[0]
-    else:
-        medium_trend = recent_trend
+    if indicators is None:
+        indicators = IndicatorState.from_prices(historical_prices).snapshot()
+
+    # Recent momentum (last 10 data points) and medium-term trend (last 30 if available)
+    recent_trend = indicators['recent_trend']
+    medium_trend = indicators['medium_trend']
     
     # Calculate momentum strength
     momentum_strength = abs(recent_trend)
@@ -1,4 +1,3 @@
-import pandas as pd
 import numpy as np
 import tensorflow as tf
 from tensorflow.keras.models import Sequential
@@ -8,10 +7,16 @@ from tensorflow.keras.callbacks import EarlyStopping
 from sklearn.preprocessing import MinMaxScaler
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 import os
+import sys
 import joblib
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 data_dir = os.path.join(BASE_DIR, "Data", "data-hours")
+
+sys.path.insert(0, os.path.join(BASE_DIR, "Data"))
+from dataset import DatasetCache
+dataset = DatasetCache()
+
 models_dir = os.path.join(os.path.dirname(__file__), "models_hourly")
 os.makedirs(models_dir, exist_ok=True)
 
@@ -28,11 +33,9 @@ def create_sequences(data, time_step=24):
 for filename in os.listdir(data_dir):
     if filename.endswith("_hours_data.csv"):
         coin_name = filename.split('_')[0]
-        filepath = os.path.join(data_dir, filename)
 
-        df = pd.read_csv(filepath)
-        df['Date'] = pd.to_datetime(df['Date'])
-        df = df.sort_values("Date")
+        # Columnar cache: parsed and sorted once, re-converted only when the CSV changes
+        df = dataset.load_frame(coin_name, "hours")
         df.dropna(subset=features, inplace=True)
 
         train_size = int(len(df) * 0.7)